@@ -0,0 +1 @@
+"""Benchmarks hors ligne du chemin critique de /chat (providers et embeddings factices)."""
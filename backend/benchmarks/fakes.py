@@ -0,0 +1,63 @@
+"""Provider et fonction d'embedding factices, déterministes et sans réseau."""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+import time
+from typing import AsyncIterator, Iterator
+
+# Réexportée : les benchmarks et le faux serveur OpenAI utilisent le repli local de la mémoire.
+from backend.memory.embeddings import HashingEmbeddingFunction
+from backend.services.ai_provider import Attachment
+
+
+@dataclass
+class FakeProvider:
+    """Offline :class:`AIProvider` with a fixed first-token latency and token rate.
+
+    Every answer is ``response_tokens`` tokens long: the first one arrives after
+    ``latency`` seconds, the next ones every ``1 / tokens_per_second`` seconds.
+    """
+
+    latency: float = 0.02
+    tokens_per_second: float = 200.0
+    response_tokens: int = 32
+
+    @property
+    def token_interval(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    @property
+    def generation_time(self) -> float:
+        return self.latency + self.token_interval * max(self.response_tokens - 1, 0)
+
+    def _tokens(self) -> list[str]:
+        return [f"mot{index} " for index in range(self.response_tokens)]
+
+    def generate_response(self, prompt: str, attachments: list[Attachment] | None = None) -> str:
+        time.sleep(self.generation_time)
+        return "".join(self._tokens()).strip()
+
+    def stream_response(
+        self, prompt: str, attachments: list[Attachment] | None = None
+    ) -> Iterator[str]:
+        time.sleep(self.latency)
+        for index, token in enumerate(self._tokens()):
+            if index:
+                time.sleep(self.token_interval)
+            yield token
+
+    async def agenerate_response(
+        self, prompt: str, attachments: list[Attachment] | None = None
+    ) -> str:
+        await asyncio.sleep(self.generation_time)
+        return "".join(self._tokens()).strip()
+
+    async def astream_response(
+        self, prompt: str, attachments: list[Attachment] | None = None
+    ) -> AsyncIterator[str]:
+        await asyncio.sleep(self.latency)
+        for index, token in enumerate(self._tokens()):
+            if index:
+                await asyncio.sleep(self.token_interval)
+            yield token
@@ -0,0 +1,435 @@
+"""Benchmarks hors ligne du chemin critique de /chat.
+
+Exemples (depuis la racine du dépôt) ::
+
+    python -m backend.benchmarks.run --quick
+    python -m backend.benchmarks.run --sizes 1000,10000,100000,1000000
+    python -m backend.benchmarks.run --compare backend/benchmarks/baselines/reference.json
+
+Chaque exécution écrit un fichier JSON (métadonnées + résultats) réutilisable
+comme référence ; ``--compare`` signale les métriques qui se dégradent au-delà
+de ``--tolerance``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import json
+from pathlib import Path
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Iterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.benchmarks.fakes import FakeProvider, HashingEmbeddingFunction
+
+
+BASELINES_DIR = Path(__file__).resolve().parent / "baselines"
+BENCHMARKS = ("prompt_assembly", "chat", "streaming", "retrieval", "startup")
+REPO_ROOT = Path(__file__).resolve().parents[2]
+# Modules dont l'import doit rester hors du démarrage d'un worker (chargés à l'initialisation).
+HEAVY_MODULES = ("openai", "dotenv", "numpy", "chromadb", "hnswlib", "onnxruntime", "sentence_transformers")
+
+_VOCABULARY = [
+    "agenda", "rappel", "musique", "météo", "recette", "voyage", "train", "réunion",
+    "facture", "anniversaire", "sport", "lecture", "film", "projet", "code", "python",
+    "jardin", "courses", "médecin", "banque", "vacances", "photo", "email", "budget",
+]
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _summary_ms(values: list[float]) -> dict[str, float]:
+    """Mean, p50 and p95 of durations given in seconds, reported in milliseconds."""
+    return {
+        "mean_ms": 1000 * sum(values) / len(values) if values else 0.0,
+        "p50_ms": 1000 * _percentile(values, 0.50),
+        "p95_ms": 1000 * _percentile(values, 0.95),
+    }
+
+
+def _sentence(rng: random.Random, words: int = 12) -> str:
+    return " ".join(rng.choice(_VOCABULARY) for _ in range(words))
+
+
+@contextmanager
+def _patched(module: Any, **attributes: Any) -> Iterator[None]:
+    previous = {name: getattr(module, name) for name in attributes}
+    for name, value in attributes.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(module, name, value)
+
+
+def _open_memory(persist_dir: str, backend: str = "chroma"):
+    from backend.memory.memory_manager import VectorMemory
+
+    return VectorMemory(
+        api_key="",
+        persist_dir=persist_dir,
+        embedding_model="bench-hashing-384",
+        embedding_function=HashingEmbeddingFunction(),
+        backend=backend,
+    )
+
+
+def _populate(memory: Any, target: int, rng: random.Random) -> float:
+    """Grow the collection to ``target`` memories; return the time spent per memory."""
+
+    embedder = HashingEmbeddingFunction()
+    batch_size = min(memory.backend.max_batch_size, 10_000)
+    start = memory.collection.count()
+    started = time.perf_counter()
+    # Vecteurs précalculés et insérés directement : le cache d'embeddings n'est pas mesuré.
+    for offset in range(start, target, batch_size):
+        count = min(batch_size, target - offset)
+        documents = [_sentence(rng) for _ in range(count)]
+        memory.collection.add(
+            ids=[f"bench_{offset + index}" for index in range(count)],
+            documents=documents,
+            embeddings=embedder.embed(documents),
+        )
+    added = target - start
+    return (time.perf_counter() - started) / added if added > 0 else 0.0
+
+
+def bench_prompt_assembly(iterations: int = 500, history_turns: int = 20) -> dict[str, Any]:
+    import backend.main as main
+    from backend.services.prompt_assembler import RollingHistorySummary
+
+    rng = random.Random(1)
+    history = [(_sentence(rng), _sentence(rng, 60)) for _ in range(history_turns)]
+    memories = [_sentence(rng, 40) for _ in range(5)]
+    summaries = RollingHistorySummary(max_tokens=main.settings.prompt_summary_max_tokens)
+    folded, _ = main._fold_history(history)
+
+    timings = []
+    summary = ""
+    for _ in range(iterations):
+        started = time.perf_counter()
+        summary = summaries.update(summary, folded)
+        main._build_prompt(_sentence(rng), history, memories, [], summary=summary)
+        timings.append(time.perf_counter() - started)
+    return {"iterations": iterations, "history_turns": history_turns, **_summary_ms(timings)}
+
+
+def _chat_globals(
+    main: Any, provider: FakeProvider, memory: Any, concurrency: int
+) -> dict[str, Any]:
+    from backend.memory.history_store import InMemoryHistoryStore
+    from backend.services.admission import AdmissionController
+    from backend.services.single_flight import SingleFlight
+
+    return {
+        "_provider": provider,
+        "_provider_error": None,
+        "_memory": memory,
+        "_memory_writer": None,
+        "_response_cache": None,
+        "_model_selector": None,
+        "_decision_log": None,
+        "_history_store": InMemoryHistoryStore(limit=main.settings.history_limit),
+        "_single_flight": SingleFlight(),
+        "_admission": AdmissionController(max_concurrency=concurrency, max_queue=10 * concurrency),
+    }
+
+
+async def bench_chat(
+    provider: FakeProvider, memory: Any, requests: int = 200, concurrency: int = 16
+) -> dict[str, Any]:
+    """Non-streaming throughput with ``concurrency`` clients sharing ``requests`` calls."""
+
+    import backend.main as main
+
+    latencies: list[float] = []
+    pending = iter(range(requests))
+
+    async def client(worker: int) -> None:
+        for index in pending:
+            started = time.perf_counter()
+            await main.chat(
+                text=f"Question {index} : {_sentence(random.Random(index))}",
+                files=None,
+                stream=False,
+                conversation_id=f"bench-{worker}",
+            )
+            latencies.append(time.perf_counter() - started)
+
+    with _patched(main, **_chat_globals(main, provider, memory, concurrency)):
+        started = time.perf_counter()
+        await asyncio.gather(*(client(worker) for worker in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    overhead = [latency - provider.generation_time for latency in latencies]
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "requests_per_second": requests / elapsed,
+        "latency": _summary_ms(latencies),
+        "overhead": _summary_ms(overhead),
+    }
+
+
+async def bench_streaming(
+    provider: FakeProvider, memory: Any, requests: int = 50
+) -> dict[str, Any]:
+    """Time to first token and per-chunk overhead of sequential streamed calls."""
+
+    import backend.main as main
+
+    first_tokens: list[float] = []
+    gaps: list[float] = []
+
+    with _patched(main, **_chat_globals(main, provider, memory, concurrency=1)):
+        for index in range(requests):
+            started = time.perf_counter()
+            response = await main.chat(
+                text=f"Flux {index} : {_sentence(random.Random(index))}",
+                files=None,
+                stream=True,
+            )
+            previous: float | None = None
+            async for _ in response.body_iterator:
+                now = time.perf_counter()
+                if previous is None:
+                    first_tokens.append(now - started)
+                else:
+                    gaps.append(now - previous)
+                previous = now
+
+    return {
+        "requests": requests,
+        "time_to_first_token": _summary_ms(first_tokens),
+        "ttft_overhead": _summary_ms([value - provider.latency for value in first_tokens]),
+        "inter_token_overhead": _summary_ms([gap - provider.token_interval for gap in gaps]),
+    }
+
+
+def bench_retrieval(
+    sizes: list[int], queries: int, workdir: str, backend: str = "chroma"
+) -> dict[str, Any]:
+    """``retrieve_relevant`` latency while a single store grows through ``sizes``."""
+
+    rng = random.Random(7)
+    memory = _open_memory(str(Path(workdir) / "retrieval"), backend)
+    results: dict[str, Any] = {}
+    for size in sorted(sizes):
+        insert_seconds = _populate(memory, size, rng)
+        timings = []
+        for index in range(queries):
+            # Requêtes distinctes : l'embedding de la question n'est jamais servi par le cache.
+            query = f"{_sentence(rng, 8)} {size}-{index}"
+            started = time.perf_counter()
+            memory.retrieve_relevant(query)
+            timings.append(time.perf_counter() - started)
+        results[str(size)] = {
+            "queries": queries,
+            "insert_us_per_memory": 1_000_000 * insert_seconds,
+            **_summary_ms(timings),
+        }
+    return results
+
+
+def _time_import(statement: str) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", statement], cwd=REPO_ROOT, check=True)
+    return time.perf_counter() - started
+
+
+def bench_startup(runs: int = 10) -> dict[str, Any]:
+    """Time ``import backend.main`` in fresh interpreters, as a spawned worker would."""
+
+    interpreter = [_time_import("pass") for _ in range(runs)]
+    imports = [_time_import("import backend.main") for _ in range(runs)]
+    probe = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import json, sys; import backend.main; "
+            f"print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))",
+        ],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    baseline = sorted(interpreter)[len(interpreter) // 2]
+    return {
+        "runs": runs,
+        "interpreter": _summary_ms(interpreter),
+        # Temps propre à l'import, une fois retiré le démarrage médian de l'interpréteur.
+        "import": _summary_ms([max(0.0, value - baseline) for value in imports]),
+        "heavy_modules_loaded": json.loads(probe.stdout.strip().splitlines()[-1]),
+    }
+
+
+def run(
+    benchmarks: tuple[str, ...] = BENCHMARKS,
+    sizes: tuple[int, ...] = (1_000, 10_000, 100_000),
+    quick: bool = False,
+    provider: FakeProvider | None = None,
+    backend: str = "chroma",
+) -> dict[str, Any]:
+    provider = provider or FakeProvider()
+    scale = 0.2 if quick else 1.0
+    results: dict[str, Any] = {}
+
+    with tempfile.TemporaryDirectory(prefix="jarvis-bench-") as workdir:
+        memory = None
+        if {"chat", "streaming"} & set(benchmarks):
+            memory = _open_memory(str(Path(workdir) / "chat"), backend)
+            _populate(memory, 1_000, random.Random(3))
+
+        if "prompt_assembly" in benchmarks:
+            results["prompt_assembly"] = bench_prompt_assembly(iterations=int(500 * scale))
+        if "chat" in benchmarks:
+            results["chat"] = asyncio.run(bench_chat(provider, memory, requests=int(200 * scale)))
+        if "streaming" in benchmarks:
+            results["streaming"] = asyncio.run(
+                bench_streaming(provider, memory, requests=int(50 * scale))
+            )
+        if "retrieval" in benchmarks:
+            results["retrieval"] = bench_retrieval(
+                list(sizes), queries=int(100 * scale), workdir=workdir, backend=backend
+            )
+        if "startup" in benchmarks:
+            results["startup"] = bench_startup(runs=max(3, int(10 * scale)))
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": quick,
+            "vector_backend": backend,
+            "provider": {
+                "latency": provider.latency,
+                "tokens_per_second": provider.tokens_per_second,
+                "response_tokens": provider.response_tokens,
+            },
+        },
+        "results": results,
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def _flatten(results: dict[str, Any], prefix: str = "") -> dict[str, float]:
+    flat: dict[str, float] = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+def compare(
+    current: dict[str, Any], baseline: dict[str, Any], tolerance: float = 0.2
+) -> list[dict[str, Any]]:
+    """List the timing and throughput metrics that regressed by more than ``tolerance``."""
+
+    now = _flatten(current["results"])
+    before = _flatten(baseline["results"])
+    regressions = []
+    for name, value in sorted(now.items()):
+        reference = before.get(name)
+        higher_is_better = name.endswith("_per_second")
+        if reference is None or reference <= 0 or not (name.endswith("_ms") or higher_is_better):
+            continue
+        if "overhead" in name:
+            # Les surcoûts sont petits et bruités : on compare à au moins 1 ms.
+            reference = max(reference, 1.0)
+        change = (value - reference) / reference
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(
+                {"metric": name, "baseline": reference, "current": value, "change": change}
+            )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks hors ligne du chemin critique de /chat.")
+    parser.add_argument("--quick", action="store_true", help="Moins d'itérations (contrôle rapide).")
+    parser.add_argument(
+        "--only", default=",".join(BENCHMARKS), help="Benchmarks à lancer, séparés par des virgules."
+    )
+    parser.add_argument(
+        "--sizes", default="1000,10000,100000", help="Tailles de collection pour retrieve_relevant."
+    )
+    parser.add_argument(
+        "--backend", default="chroma", choices=("chroma", "matrix"), help="Backend vectoriel."
+    )
+    parser.add_argument("--latency", type=float, default=0.02, help="Premier token factice (s).")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Tokens/s du provider factice.")
+    parser.add_argument("--tokens", type=int, default=32, help="Longueur des réponses factices.")
+    parser.add_argument("--output", help="Fichier de résultats (défaut : baselines/<commit>.json).")
+    parser.add_argument("--compare", help="Fichier JSON de référence à comparer.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Dégradation tolérée (0.2 = 20 %%).")
+    args = parser.parse_args(argv)
+
+    benchmarks = tuple(name for name in args.only.split(",") if name)
+    unknown = set(benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"benchmarks inconnus : {', '.join(sorted(unknown))}")
+
+    report = run(
+        benchmarks=benchmarks,
+        sizes=tuple(int(size) for size in args.sizes.split(",") if size),
+        quick=args.quick,
+        provider=FakeProvider(args.latency, args.token_rate, args.tokens),
+        backend=args.backend,
+    )
+
+    default_name = f"{report['meta']['commit'] or 'local'}.json"
+    output = Path(args.output) if args.output else BASELINES_DIR / default_name
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    print(json.dumps(report["results"], indent=2, ensure_ascii=False))
+    print(f"Résultats enregistrés dans {output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(report, baseline, args.tolerance)
+        for item in regressions:
+            print(
+                f"⚠️ Régression {item['metric']} : {item['baseline']:.3f} -> "
+                f"{item['current']:.3f} ({item['change']:+.0%})"
+            )
+        if regressions:
+            return 1
+        print("Aucune régression au-delà de la tolérance.")
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI
+    raise SystemExit(main())
@@ -4,10 +4,19 @@ from __future__ import annotations
 import os
 from functools import lru_cache
 from typing import Any
-from dotenv import load_dotenv  # 👈 AJOUT IMPORTANT
 
-# Charger les variables du fichier .env
-load_dotenv(dotenv_path=".env")
+# Charger les variables du fichier .env (python-dotenv n'est importé que s'il existe)
+if os.path.exists(".env"):
+    from dotenv import load_dotenv
+
+    load_dotenv(dotenv_path=".env")
+
+
+def _as_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in {"1", "true", "yes", "on"}
+    return bool(value)
+
 
 class Settings:
     """Simple settings loader relying on environment variables."""
@@ -17,6 +26,31 @@ class Settings:
         self.ai_provider: str = overrides.get("ai_provider", env("AI_PROVIDER", "openai"))
         self.openai_api_key: str | None = overrides.get("openai_api_key", env("OPENAI_API_KEY"))
         self.openai_model: str = overrides.get("openai_model", env("OPENAI_MODEL", "gpt-4o-mini"))
+        # URL de base de l'API OpenAI (par ex. un serveur factice local pour les tests de charge)
+        self.openai_base_url: str | None = overrides.get(
+            "openai_base_url", env("OPENAI_BASE_URL")
+        ) or None
+        self.openai_prompt_cache_key: str | None = overrides.get(
+            "openai_prompt_cache_key", env("OPENAI_PROMPT_CACHE_KEY")
+        )
+        # « legacy » (contexte temporel en tête) ou « cache » (du plus stable au plus volatil)
+        self.prompt_layout: str = overrides.get("prompt_layout", env("PROMPT_LAYOUT", "legacy"))
+        # Budget de tokens du prompt (0 = illimité) et taille des sections compressées
+        self.prompt_token_budget: int = int(
+            overrides.get("prompt_token_budget", env("PROMPT_TOKEN_BUDGET", "3000"))
+        )
+        self.prompt_history_verbatim: int = int(
+            overrides.get("prompt_history_verbatim", env("PROMPT_HISTORY_VERBATIM", "3"))
+        )
+        self.prompt_summary_max_tokens: int = int(
+            overrides.get("prompt_summary_max_tokens", env("PROMPT_SUMMARY_MAX_TOKENS", "300"))
+        )
+        self.prompt_exchange_max_tokens: int = int(
+            overrides.get("prompt_exchange_max_tokens", env("PROMPT_EXCHANGE_MAX_TOKENS", "300"))
+        )
+        self.prompt_memory_max_tokens: int = int(
+            overrides.get("prompt_memory_max_tokens", env("PROMPT_MEMORY_MAX_TOKENS", "200"))
+        )
         self.huggingface_api_key: str | None = overrides.get(
             "huggingface_api_key", env("HUGGINGFACE_API_KEY")
         )
@@ -24,15 +58,252 @@ class Settings:
             "huggingface_model", env("HUGGINGFACE_MODEL", "gpt2")
         )
 
+        # Choix du modèle OpenAI par requête (rapide ou puissant selon la complexité)
+        self.model_routing_enabled: bool = _as_bool(
+            overrides.get("model_routing_enabled", env("MODEL_ROUTING_ENABLED", "false"))
+        )
+        self.openai_fast_model: str = overrides.get(
+            "openai_fast_model", env("OPENAI_FAST_MODEL", "gpt-4o-mini")
+        )
+        self.openai_strong_model: str | None = overrides.get(
+            "openai_strong_model", env("OPENAI_STRONG_MODEL")
+        )
+        self.model_routing_threshold: float = float(
+            overrides.get("model_routing_threshold", env("MODEL_ROUTING_THRESHOLD", "1"))
+        )
+        self.model_routing_log_path: str | None = overrides.get(
+            "model_routing_log_path", env("MODEL_ROUTING_LOG_PATH")
+        )
+        self.model_routing_log_text: bool = _as_bool(
+            overrides.get("model_routing_log_text", env("MODEL_ROUTING_LOG_TEXT", "true"))
+        )
+
+        # Routeur multi-providers (AI_PROVIDER=router), ex. « openai:gpt-4o-mini,huggingface:gpt2 »
+        self.router_backends: str = overrides.get("router_backends", env("ROUTER_BACKENDS", ""))
+        self.router_failure_threshold: int = int(
+            overrides.get("router_failure_threshold", env("ROUTER_FAILURE_THRESHOLD", "3"))
+        )
+        self.router_reset_timeout: float = float(
+            overrides.get("router_reset_timeout", env("ROUTER_RESET_TIMEOUT", "30"))
+        )
+        self.router_max_attempts: int = int(
+            overrides.get("router_max_attempts", env("ROUTER_MAX_ATTEMPTS", "2"))
+        )
+        self.router_latency_alpha: float = float(
+            overrides.get("router_latency_alpha", env("ROUTER_LATENCY_ALPHA", "0.2"))
+        )
+
+        # Contrôle d'admission de /chat (0 = pas de plafond)
+        self.admission_max_concurrency: int = int(
+            overrides.get("admission_max_concurrency", env("ADMISSION_MAX_CONCURRENCY", "32"))
+        )
+        self.admission_max_queue: int = int(
+            overrides.get("admission_max_queue", env("ADMISSION_MAX_QUEUE", "100"))
+        )
+        self.admission_queue_timeout: float = float(
+            overrides.get("admission_queue_timeout", env("ADMISSION_QUEUE_TIMEOUT", "10"))
+        )
+
+        # Délais des étapes préparatoires de /chat (en secondes)
+        self.attachment_read_timeout: float = float(
+            overrides.get("attachment_read_timeout", env("ATTACHMENT_READ_TIMEOUT", "30"))
+        )
+        # Limites des pièces jointes (en octets)
+        self.attachment_max_file_size: int = int(
+            overrides.get("attachment_max_file_size", env("ATTACHMENT_MAX_FILE_SIZE", "52428800"))
+        )
+        self.attachment_max_request_size: int = int(
+            overrides.get(
+                "attachment_max_request_size", env("ATTACHMENT_MAX_REQUEST_SIZE", "104857600")
+            )
+        )
+        self.attachment_spool_threshold: int = int(
+            overrides.get("attachment_spool_threshold", env("ATTACHMENT_SPOOL_THRESHOLD", "1048576"))
+        )
+        self.openai_inline_attachment_limit: int = int(
+            overrides.get(
+                "openai_inline_attachment_limit", env("OPENAI_INLINE_ATTACHMENT_LIMIT", "2097152")
+            )
+        )
+        # Registre des pièces jointes déjà envoyées (déduplication par SHA-256)
+        self.attachment_registry_enabled: bool = _as_bool(
+            overrides.get("attachment_registry_enabled", env("ATTACHMENT_REGISTRY_ENABLED", "true"))
+        )
+        self.attachment_registry_path: str | None = overrides.get(
+            "attachment_registry_path", env("ATTACHMENT_REGISTRY_PATH")
+        )
+        self.attachment_registry_ttl: float = float(
+            overrides.get("attachment_registry_ttl", env("ATTACHMENT_REGISTRY_TTL", "604800"))
+        )
+        self.attachment_registry_max_entries: int = int(
+            overrides.get(
+                "attachment_registry_max_entries", env("ATTACHMENT_REGISTRY_MAX_ENTRIES", "1000")
+            )
+        )
+        self.attachment_dedup_min_size: int = int(
+            overrides.get("attachment_dedup_min_size", env("ATTACHMENT_DEDUP_MIN_SIZE", "65536"))
+        )
+        self.memory_retrieval_timeout: float = float(
+            overrides.get("memory_retrieval_timeout", env("MEMORY_RETRIEVAL_TIMEOUT", "1.5"))
+        )
+        self.history_load_timeout: float = float(
+            overrides.get("history_load_timeout", env("HISTORY_LOAD_TIMEOUT", "1"))
+        )
+
+        # Historique récent par conversation (« memory » ou « sqlite »)
+        self.history_backend: str = overrides.get("history_backend", env("HISTORY_BACKEND", "memory"))
+        self.history_db_path: str | None = overrides.get("history_db_path", env("HISTORY_DB_PATH"))
+        self.history_limit: int = int(overrides.get("history_limit", env("HISTORY_LIMIT", "5")))
+        self.history_max_conversations: int = int(
+            overrides.get("history_max_conversations", env("HISTORY_MAX_CONVERSATIONS", "1000"))
+        )
+        self.history_idle_ttl: float = float(
+            overrides.get("history_idle_ttl", env("HISTORY_IDLE_TTL", "3600"))
+        )
+
+        # Mémoire vectorielle et cache d'embeddings
+        self.memory_persist_dir: str | None = overrides.get(
+            "memory_persist_dir", env("MEMORY_PERSIST_DIR")
+        ) or None
+        # « chroma » ou « matrix » (matrice NumPy mappée en mémoire, sans import de chromadb)
+        self.vector_backend: str = overrides.get("vector_backend", env("VECTOR_BACKEND", "chroma"))
+        self.vector_index_dtype: str = overrides.get(
+            "vector_index_dtype", env("VECTOR_INDEX_DTYPE", "float32")
+        )
+        # Taille à partir de laquelle le backend « matrix » construit un index HNSW (hnswlib)
+        self.vector_hnsw_threshold: int = int(
+            overrides.get("vector_hnsw_threshold", env("VECTOR_HNSW_THRESHOLD", "50000"))
+        )
+        # « openai », ou un backend local sur CPU : « onnx » (EMBEDDING_MODEL = dossier du modèle
+        # exporté), « sentence-transformers » (EMBEDDING_MODEL = nom du modèle) ou « hashing »
+        self.embedding_backend: str = overrides.get(
+            "embedding_backend", env("EMBEDDING_BACKEND", "openai")
+        )
+        self.embedding_model: str = overrides.get(
+            "embedding_model", env("EMBEDDING_MODEL", "text-embedding-3-small")
+        )
+        self.embedding_batch_size: int = int(
+            overrides.get("embedding_batch_size", env("EMBEDDING_BATCH_SIZE", "32"))
+        )
+        self.embedding_workers: int = int(
+            overrides.get("embedding_workers", env("EMBEDDING_WORKERS", "2"))
+        )
+        self.embedding_cache_size: int = int(
+            overrides.get("embedding_cache_size", env("EMBEDDING_CACHE_SIZE", "10000"))
+        )
+        self.embedding_cache_disk_size: int = int(
+            overrides.get("embedding_cache_disk_size", env("EMBEDDING_CACHE_DISK_SIZE", "200000"))
+        )
+        self.memory_write_batch_size: int = int(
+            overrides.get("memory_write_batch_size", env("MEMORY_WRITE_BATCH_SIZE", "16"))
+        )
+        self.memory_write_flush_interval: float = float(
+            overrides.get("memory_write_flush_interval", env("MEMORY_WRITE_FLUSH_INTERVAL", "2"))
+        )
+        self.memory_write_queue_size: int = int(
+            overrides.get("memory_write_queue_size", env("MEMORY_WRITE_QUEUE_SIZE", "1000"))
+        )
+        # Cycle de vie : fusion des quasi-doublons (similarité cosinus, 0 = désactivée), expiration
+        # par défaut (secondes, 0 = jamais), taille maximale et compaction périodique (0 = jamais)
+        self.memory_dedup_threshold: float = float(
+            overrides.get("memory_dedup_threshold", env("MEMORY_DEDUP_THRESHOLD", "0.95"))
+        )
+        self.memory_ttl: float = float(overrides.get("memory_ttl", env("MEMORY_TTL", "0")))
+        self.memory_max_entries: int = int(
+            overrides.get("memory_max_entries", env("MEMORY_MAX_ENTRIES", "50000"))
+        )
+        self.memory_importance_half_life: float = float(
+            overrides.get(
+                "memory_importance_half_life", env("MEMORY_IMPORTANCE_HALF_LIFE", "1209600")
+            )
+        )
+        self.memory_compaction_interval: float = float(
+            overrides.get("memory_compaction_interval", env("MEMORY_COMPACTION_INTERVAL", "3600"))
+        )
+
+        # Transcription audio (« openai », ou « stub » pour travailler hors ligne)
+        self.transcription_backend: str = overrides.get(
+            "transcription_backend", env("TRANSCRIPTION_BACKEND", "openai")
+        )
+        self.transcription_partial_interval: float = float(
+            overrides.get(
+                "transcription_partial_interval", env("TRANSCRIPTION_PARTIAL_INTERVAL", "1")
+            )
+        )
+        # Chaque transcription partielle renvoie tout l'enregistrement : elle ne part vers
+        # l'API payante que quand l'audio a été multiplié par TRANSCRIPTION_PARTIAL_GROWTH
+        # (coût total borné à ~2 fois le clip final). TRANSCRIPTION_REMOTE_PARTIALS=false
+        # ne renvoie plus que les transcriptions finales.
+        self.transcription_remote_partials: bool = _as_bool(
+            overrides.get(
+                "transcription_remote_partials", env("TRANSCRIPTION_REMOTE_PARTIALS", "true")
+            )
+        )
+        self.transcription_partial_growth: float = float(
+            overrides.get(
+                "transcription_partial_growth", env("TRANSCRIPTION_PARTIAL_GROWTH", "2")
+            )
+        )
+        self.transcription_stream_max_bytes: int = int(
+            overrides.get(
+                "transcription_stream_max_bytes", env("TRANSCRIPTION_STREAM_MAX_BYTES", "26214400")
+            )
+        )
+        self.transcription_hedge_delay: float = float(
+            overrides.get("transcription_hedge_delay", env("TRANSCRIPTION_HEDGE_DELAY", "0"))
+        )
+        self.transcription_cache_size: int = int(
+            overrides.get("transcription_cache_size", env("TRANSCRIPTION_CACHE_SIZE", "256"))
+        )
+        self.transcription_cache_ttl: float = float(
+            overrides.get("transcription_cache_ttl", env("TRANSCRIPTION_CACHE_TTL", "3600"))
+        )
+
+        # Cache sémantique des réponses (désactivé par défaut)
+        self.response_cache_enabled: bool = _as_bool(
+            overrides.get("response_cache_enabled", env("RESPONSE_CACHE_ENABLED", "false"))
+        )
+        self.response_cache_threshold: float = float(
+            overrides.get("response_cache_threshold", env("RESPONSE_CACHE_THRESHOLD", "0.95"))
+        )
+        self.response_cache_ttl: float = float(
+            overrides.get("response_cache_ttl", env("RESPONSE_CACHE_TTL", "86400"))
+        )
+        self.response_cache_lookup_timeout: float = float(
+            overrides.get(
+                "response_cache_lookup_timeout", env("RESPONSE_CACHE_LOOKUP_TIMEOUT", "0.5")
+            )
+        )
+
+        # Pool HTTP partagé par tous les appels sortants
+        self.http_max_connections: int = int(
+            overrides.get("http_max_connections", env("HTTP_MAX_CONNECTIONS", "100"))
+        )
+        self.http_max_keepalive_connections: int = int(
+            overrides.get(
+                "http_max_keepalive_connections", env("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")
+            )
+        )
+        self.http_keepalive_expiry: float = float(
+            overrides.get("http_keepalive_expiry", env("HTTP_KEEPALIVE_EXPIRY", "30"))
+        )
+        self.http_timeout: float = float(overrides.get("http_timeout", env("HTTP_TIMEOUT", "30")))
+        self.http2_enabled: bool = _as_bool(overrides.get("http2_enabled", env("HTTP2_ENABLED", "true")))
+        self.http_warmup_enabled: bool = _as_bool(
+            overrides.get("http_warmup_enabled", env("HTTP_WARMUP_ENABLED", "true"))
+        )
+        # Attente maximale d'une requête arrivée pendant l'initialisation du provider (secondes)
+        self.startup_wait_timeout: float = float(
+            overrides.get("startup_wait_timeout", env("STARTUP_WAIT_TIMEOUT", "10"))
+        )
+        # Délai laissé à l'initialisation en cours lors de l'arrêt avant de l'annuler (secondes)
+        self.shutdown_warmup_timeout: float = float(
+            overrides.get("shutdown_warmup_timeout", env("SHUTDOWN_WARMUP_TIMEOUT", "5"))
+        )
+
     def model_dump(self) -> dict[str, Any]:
         """Expose settings as a dictionary for convenience."""
-        return {
-            "ai_provider": self.ai_provider,
-            "openai_api_key": self.openai_api_key,
-            "openai_model": self.openai_model,
-            "huggingface_api_key": self.huggingface_api_key,
-            "huggingface_model": self.huggingface_model,
-        }
+        return dict(vars(self))
 
 
 @lru_cache(maxsize=1)
@@ -0,0 +1 @@
+"""Outils de test de charge de bout en bout (serveur OpenAI factice et générateur de trafic)."""
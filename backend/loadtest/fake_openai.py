@@ -0,0 +1,253 @@
+"""Serveur local imitant l'API OpenAI (Responses en flux, embeddings, transcription, fichiers).
+
+Il répond avec une latence et un débit de tokens réglables, pour tester la
+charge d'un déploiement réel sans consommer de crédits ::
+
+    python -m backend.loadtest.fake_openai --port 9100 --latency 0.3 --token-rate 80
+
+puis ``OPENAI_BASE_URL=http://127.0.0.1:9100/v1`` côté Jarvis.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+from dataclasses import dataclass
+import itertools
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+from fastapi import FastAPI, File, Form, Request, UploadFile
+from fastapi.responses import StreamingResponse
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.benchmarks.fakes import HashingEmbeddingFunction
+
+
+@dataclass
+class FakeOpenAIConfig:
+    """Timing profile of the fake API."""
+
+    latency: float = 0.2
+    tokens_per_second: float = 50.0
+    response_tokens: int = 40
+    embedding_latency: float = 0.02
+    embedding_dimensions: int = 1536
+    transcription_latency: float = 0.4
+
+
+def _sse(event: dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+def create_app(config: FakeOpenAIConfig | None = None) -> FastAPI:
+    """Build the fake API; every route lives under ``/v1`` like the real one."""
+
+    config = config or FakeOpenAIConfig()
+    app = FastAPI(title="Fake OpenAI API")
+    app.state.config = config
+    app.state.requests = {"responses": 0, "embeddings": 0, "transcriptions": 0, "files": 0}
+    ids = itertools.count(1)
+    embedder = HashingEmbeddingFunction(dimensions=config.embedding_dimensions)
+
+    def tokens() -> list[str]:
+        return [f"mot{index} " for index in range(config.response_tokens)]
+
+    def response_object(response_id: str, model: str, status: str, text: str | None) -> dict:
+        output = []
+        if text is not None:
+            output.append(
+                {
+                    "id": f"msg_{response_id}",
+                    "type": "message",
+                    "role": "assistant",
+                    "status": "completed",
+                    "content": [{"type": "output_text", "text": text, "annotations": []}],
+                }
+            )
+        return {
+            "id": response_id,
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": model,
+            "status": status,
+            "output": output,
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": (
+                {
+                    "input_tokens": 100,
+                    "input_tokens_details": {"cached_tokens": 0},
+                    "output_tokens": config.response_tokens,
+                    "output_tokens_details": {"reasoning_tokens": 0},
+                    "total_tokens": 100 + config.response_tokens,
+                }
+                if text is not None
+                else None
+            ),
+        }
+
+    async def response_events(response_id: str, model: str) -> AsyncIterator[str]:
+        item_id = f"msg_{response_id}"
+        sequence = itertools.count()
+        yield _sse(
+            {
+                "type": "response.created",
+                "sequence_number": next(sequence),
+                "response": response_object(response_id, model, "in_progress", None),
+            }
+        )
+        await asyncio.sleep(config.latency)
+        yield _sse(
+            {
+                "type": "response.output_item.added",
+                "sequence_number": next(sequence),
+                "output_index": 0,
+                "item": {
+                    "id": item_id,
+                    "type": "message",
+                    "role": "assistant",
+                    "status": "in_progress",
+                    "content": [],
+                },
+            }
+        )
+        yield _sse(
+            {
+                "type": "response.content_part.added",
+                "sequence_number": next(sequence),
+                "item_id": item_id,
+                "output_index": 0,
+                "content_index": 0,
+                "part": {"type": "output_text", "text": "", "annotations": []},
+            }
+        )
+        interval = 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+        for index, token in enumerate(tokens()):
+            if index and interval:
+                await asyncio.sleep(interval)
+            yield _sse(
+                {
+                    "type": "response.output_text.delta",
+                    "sequence_number": next(sequence),
+                    "item_id": item_id,
+                    "output_index": 0,
+                    "content_index": 0,
+                    "delta": token,
+                    "logprobs": [],
+                }
+            )
+        yield _sse(
+            {
+                "type": "response.completed",
+                "sequence_number": next(sequence),
+                "response": response_object(response_id, model, "completed", "".join(tokens())),
+            }
+        )
+
+    @app.post("/v1/responses")
+    async def responses(request: Request):
+        payload = await request.json()
+        app.state.requests["responses"] += 1
+        response_id = f"resp_{next(ids)}"
+        model = payload.get("model", "gpt-4o-mini")
+        if payload.get("stream"):
+            return StreamingResponse(
+                response_events(response_id, model), media_type="text/event-stream"
+            )
+        interval = 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+        await asyncio.sleep(config.latency + interval * max(config.response_tokens - 1, 0))
+        return response_object(response_id, model, "completed", "".join(tokens()))
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        payload = await request.json()
+        app.state.requests["embeddings"] += 1
+        texts = payload["input"]
+        texts = [texts] if isinstance(texts, str) else [str(text) for text in texts]
+        await asyncio.sleep(config.embedding_latency)
+        if payload.get("dimensions"):
+            vectors = HashingEmbeddingFunction(int(payload["dimensions"])).embed(texts)
+        else:
+            vectors = embedder.embed(texts)
+        as_base64 = payload.get("encoding_format") == "base64"
+        return {
+            "object": "list",
+            "model": payload.get("model", "text-embedding-3-small"),
+            "data": [
+                {
+                    "object": "embedding",
+                    "index": index,
+                    "embedding": (
+                        base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii")
+                        if as_base64
+                        else vector.tolist()
+                    ),
+                }
+                for index, vector in enumerate(vectors)
+            ],
+            "usage": {"prompt_tokens": len(texts), "total_tokens": len(texts)},
+        }
+
+    @app.post("/v1/audio/transcriptions")
+    async def transcriptions(file: UploadFile = File(...), model: str = Form(...)):
+        audio = await file.read()
+        app.state.requests["transcriptions"] += 1
+        await asyncio.sleep(config.transcription_latency)
+        return {"text": f"Transcription factice de {len(audio)} octets ({model})."}
+
+    @app.post("/v1/files")
+    async def upload_file(file: UploadFile = File(...), purpose: str = Form("user_data")):
+        content = await file.read()
+        app.state.requests["files"] += 1
+        return {
+            "id": f"file_{next(ids)}",
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": file.filename or "upload",
+            "purpose": purpose,
+            "status": "processed",
+        }
+
+    @app.delete("/v1/files/{file_id}")
+    async def delete_file(file_id: str):
+        return {"id": file_id, "object": "file", "deleted": True}
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.requests
+
+    return app
+
+
+def main(argv: list[str] | None = None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serveur factice compatible avec l'API OpenAI.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.2, help="Délai du premier token (s).")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="Tokens générés par seconde.")
+    parser.add_argument("--tokens", type=int, default=40, help="Longueur des réponses (tokens).")
+    parser.add_argument("--embedding-latency", type=float, default=0.02)
+    parser.add_argument("--transcription-latency", type=float, default=0.4)
+    args = parser.parse_args(argv)
+
+    config = FakeOpenAIConfig(
+        latency=args.latency,
+        tokens_per_second=args.token_rate,
+        response_tokens=args.tokens,
+        embedding_latency=args.embedding_latency,
+        transcription_latency=args.transcription_latency,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI
+    main()
@@ -0,0 +1,354 @@
+"""Générateur de charge de bout en bout pour un déploiement ``uvicorn main:app``.
+
+Par défaut, l'outil démarre le serveur OpenAI factice puis Jarvis lui-même
+(``OPENAI_BASE_URL`` pointé sur le faux serveur, mémoire dans un dossier
+temporaire), envoie un trafic mixte à débit constant et affiche les latences ::
+
+    python -m backend.loadtest.run --rps 20 --duration 30
+    python -m backend.loadtest.run --target http://127.0.0.1:8000 --mix chat=1,stream=3
+
+Avec ``--target``, le déploiement existant doit déjà avoir ``OPENAI_BASE_URL``
+pointé sur le faux serveur (``--fake-port``) pour ne rien facturer.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import defaultdict
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+import json
+import os
+from pathlib import Path
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.loadtest.fake_openai import FakeOpenAIConfig, create_app
+
+
+REQUEST_KINDS = ("chat", "stream", "attachment", "transcribe")
+DEFAULT_MIX = "chat=4,stream=4,attachment=1,transcribe=1"
+
+
+@dataclass
+class Sample:
+    kind: str
+    status: int
+    latency: float
+    first_token: float | None = None
+    error: str | None = None
+
+
+@dataclass
+class LoadReport:
+    duration: float
+    samples: list[Sample] = field(default_factory=list)
+
+    def summary(self) -> dict[str, Any]:
+        by_kind: dict[str, list[Sample]] = defaultdict(list)
+        for sample in self.samples:
+            by_kind[sample.kind].append(sample)
+        summary: dict[str, Any] = {
+            "duration": self.duration,
+            "achieved_rps": len(self.samples) / self.duration if self.duration else 0.0,
+            "overall": _describe(self.samples),
+        }
+        for kind in REQUEST_KINDS:
+            if by_kind.get(kind):
+                summary[kind] = _describe(by_kind[kind])
+        return summary
+
+
+def _percentiles_ms(values: list[float]) -> dict[str, float]:
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+    last = len(ordered) - 1
+    return {
+        f"p{percent}_ms": 1000 * ordered[min(last, len(ordered) * percent // 100)]
+        for percent in (50, 95, 99)
+    }
+
+
+def _describe(samples: list[Sample]) -> dict[str, Any]:
+    succeeded = [sample for sample in samples if sample.error is None and sample.status < 400]
+    statuses: dict[str, int] = defaultdict(int)
+    for sample in samples:
+        statuses[str(sample.status)] += 1
+    description: dict[str, Any] = {
+        "requests": len(samples),
+        "errors": len(samples) - len(succeeded),
+        "statuses": dict(statuses),
+        "latency": _percentiles_ms([sample.latency for sample in succeeded]),
+    }
+    first_tokens = [sample.first_token for sample in succeeded if sample.first_token is not None]
+    if first_tokens:
+        description["time_to_first_token"] = _percentiles_ms(first_tokens)
+    return description
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    """Parse ``chat=4,stream=1`` into normalised request weights."""
+
+    weights: dict[str, float] = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in REQUEST_KINDS:
+            raise ValueError(f"Type de requête inconnu : {name}")
+        weights[name] = float(weight or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("Le mélange de requêtes est vide.")
+    return {name: weight / total for name, weight in weights.items()}
+
+
+class LoadGenerator:
+    """Open-loop traffic at ``rps`` requests per second for ``duration`` seconds.
+
+    Requests are scheduled on a fixed clock regardless of how fast the server
+    answers, so a saturated deployment shows up as growing latencies instead
+    of a silently reduced request rate.
+    """
+
+    def __init__(
+        self,
+        target: str,
+        rps: float,
+        duration: float,
+        mix: dict[str, float],
+        attachment_size: int = 32 * 1024,
+        audio_size: int = 64 * 1024,
+        timeout: float = 60.0,
+        seed: int = 0,
+    ) -> None:
+        self.target = target.rstrip("/")
+        self.rps = rps
+        self.duration = duration
+        self.mix = mix
+        self.attachment_size = attachment_size
+        self.audio_size = audio_size
+        self.timeout = timeout
+        self.random = random.Random(seed)
+
+    async def run(self) -> LoadReport:
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=200)
+        async with httpx.AsyncClient(
+            base_url=self.target, timeout=self.timeout, limits=limits
+        ) as client:
+            total = max(int(self.rps * self.duration), 1)
+            kinds = self.random.choices(list(self.mix), weights=list(self.mix.values()), k=total)
+            tasks = []
+            started = time.perf_counter()
+            for index, kind in enumerate(kinds):
+                delay = started + index / self.rps - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(self._send(client, kind, index)))
+            samples = await asyncio.gather(*tasks)
+            return LoadReport(duration=time.perf_counter() - started, samples=list(samples))
+
+    async def _send(self, client: httpx.AsyncClient, kind: str, index: int) -> Sample:
+        started = time.perf_counter()
+        try:
+            if kind == "transcribe":
+                # Contenu unique par requête : le cache de transcription n'est pas sollicité.
+                audio = index.to_bytes(8, "little") + os.urandom(self.audio_size)
+                response = await client.post(
+                    "/transcribe-audio", files={"audio": ("clip.webm", audio, "audio/webm")}
+                )
+                return Sample(kind, response.status_code, time.perf_counter() - started)
+
+            data = {"text": f"Requête de charge {index} : résume ma journée.", "stream": "false"}
+            files = None
+            if kind == "attachment":
+                line = f"Note {index}\n".encode()
+                payload = (line * (self.attachment_size // len(line) + 1))[: self.attachment_size]
+                files = {"files": (f"note-{index}.txt", payload, "text/plain")}
+            if kind != "stream":
+                response = await client.post("/chat", data=data, files=files)
+                return Sample(kind, response.status_code, time.perf_counter() - started)
+
+            data["stream"] = "true"
+            first_token: float | None = None
+            async with client.stream("POST", "/chat", data=data) as response:
+                async for chunk in response.aiter_bytes():
+                    if chunk and first_token is None:
+                        first_token = time.perf_counter() - started
+            return Sample(kind, response.status_code, time.perf_counter() - started, first_token)
+        except httpx.HTTPError as exc:
+            error = str(exc) or type(exc).__name__
+            return Sample(kind, 0, time.perf_counter() - started, error=error)
+
+
+class FakeOpenAIServer:
+    """Run the fake OpenAI API in a background thread of this process."""
+
+    def __init__(self, config: FakeOpenAIConfig, host: str = "127.0.0.1", port: int = 9100) -> None:
+        import uvicorn
+
+        self.base_url = f"http://{host}:{port}/v1"
+        self.server = uvicorn.Server(
+            uvicorn.Config(create_app(config), host=host, port=port, log_level="warning")
+        )
+        self._thread = threading.Thread(target=self.server.run, name="fake-openai", daemon=True)
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("Le serveur OpenAI factice n'a pas démarré.")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+def spawn_app(port: int, openai_base_url: str, workdir: str, workers: int = 1) -> subprocess.Popen:
+    """Start ``uvicorn backend.main:app`` against the fake API, with throwaway storage."""
+
+    env = {
+        **os.environ,
+        "AI_PROVIDER": "openai",
+        "OPENAI_API_KEY": "sk-fake-load-test",
+        "OPENAI_BASE_URL": openai_base_url,
+        "MEMORY_PERSIST_DIR": str(Path(workdir) / "chroma"),
+        "ATTACHMENT_REGISTRY_PATH": str(Path(workdir) / "attachments.sqlite3"),
+        "MODEL_ROUTING_LOG_PATH": str(Path(workdir) / "model_decisions.jsonl"),
+        "HISTORY_BACKEND": "memory",
+    }
+    command = [
+        sys.executable, "-m", "uvicorn", "backend.main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+    return subprocess.Popen(command, cwd=Path(__file__).resolve().parents[2], env=env)
+
+
+def _stop(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def wait_until_ready(url: str, process: subprocess.Popen | None = None, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Jarvis s'est arrêté au démarrage (code {process.returncode}).")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} ne répond pas après {timeout:.0f} s.")
+
+
+def _print_report(summary: dict[str, Any]) -> None:
+    print(
+        f"Durée : {summary['duration']:.1f} s — débit atteint : "
+        f"{summary['achieved_rps']:.1f} req/s"
+    )
+    for name in ("overall", *REQUEST_KINDS):
+        stats = summary.get(name)
+        if not stats:
+            continue
+        latency = stats["latency"]
+        line = (
+            f"{name:<11} {stats['requests']:>6} req  {stats['errors']:>4} err  "
+            f"p50 {latency.get('p50_ms', 0):8.1f} ms  p95 {latency.get('p95_ms', 0):8.1f} ms  "
+            f"p99 {latency.get('p99_ms', 0):8.1f} ms"
+        )
+        ttft = stats.get("time_to_first_token")
+        if ttft:
+            line += (
+                f"  | TTFT p50 {ttft['p50_ms']:.1f} p95 {ttft['p95_ms']:.1f} "
+                f"p99 {ttft['p99_ms']:.1f} ms"
+            )
+        print(line)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Test de charge de bout en bout de Jarvis.")
+    parser.add_argument("--target", help="URL d'un Jarvis déjà lancé (sinon il est démarré ici).")
+    parser.add_argument("--app-port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="Workers uvicorn du Jarvis démarré.")
+    parser.add_argument("--fake-port", type=int, default=9100)
+    parser.add_argument("--no-fake", action="store_true", help="Ne pas démarrer le faux serveur.")
+    parser.add_argument("--rps", type=float, default=10.0, help="Requêtes par seconde visées.")
+    parser.add_argument("--duration", type=float, default=20.0, help="Durée du test (s).")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Poids par type de requête.")
+    parser.add_argument("--attachment-size", type=int, default=32 * 1024)
+    parser.add_argument("--audio-size", type=int, default=64 * 1024)
+    parser.add_argument("--latency", type=float, default=0.2, help="Premier token factice (s).")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="Tokens/s du faux serveur.")
+    parser.add_argument("--tokens", type=int, default=40, help="Longueur des réponses factices.")
+    parser.add_argument("--transcription-latency", type=float, default=0.4)
+    parser.add_argument("--output", help="Fichier JSON où écrire le rapport.")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    config = FakeOpenAIConfig(
+        latency=args.latency,
+        tokens_per_second=args.token_rate,
+        response_tokens=args.tokens,
+        transcription_latency=args.transcription_latency,
+    )
+
+    if args.no_fake and args.target is None:
+        parser.error("--no-fake nécessite --target.")
+
+    with ExitStack() as stack:
+        workdir = stack.enter_context(tempfile.TemporaryDirectory(prefix="jarvis-load-"))
+        fake = None
+        if not args.no_fake:
+            fake = stack.enter_context(FakeOpenAIServer(config, port=args.fake_port))
+
+        process = None
+        target = args.target
+        if target is None:
+            process = spawn_app(args.app_port, fake.base_url, workdir, args.workers)
+            stack.callback(_stop, process)
+            target = f"http://127.0.0.1:{args.app_port}"
+        wait_until_ready(f"{target.rstrip('/')}/", process)
+
+        generator = LoadGenerator(
+            target,
+            rps=args.rps,
+            duration=args.duration,
+            mix=mix,
+            attachment_size=args.attachment_size,
+            audio_size=args.audio_size,
+        )
+        report = asyncio.run(generator.run())
+
+    summary = report.summary()
+    _print_report(summary)
+    if args.output:
+        Path(args.output).write_text(json.dumps(summary, indent=2) + "\n", encoding="utf-8")
+    return 0 if summary["overall"]["errors"] == 0 else 1
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI
+    raise SystemExit(main())
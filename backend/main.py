@@ -1,18 +1,31 @@
 from __future__ import annotations
 
 import asyncio
-from collections import deque
+import json
+from collections.abc import AsyncIterator, Awaitable
+from contextlib import aclosing, asynccontextmanager
+from typing import TYPE_CHECKING, Annotated
 from datetime import datetime, timedelta, timezone
-from io import BytesIO
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from pathlib import Path
 import sys
+import time
 
 import httpx
-from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile, status
-from fastapi.responses import Response, StreamingResponse
+from fastapi import (
+    FastAPI,
+    File,
+    Form,
+    HTTPException,
+    Request,
+    UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
-from openai import OpenAI
 
 # Ensure the "backend" package can be imported when the module is executed
 # directly (e.g. via ``uvicorn main:app`` from inside the ``backend`` folder).
@@ -21,23 +34,98 @@ if __package__ is None or __package__ == "":  # pragma: no cover - environment g
     sys.path.insert(0, str(backend_root))
 
 from backend.config import settings
-try:
-    from backend.memory.memory_manager import VectorMemory
-except Exception as exc:  # pragma: no cover - optional dependency
-    VectorMemory = None  # type: ignore[assignment]
-    _memory_import_error: Exception | None = exc
-else:
-    _memory_import_error = None
+from backend.memory.history_store import (
+    DEFAULT_CONVERSATION_ID,
+    HistoryStore,
+    InMemoryHistoryStore,
+    create_history_store,
+)
+from backend.memory.response_cache import RESPONSE_CACHE_COLLECTION, SemanticResponseCache
+from backend.memory.write_behind import MemoryWriteBehind
+from backend.services.admission import (
+    DEFAULT_PRIORITY,
+    PRIORITY_CLASSES,
+    AdmissionController,
+    AdmissionRejected,
+    AdmissionTicket,
+)
 from backend.services.ai_provider import (
     AIProvider,
     Attachment,
+    HuggingFaceProvider,
+    OpenAIProvider,
     ProviderConfigurationError,
     ProviderRequestError,
     create_provider,
 )
+from backend.services.attachment_registry import AttachmentRegistry
+from backend.services.attachments import AttachmentTooLargeError, UploadBudget, spool_upload
+from backend.services.http_clients import HTTPClientPool
+from backend.services.metrics import (
+    GENERATION_SECONDS,
+    REGISTRY,
+    STAGE_SECONDS,
+    TIME_TO_FIRST_TOKEN,
+    TOKENS_PER_SECOND,
+    UPSTREAM_ERRORS,
+    run_in_thread,
+)
+from backend.services.model_selector import (
+    DecisionLog,
+    ModelDecision,
+    ModelSelector,
+    RequestFeatures,
+)
+from backend.services.provider_router import ProviderRouter
+from backend.services.readiness import ComponentDisabled, Readiness
+from backend.services.single_flight import SingleFlight, flight_key
+from backend.services.transcription import (
+    StubTranscriber,
+    Transcriber,
+    TranscriptionCache,
+    TranscriptionError,
+    TranscriptionStream,
+)
+from backend.services.prompt_assembler import (
+    PromptAssembler,
+    PromptSection,
+    RollingHistorySummary,
+    count_tokens,
+    truncate_to_tokens,
+)
+
+if TYPE_CHECKING:  # pragma: no cover - imports lourds chargés à l'initialisation
+    from openai import AsyncOpenAI
+
+    from backend.memory.lifecycle import MemoryCompactor
+    from backend.memory.memory_manager import VectorMemory
+
+
+_OPENAI_API_URL = "https://api.openai.com"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _readiness, _history_store
+    _history_store = await run_in_thread(_create_history_store)
+    # Le serveur accepte les connexions tout de suite : provider, mémoire et connexions
+    # sortantes s'initialisent en arrière-plan, et /readyz indique quand ils sont prêts.
+    _readiness = _create_readiness()
+    warm_up = asyncio.create_task(_warm_up())
+    try:
+        yield
+    finally:
+        # Une initialisation encore en cours dispose d'un délai borné pour se terminer, puis
+        # est annulée : l'arrêt n'attend pas un provider ou une mémoire injoignable.
+        await asyncio.wait({warm_up}, timeout=settings.shutdown_warmup_timeout)
+        warm_up.cancel()
+        await asyncio.gather(warm_up, return_exceptions=True)
+        await _close_memory()
+        await _http_clients.aclose()
+        await run_in_thread(_close_history_store)
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -48,12 +136,62 @@ app.add_middleware(
 )
 
 
+_http_clients = HTTPClientPool(
+    max_connections=settings.http_max_connections,
+    max_keepalive_connections=settings.http_max_keepalive_connections,
+    keepalive_expiry=settings.http_keepalive_expiry,
+    timeout=settings.http_timeout,
+    http2=settings.http2_enabled,
+)
+_openai_client: AsyncOpenAI | None = None
+_transcriber: Transcriber | StubTranscriber | None = None
 _provider: AIProvider | None = None
 _provider_error: ProviderConfigurationError | None = None
 _memory: VectorMemory | None = None
-_RECENT_HISTORY_LIMIT = 5
-_recent_history: deque[tuple[str, str]] = deque(maxlen=_RECENT_HISTORY_LIMIT)
+_memory_writer: MemoryWriteBehind | None = None
+_memory_compactor: MemoryCompactor | None = None
+_response_cache: SemanticResponseCache | None = None
+_readiness: Readiness
+_background_tasks: set[asyncio.Future] = set()
+_single_flight = SingleFlight()
+_admission = AdmissionController(
+    max_concurrency=settings.admission_max_concurrency,
+    max_queue=settings.admission_max_queue,
+    queue_timeout=settings.admission_queue_timeout,
+)
+_ATTACHMENT_REGISTRY_PATH = Path(__file__).resolve().parent / "memory" / "attachments.sqlite3"
+_HISTORY_DB_PATH = Path(__file__).resolve().parent / "memory" / "history.sqlite3"
+_MODEL_DECISIONS_PATH = Path(__file__).resolve().parent / "memory" / "model_decisions.jsonl"
+# Remplacé dans le lifespan par le backend configuré : l'import n'ouvre aucune base.
+_history_store: HistoryStore = InMemoryHistoryStore(limit=settings.history_limit)
+_history_summaries = RollingHistorySummary(max_tokens=settings.prompt_summary_max_tokens)
 _TRANSCRIPTION_MODELS = ("gpt-4o-mini-transcribe", "whisper-1")
+_transcription_cache = TranscriptionCache(
+    max_entries=settings.transcription_cache_size, ttl=settings.transcription_cache_ttl
+)
+
+# Jauges lues au moment du scrape : aucun coût sur le chemin des requêtes.
+REGISTRY.gauge(
+    "jarvis_admission_active", "Requêtes /chat admises en cours.", lambda: _admission.active
+)
+REGISTRY.gauge(
+    "jarvis_admission_queued", "Requêtes /chat en file d'attente.", lambda: _admission.queued
+)
+REGISTRY.gauge(
+    "jarvis_memory_write_queue_depth",
+    "Souvenirs en attente d'écriture dans la mémoire vectorielle.",
+    lambda: _memory_writer.depth if _memory_writer is not None else 0,
+)
+REGISTRY.gauge(
+    "jarvis_ready",
+    "1 une fois le provider initialisé (voir /readyz), 0 sinon.",
+    lambda: int(_readiness.ready),
+)
+REGISTRY.gauge(
+    "jarvis_generations_in_flight",
+    "Générations partagées en cours (après coalescence).",
+    lambda: _single_flight.stats()["in_flight"],
+)
 
 _WEEKDAYS_FR = [
     "lundi",
@@ -115,6 +253,21 @@ def _build_temporal_context() -> str:
     )
 
 
+def _create_attachment_registry() -> AttachmentRegistry | None:
+    if not settings.attachment_registry_enabled or not settings.openai_api_key:
+        return None
+    path = settings.attachment_registry_path or str(_ATTACHMENT_REGISTRY_PATH)
+    try:
+        return AttachmentRegistry(
+            path,
+            ttl=settings.attachment_registry_ttl,
+            max_entries=settings.attachment_registry_max_entries,
+        )
+    except Exception as exc:  # pragma: no cover - log only
+        print("⚠️ Impossible d'ouvrir le registre des pièces jointes:", exc)
+        return None
+
+
 def _initialise_provider() -> None:
     global _provider, _provider_error
     try:
@@ -122,8 +275,20 @@ def _initialise_provider() -> None:
             settings.ai_provider,
             openai_api_key=settings.openai_api_key,
             openai_model=settings.openai_model,
+            openai_base_url=settings.openai_base_url,
+            openai_prompt_cache_key=settings.openai_prompt_cache_key,
+            openai_inline_attachment_limit=settings.openai_inline_attachment_limit,
+            attachment_registry=_create_attachment_registry(),
+            attachment_dedup_min_size=settings.attachment_dedup_min_size,
             huggingface_api_key=settings.huggingface_api_key,
             huggingface_model=settings.huggingface_model,
+            router_backends=settings.router_backends,
+            router_failure_threshold=settings.router_failure_threshold,
+            router_reset_timeout=settings.router_reset_timeout,
+            router_max_attempts=settings.router_max_attempts,
+            router_latency_alpha=settings.router_latency_alpha,
+            http_client=_http_clients.sync_client,
+            async_http_client=_http_clients.async_client,
         )
         _provider_error = None
     except ProviderConfigurationError as exc:
@@ -131,111 +296,602 @@ def _initialise_provider() -> None:
         _provider_error = exc
 
 
-_initialise_provider()
+def _start_provider() -> None:
+    if _provider is None and _provider_error is None:
+        _initialise_provider()
+    if _provider_error is not None:
+        raise _provider_error
+
+
+async def _ensure_provider() -> None:
+    """Wait for the background provider initialisation, or run it if nothing started it."""
+
+    if _provider is not None or _provider_error is not None:
+        return
+    if _readiness.components["provider"].started_at is None:
+        await _readiness.run("provider", _start_provider)
+    else:
+        await _readiness.wait("provider", settings.startup_wait_timeout)
+
+
+def _create_model_selector() -> tuple[ModelSelector | None, DecisionLog | None]:
+    if not settings.model_routing_enabled:
+        return None, None
+    selector = ModelSelector(
+        fast_model=settings.openai_fast_model,
+        strong_model=settings.openai_strong_model or settings.openai_model,
+        threshold=settings.model_routing_threshold,
+    )
+    decision_log = DecisionLog(
+        settings.model_routing_log_path or str(_MODEL_DECISIONS_PATH),
+        record_text=settings.model_routing_log_text,
+    )
+    return selector, decision_log
+
+
+_model_selector, _decision_log = _create_model_selector()
 
 
 def _initialise_memory() -> None:
-    global _memory
+    """Open the vector memory and start its background threads; raise when it stays off."""
+
+    global _memory, _memory_writer, _memory_compactor, _response_cache
 
     try:
-        if VectorMemory is None:
-            raise RuntimeError("La mémoire vectorielle n'est pas disponible.") from _memory_import_error
+        if settings.embedding_backend == "openai" and not settings.openai_api_key:
+            raise ComponentDisabled("Une clé API OpenAI est requise pour activer la mémoire vectorielle.")
 
-        if not settings.openai_api_key:
-            raise RuntimeError("Une clé API OpenAI est requise pour activer la mémoire vectorielle.")
+        # NumPy, le backend vectoriel et le modèle d'embedding ne sont chargés qu'ici.
+        try:
+            from backend.memory.lifecycle import MemoryCompactor
+            from backend.memory.memory_manager import VectorMemory, default_persist_dir
+        except Exception as exc:  # pragma: no cover - optional dependency
+            raise ComponentDisabled("La mémoire vectorielle n'est pas disponible.") from exc
 
-        persist_dir = Path(__file__).resolve().parent / "memory" / "chroma_store"
+        persist_dir = Path(
+            settings.memory_persist_dir or default_persist_dir(settings.vector_backend)
+        )
         persist_dir.mkdir(parents=True, exist_ok=True)
 
-        _memory = VectorMemory(api_key=settings.openai_api_key, persist_dir=str(persist_dir))
-    except Exception as exc:  # pragma: no cover - log only
+        _memory = VectorMemory(
+            api_key=settings.openai_api_key or "",
+            persist_dir=str(persist_dir),
+            embedding_backend=settings.embedding_backend,
+            embedding_model=settings.embedding_model,
+            embedding_batch_size=settings.embedding_batch_size,
+            embedding_workers=settings.embedding_workers,
+            embedding_cache_size=settings.embedding_cache_size,
+            embedding_cache_disk_size=settings.embedding_cache_disk_size,
+            api_base=settings.openai_base_url,
+            http_client=_http_clients.sync_client,
+            backend=settings.vector_backend,
+            index_dtype=settings.vector_index_dtype,
+            hnsw_threshold=settings.vector_hnsw_threshold,
+            dedup_threshold=settings.memory_dedup_threshold,
+            ttl=settings.memory_ttl,
+            max_entries=settings.memory_max_entries,
+            importance_half_life=settings.memory_importance_half_life,
+        )
+        _memory_writer = MemoryWriteBehind(
+            _memory,
+            max_batch_size=settings.memory_write_batch_size,
+            flush_interval=settings.memory_write_flush_interval,
+            max_queue_size=settings.memory_write_queue_size,
+        ).start()
+        _memory_compactor = MemoryCompactor(
+            _memory, interval=settings.memory_compaction_interval
+        ).start()
+        if settings.response_cache_enabled:
+            _response_cache = SemanticResponseCache(
+                _memory.get_collection(RESPONSE_CACHE_COLLECTION),
+                _memory.embedding_function,
+                threshold=settings.response_cache_threshold,
+                ttl=settings.response_cache_ttl,
+            )
+    except Exception as exc:
         _memory = None
+        _memory_writer = None
+        _memory_compactor = None
+        _response_cache = None
         print("⚠️ Impossible d'initialiser la mémoire vectorielle:", exc)
+        raise
 
 
-_initialise_memory()
+async def _close_memory() -> None:
+    global _memory, _memory_writer, _memory_compactor, _response_cache
 
+    if _memory_compactor is not None:
+        await run_in_thread(_memory_compactor.close)
+    if _memory_writer is not None:
+        await run_in_thread(_memory_writer.close)
+    if _memory is not None:
+        await run_in_thread(_memory.close)
+    _memory = _memory_writer = _memory_compactor = _response_cache = None
 
-@app.post("/chat")
-async def chat(
-    text: str = Form(...),
-    files: list[UploadFile] | None = File(default=None),
-    stream: bool = Form(default=False),
-):
+
+def _create_history_store() -> HistoryStore:
+    return create_history_store(
+        settings.history_backend,
+        limit=settings.history_limit,
+        path=settings.history_db_path or str(_HISTORY_DB_PATH),
+        max_conversations=settings.history_max_conversations,
+        idle_ttl=settings.history_idle_ttl,
+    )
+
+
+def _close_history_store() -> None:
+    close = getattr(_history_store, "close", None)
+    if close is not None:
+        close()
+
+
+async def _warm_up_connections() -> None:
+    if not settings.http_warmup_enabled:
+        raise ComponentDisabled("Préchauffage des connexions désactivé.")
+    await _http_clients.warm_up(_warmup_targets())
+
+
+def _create_readiness() -> Readiness:
+    # Seul le provider conditionne /readyz : sans mémoire, /chat répond quand même.
+    return Readiness(("provider", "memory", "connections"), required=("provider",))
+
+
+async def _warm_up() -> None:
+    """Initialise the provider (then pre-open its connections) and the memory concurrently."""
+
+    async def provider_then_connections() -> None:
+        await _readiness.run("provider", _start_provider)
+        await _readiness.run("connections", _warm_up_connections)
+
+    await asyncio.gather(provider_then_connections(), _readiness.run("memory", _initialise_memory))
+
+
+_readiness = _create_readiness()
+
+
+def _warmup_targets() -> list[str]:
+    """Return the upstream URLs whose connections are opened at startup."""
+
+    targets: list[str] = []
+    if settings.openai_api_key:
+        targets.append(settings.openai_base_url or _OPENAI_API_URL)
+    providers = (
+        [backend.provider for backend in _provider.backends]
+        if isinstance(_provider, ProviderRouter)
+        else [_provider]
+    )
+    for provider in providers:
+        if isinstance(provider, HuggingFaceProvider):
+            targets.append(provider.endpoint_url)
+    return targets
+
+
+def _get_openai_client() -> AsyncOpenAI:
+    """Return the OpenAI client shared by the endpoints, created on first use."""
+
+    global _openai_client
+    if _openai_client is None:
+        from openai import DEFAULT_TIMEOUT, AsyncOpenAI
+
+        # Délais du SDK conservés : ceux du pool partagé sont trop courts pour l'audio.
+        _openai_client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            http_client=_http_clients.async_client,
+            timeout=DEFAULT_TIMEOUT,
+        )
+    return _openai_client
+
+
+def _get_transcriber() -> Transcriber | StubTranscriber:
+    global _transcriber
+    if _transcriber is None and settings.transcription_backend == "stub":
+        _transcriber = StubTranscriber()
+    elif _transcriber is None:
+        _transcriber = Transcriber(
+            _get_openai_client(),
+            _TRANSCRIPTION_MODELS,
+            hedge_delay=settings.transcription_hedge_delay,
+            cache=_transcription_cache,
+        )
+    return _transcriber
+
+
+async def _read_attachment(upload: UploadFile, budget: UploadBudget) -> Attachment | None:
     try:
-        if _provider_error is not None:
+        return await spool_upload(
+            upload,
+            budget,
+            max_file_size=settings.attachment_max_file_size,
+            spool_threshold=settings.attachment_spool_threshold,
+        )
+    except AttachmentTooLargeError:
+        raise
+    except Exception as exc:
+        filename = upload.filename or "(inconnu)"
+        print(f"⚠️ Lecture impossible pour le fichier '{filename}':", exc)
+        return None
+    finally:
+        await upload.close()
+
+
+async def _ingest_attachments(uploads: list[UploadFile]) -> list[Attachment]:
+    """Spool every upload concurrently, enforcing the size limits and a timeout."""
+
+    if not uploads:
+        return []
+
+    budget = UploadBudget(settings.attachment_max_request_size)
+    tasks = [asyncio.ensure_future(_read_attachment(upload, budget)) for upload in uploads]
+    try:
+        with STAGE_SECONDS.time(stage="upload_read"):
+            results = await asyncio.wait_for(
+                asyncio.gather(*tasks), timeout=settings.attachment_read_timeout
+            )
+    except BaseException as exc:
+        for task in tasks:
+            task.cancel()
+        done = await asyncio.gather(*tasks, return_exceptions=True)
+        _close_attachments([item for item in done if isinstance(item, Attachment)])
+        if isinstance(exc, asyncio.TimeoutError):
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=str(_provider_error),
+                status.HTTP_408_REQUEST_TIMEOUT,
+                "La lecture des pièces jointes a pris trop de temps.",
+            ) from exc
+        if isinstance(exc, AttachmentTooLargeError):
+            raise HTTPException(status.HTTP_413_CONTENT_TOO_LARGE, str(exc)) from exc
+        raise
+
+    return [attachment for attachment in results if attachment is not None]
+
+
+def _close_attachments(attachments: list[Attachment]) -> None:
+    for attachment in attachments:
+        attachment.close()
+
+
+async def _retrieve_memories(text: str) -> list[str]:
+    """Query the vector memory in a worker thread; give up without memories on timeout."""
+
+    if _memory is None:
+        return []
+
+    try:
+        with STAGE_SECONDS.time(stage="memory_retrieval"):
+            memories = await asyncio.wait_for(
+                run_in_thread(_memory.retrieve_relevant, text),
+                timeout=settings.memory_retrieval_timeout,
             )
+    except asyncio.TimeoutError:
+        print("⚠️ Mémoire vectorielle trop lente, réponse sans souvenirs.")
+        return []
+    except Exception as exc:  # pragma: no cover - log only
+        print("⚠️ Impossible de récupérer la mémoire vectorielle:", exc)
+        return []
 
-        if _provider is None:
-            raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, "AI provider not initialised")
+    return [memory for memory in memories if memory]
 
-        prompt = text
-        stream_requested = bool(stream)
 
-        uploads = files or []
-        attachments: list[Attachment] = []
-        for upload in uploads:
-            content: bytes | None = None
-            try:
-                content = await upload.read()
-            except Exception as exc:
-                filename = upload.filename or "(inconnu)"
-                print(f"⚠️ Lecture impossible pour le fichier '{filename}':", exc)
-                continue
-            finally:
-                await upload.close()
+async def _load_history(conversation_id: str) -> list[tuple[str, str]]:
+    """Snapshot the conversation's recent exchanges; go ahead without them on timeout."""
 
-            if not content:
-                continue
+    try:
+        with STAGE_SECONDS.time(stage="history_load"):
+            return await asyncio.wait_for(
+                run_in_thread(_history_store.get, conversation_id),
+                timeout=settings.history_load_timeout,
+            )
+    except asyncio.TimeoutError:
+        print("⚠️ Historique trop lent à charger, réponse sans contexte récent.")
+    except Exception as exc:  # pragma: no cover - log only
+        print("⚠️ Impossible de charger l'historique:", exc)
+    return []
 
-            attachments.append(
-                Attachment(
-                    filename=upload.filename or "pièce-jointe",
-                    content=content,
-                    content_type=upload.content_type,
-                )
+
+def _fold_history(
+    history: list[tuple[str, str]],
+) -> tuple[list[tuple[str, str]], list[tuple[str, str]]]:
+    """Split ``history`` into the exchanges to summarise and those kept verbatim."""
+
+    verbatim_count = max(settings.prompt_history_verbatim, 0)
+    folded = history[: len(history) - verbatim_count] if verbatim_count else history
+    return folded, history[len(folded) :]
+
+
+def _update_history_summary(conversation_id: str, folded: list[tuple[str, str]]) -> str:
+    previous = _history_store.get_summary(conversation_id)
+    summary = _history_summaries.update(previous, folded)
+    if summary != previous:
+        _history_store.set_summary(conversation_id, summary)
+    return summary
+
+
+async def _load_history_summary(
+    conversation_id: str, history: Awaitable[list[tuple[str, str]]]
+) -> str:
+    """Fold the older exchanges into the conversation's stored rolling summary.
+
+    The summary lives in the history store, so it expires and is cleared with
+    the conversation and every worker sharing the store sees the same one.
+    """
+
+    exchanges = await history
+    if not exchanges:
+        return ""
+    try:
+        with STAGE_SECONDS.time(stage="history_summary"):
+            return await asyncio.wait_for(
+                run_in_thread(_update_history_summary, conversation_id, _fold_history(exchanges)[0]),
+                timeout=settings.history_load_timeout,
             )
+    except asyncio.TimeoutError:
+        print("⚠️ Résumé de l'historique trop lent à charger, réponse sans résumé.")
+    except Exception as exc:  # pragma: no cover - log only
+        print("⚠️ Impossible de mettre à jour le résumé de l'historique:", exc)
+    return ""
 
-        relevant_memories: list[str] = []
-        if _memory is not None:
-            try:
-                relevant_memories = [memory for memory in _memory.retrieve_relevant(text) if memory]
-            except Exception as exc:  # pragma: no cover - log only
-                print("⚠️ Impossible de récupérer la mémoire vectorielle:", exc)
 
-        prompt_sections: list[str] = [_build_temporal_context()]
+async def _lookup_cached_response(
+    text: str, has_attachments: bool, history: Awaitable[list[tuple[str, str]]]
+) -> str | None:
+    """Look the request up in the semantic response cache, within a short timeout.
 
-        if _recent_history:
-            history_entries = []
-            for index, (question, answer) in enumerate(_recent_history, start=1):
-                history_entries.append(
-                    f"Échange {index} :\nUtilisateur : {question}\nJarvis : {answer}"
-                )
-            prompt_sections.append(
+    ``history`` is the conversation's history being loaded: a turn that
+    follows earlier exchanges may depend on them and is never served from
+    the cache.
+    """
+
+    if _response_cache is None:
+        return None
+
+    has_history = bool(await history)
+    try:
+        with STAGE_SECONDS.time(stage="response_cache"):
+            return await asyncio.wait_for(
+                run_in_thread(_response_cache.lookup, text, has_attachments, has_history),
+                timeout=settings.response_cache_lookup_timeout,
+            )
+    except asyncio.TimeoutError:
+        print("⚠️ Cache de réponses trop lent, appel au provider.")
+    except Exception as exc:  # pragma: no cover - log only
+        print("⚠️ Impossible de consulter le cache de réponses:", exc)
+    return None
+
+
+def _store_cached_response(text: str, response_text: str) -> None:
+    if _response_cache is None:
+        return
+    try:
+        _response_cache.store(text, response_text)
+    except Exception as exc:  # pragma: no cover - log only
+        print("⚠️ Impossible d'enregistrer la réponse en cache:", exc)
+
+
+def _run_in_background(func, *args) -> None:
+    """Run a blocking ``func`` in the default executor without awaiting it."""
+
+    future = run_in_thread(func, *args)
+    _background_tasks.add(future)
+    future.add_done_callback(_background_tasks.discard)
+
+
+def _build_prompt(
+    text: str,
+    history: list[tuple[str, str]],
+    relevant_memories: list[str],
+    attachments: list[Attachment],
+    summary: str = "",
+) -> str:
+    sections = [
+        PromptSection("request", "Nouvelle demande :\n" + text, required=True),
+        PromptSection("temporal", _build_temporal_context(), priority=40),
+    ]
+
+    # Les échanges les plus anciens sont condensés dans ``summary``, le résumé glissant
+    # réutilisé d'un tour à l'autre, pour que la taille du prompt reste stable.
+    folded, recent = _fold_history(history)
+
+    if summary or recent:
+        history_blocks = []
+        if summary:
+            history_blocks.append("Résumé des échanges précédents :\n" + summary)
+        for index, (question, answer) in enumerate(recent, start=len(folded) + 1):
+            answer = truncate_to_tokens(answer, settings.prompt_exchange_max_tokens)
+            history_blocks.append(
+                f"Échange {index} :\nUtilisateur : {question}\nJarvis : {answer}"
+            )
+        sections.append(
+            PromptSection(
+                "history",
                 "Voici les derniers échanges avec l'utilisateur pour te donner du contexte :\n"
-                + "\n\n".join(history_entries)
+                + "\n\n".join(history_blocks),
+                priority=20,
+                keep_end=True,
             )
+        )
 
-        if relevant_memories:
-            memories_block = "\n".join(f"- {memory}" for memory in relevant_memories)
-            prompt_sections.append(
+    if relevant_memories:
+        memories_block = "\n".join(
+            f"- {truncate_to_tokens(memory, settings.prompt_memory_max_tokens)}"
+            for memory in relevant_memories
+        )
+        sections.append(
+            PromptSection(
+                "memories",
                 "Voici des souvenirs issus de conversations précédentes qui peuvent t'aider :\n"
-                f"{memories_block}"
+                f"{memories_block}",
+                priority=10,
             )
+        )
 
-        if attachments:
-            attachment_lines = "\n".join(f"- {attachment.filename}" for attachment in attachments)
-            prompt_sections.append(
+    if attachments:
+        attachment_lines = "\n".join(f"- {attachment.filename}" for attachment in attachments)
+        sections.append(
+            PromptSection(
+                "attachments",
                 "L'utilisateur a fourni des fichiers en pièces jointes. Utilise-les dans ta réponse si pertinent :\n"
-                f"{attachment_lines}"
+                f"{attachment_lines}",
+                priority=30,
+            )
+        )
+
+    assembler = PromptAssembler(
+        token_budget=settings.prompt_token_budget, layout=settings.prompt_layout
+    )
+    return assembler.assemble(sections).text
+
+
+def _select_model(
+    text: str,
+    attachments: list[Attachment],
+    relevant_memories: list[str],
+    history: list[tuple[str, str]],
+) -> str | None:
+    """Pick the OpenAI model for this request and log the decision; ``None`` keeps the default."""
+
+    if _model_selector is None or not isinstance(_provider, OpenAIProvider):
+        return None
+
+    features = RequestFeatures.from_request(
+        text,
+        attachment_count=len(attachments),
+        memory_hits=len(relevant_memories),
+        history_turns=len(history),
+    )
+    decision = _model_selector.select(features)
+    if _decision_log is not None:
+        _run_in_background(_record_model_decision, text, features, decision)
+    return decision.model
+
+
+def _record_model_decision(
+    text: str, features: RequestFeatures, decision: ModelDecision
+) -> None:
+    try:
+        _decision_log.record(text, features, decision)
+    except Exception as exc:  # pragma: no cover - log only
+        print("⚠️ Impossible de journaliser le choix du modèle:", exc)
+
+
+async def _generate_provider_response(
+    provider: AIProvider, prompt: str, attachments: list[Attachment], model: str | None = None
+) -> str:
+    """Generate a full response, preferring the provider's native async API."""
+
+    if model is not None:
+        return await provider.agenerate_response(prompt, attachments, model=model)
+
+    agenerate = getattr(provider, "agenerate_response", None)
+    if agenerate is not None:
+        return await agenerate(prompt, attachments)
+    # Providers that only implement the synchronous API still run off the event loop.
+    return await run_in_thread(provider.generate_response, prompt, attachments)
+
+
+async def _stream_provider_response(
+    provider: AIProvider, prompt: str, attachments: list[Attachment], model: str | None = None
+) -> AsyncIterator[str]:
+    """Yield response chunks straight from the provider's async stream.
+
+    Chunks are pulled one at a time by the consumer, so a slow client naturally
+    throttles the upstream stream instead of buffering deltas in memory.
+    """
+
+    astream = getattr(provider, "astream_response", None)
+    if astream is None:
+        yield await _generate_provider_response(provider, prompt, attachments)
+        return
+
+    stream = astream(prompt, attachments, model=model) if model else astream(prompt, attachments)
+    async with aclosing(stream) as chunks:
+        async for chunk in chunks:
+            yield chunk
+
+
+def _provider_label(provider: AIProvider) -> str:
+    if isinstance(provider, ProviderRouter):
+        return "router"
+    if isinstance(provider, OpenAIProvider):
+        return "openai"
+    if isinstance(provider, HuggingFaceProvider):
+        return "huggingface"
+    return type(provider).__name__
+
+
+def _record_upstream_error(provider: AIProvider) -> None:
+    # Derrière le routeur, chaque backend en échec est déjà compté sous son propre nom.
+    if not isinstance(provider, ProviderRouter):
+        UPSTREAM_ERRORS.inc(provider=_provider_label(provider))
+
+
+def _observe_generation(label: str, started: float, first_token_at: float | None, text: str) -> None:
+    elapsed = time.perf_counter() - started
+    GENERATION_SECONDS.observe(elapsed, provider=label)
+    if first_token_at is not None:
+        TIME_TO_FIRST_TOKEN.observe(first_token_at - started, provider=label)
+    # Débit mesuré après le premier token, pour ne pas y mêler la latence initiale.
+    decode_time = elapsed - (first_token_at - started if first_token_at is not None else 0.0)
+    if text and decode_time > 0:
+        TOKENS_PER_SECOND.observe(count_tokens(text) / decode_time, provider=label)
+
+
+async def _admit(priority: str | None) -> AdmissionTicket:
+    """Wait for a /chat slot, or turn the rejection into a 429/503 with Retry-After."""
+
+    try:
+        return await _admission.acquire(priority or DEFAULT_PRIORITY)
+    except AdmissionRejected as exc:
+        raise HTTPException(
+            exc.status_code, exc.detail, headers={"Retry-After": str(exc.retry_after)}
+        ) from exc
+
+
+@app.post("/chat")
+async def chat(
+    text: str = Form(...),
+    files: list[UploadFile] | None = File(default=None),
+    stream: bool = Form(default=False),
+    conversation_id: Annotated[str | None, Form()] = None,
+    priority: Annotated[str | None, Form()] = None,
+):
+    ticket: AdmissionTicket | None = None
+    ticket_handed_to_stream = False
+    try:
+        await _ensure_provider()
+        if _provider_error is not None:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=str(_provider_error),
             )
 
-        if prompt_sections:
-            prompt_sections.append("Nouvelle demande :\n" + text)
-            prompt = "\n\n".join(prompt_sections)
+        if _provider is None:
+            raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, "AI provider not initialised")
+
+        stream_requested = bool(stream)
+        conversation_key = conversation_id or DEFAULT_CONVERSATION_ID
+        # Les requêtes au-delà du plafond attendent ici, avant de lancer le moindre thread.
+        ticket = await _admit(priority)
+
+        # Étapes indépendantes exécutées en parallèle : le délai avant le premier
+        # token est borné par l'étape la plus lente, et non par leur somme.
+        history_task = asyncio.ensure_future(_load_history(conversation_key))
+        (
+            attachments,
+            relevant_memories,
+            history,
+            summary,
+            cached_response,
+        ) = await asyncio.gather(
+            _ingest_attachments(files or []),
+            _retrieve_memories(text),
+            history_task,
+            _load_history_summary(conversation_key, history_task),
+            _lookup_cached_response(text, has_attachments=bool(files), history=history_task),
+        )
+
+        with STAGE_SECONDS.time(stage="prompt_build"):
+            prompt = _build_prompt(text, history, relevant_memories, attachments, summary=summary)
+        model = _select_model(text, attachments, relevant_memories, history)
 
         history_question = text
         if attachments:
@@ -245,80 +901,142 @@ async def chat(
                 + "]"
             )
 
-        def handle_response(response_text: str) -> None:
-            if _memory is not None:
+        async def handle_response(response_text: str, reused: bool = False) -> None:
+            # La persistance est différée : la réponse n'attend jamais la mémoire vectorielle.
+            # Une réponse réutilisée (cache, génération partagée) n'est mémorisée qu'une fois.
+            if _memory_writer is not None and not reused:
                 try:
                     attachment_note = ""
                     if attachments:
                         attachment_note = "\nFichiers partagés : " + ", ".join(
                             attachment.filename for attachment in attachments
                         )
-                    _memory.add_memory(
+                    _memory_writer.enqueue(
                         f"Utilisateur : {text}{attachment_note}\nJarvis : {response_text}",
                         metadata={"source": "conversation"},
                     )
                 except Exception as exc:  # pragma: no cover - log only
                     print("⚠️ Impossible d'enregistrer la mémoire vectorielle:", exc)
 
-            _recent_history.append((history_question, response_text))
+            try:
+                # Écriture attendue (la question suivante doit la voir), mais hors de la boucle :
+                # le backend SQLite peut attendre jusqu'à 5 s un verrou.
+                await run_in_thread(
+                    _history_store.append, conversation_key, history_question, response_text
+                )
+            except Exception as exc:  # pragma: no cover - log only
+                print("⚠️ Impossible d'enregistrer l'historique:", exc)
+
+            if _response_cache is not None and not reused and not attachments and not history:
+                _run_in_background(_store_cached_response, text, response_text)
+
+        if cached_response is not None:
+            _close_attachments(attachments)
+            await handle_response(cached_response, reused=True)
+            if stream_requested:
+
+                async def cached_generator():
+                    yield cached_response
+
+                return StreamingResponse(
+                    cached_generator(), media_type="text/plain; charset=utf-8"
+                )
+            return {"response": cached_response, "cached": True}
+
+        # Les requêtes identiques déjà en cours se greffent sur la même génération.
+        key = flight_key(
+            "stream" if stream_requested else "full",
+            model,
+            prompt,
+            attachment_hashes=[attachment.content_hash() for attachment in attachments],
+        )
 
         if stream_requested:
 
+            async def generate_chunks():
+                label = _provider_label(_provider)
+                started = time.perf_counter()
+                first_token_at: float | None = None
+                parts: list[str] = []
+                try:
+                    async for chunk in _stream_provider_response(
+                        _provider, prompt, attachments, model
+                    ):
+                        if first_token_at is None and chunk:
+                            first_token_at = time.perf_counter()
+                        parts.append(chunk)
+                        yield chunk
+                except ProviderRequestError:
+                    _record_upstream_error(_provider)
+                    raise
+                else:
+                    _observe_generation(label, started, first_token_at, "".join(parts))
+                finally:
+                    _close_attachments(attachments)
+
+            chunks, leader = _single_flight.stream(
+                key, generate_chunks, on_discard=lambda: _close_attachments(attachments)
+            )
+            if not leader:
+                _close_attachments(attachments)
+
             async def streaming_generator():
-                loop = asyncio.get_running_loop()
-                queue: asyncio.Queue[tuple[str | None, Exception | None]] = asyncio.Queue()
-
-                def produce() -> None:
-                    try:
-                        for chunk in _provider.stream_response(prompt, attachments):
-                            asyncio.run_coroutine_threadsafe(queue.put((chunk, None)), loop)
-                    except Exception as exc:
-                        asyncio.run_coroutine_threadsafe(queue.put((None, exc)), loop)
-                    finally:
-                        asyncio.run_coroutine_threadsafe(queue.put((None, None)), loop)
-
-                producer_task = asyncio.create_task(asyncio.to_thread(produce))
                 final_parts: list[str] = []
-                cancelled = False
 
                 try:
-                    while True:
-                        chunk, error = await queue.get()
-                        if error is not None:
-                            await producer_task
-                            if isinstance(error, ProviderRequestError):
-                                raise HTTPException(status.HTTP_502_BAD_GATEWAY, str(error)) from error
-                            raise HTTPException(
-                                status.HTTP_500_INTERNAL_SERVER_ERROR, str(error)
-                            ) from error
-                        if chunk is None:
-                            break
-                        if chunk:
-                            final_parts.append(chunk)
-                            yield chunk
-                except asyncio.CancelledError:
-                    cancelled = True
+                    async with aclosing(chunks) as shared_chunks:
+                        async for chunk in shared_chunks:
+                            if chunk:
+                                final_parts.append(chunk)
+                                yield chunk
+                except ProviderRequestError as exc:
+                    raise HTTPException(status.HTTP_502_BAD_GATEWAY, str(exc)) from exc
+                except Exception as exc:
+                    raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, str(exc)) from exc
                 finally:
-                    await producer_task
-
-                if cancelled:
-                    return
+                    ticket.release()
 
                 response_text = "".join(final_parts).strip() or "(Réponse vide)"
-                handle_response(response_text)
+                await handle_response(response_text, reused=not leader)
 
+            async def release_stream() -> None:
+                # Corps jamais lu (client parti avant le premier octet) : l'abonnement est
+                # rendu pour que la génération partagée ne reste pas enregistrée.
+                chunks.release()
+                ticket.release()
+
+            # La place est tenue jusqu'à la fin du flux (libérée au plus tard après l'envoi).
+            ticket_handed_to_stream = True
             return StreamingResponse(
-                streaming_generator(), media_type="text/plain; charset=utf-8"
+                streaming_generator(),
+                media_type="text/plain; charset=utf-8",
+                background=BackgroundTask(release_stream),
             )
 
+        async def generate_text() -> str:
+            started = time.perf_counter()
+            try:
+                response_text = await _generate_provider_response(
+                    _provider, prompt, attachments, model
+                )
+            except ProviderRequestError:
+                _record_upstream_error(_provider)
+                raise
+            finally:
+                _close_attachments(attachments)
+            # Sans flux, pas de premier token distinct : le débit porte sur toute la durée.
+            _observe_generation(_provider_label(_provider), started, None, response_text)
+            return response_text
+
+        shared_response, leader = _single_flight.run(key, generate_text)
+        if not leader:
+            _close_attachments(attachments)
         try:
-            response_text = await asyncio.to_thread(
-                _provider.generate_response, prompt, attachments
-            )
+            response_text = await shared_response
         except ProviderRequestError as exc:
             raise HTTPException(status.HTTP_502_BAD_GATEWAY, str(exc)) from exc
 
-        handle_response(response_text)
+        await handle_response(response_text, reused=not leader)
 
         return {"response": response_text}
 
@@ -329,6 +1047,98 @@ async def chat(
         print("❌ ERREUR DANS /chat :", e)
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if ticket is not None and not ticket_handed_to_stream:
+            ticket.release()
+
+@app.get("/memory/stats")
+def memory_stats():
+    """Expose the write-behind queue depth, the embedding cache and the lifecycle counters."""
+
+    if _memory is None:
+        return {"enabled": False}
+
+    stats: dict[str, object] = {
+        "enabled": True,
+        "embedding_cache": _memory.embedding_cache_stats(),
+        "lifecycle": _memory.lifecycle_stats(),
+    }
+    if _memory_writer is not None:
+        stats["write_queue"] = _memory_writer.stats()
+    if _memory_compactor is not None:
+        stats["compaction"] = _memory_compactor.stats()
+    if _response_cache is not None:
+        stats["response_cache"] = _response_cache.stats()
+    return stats
+
+
+@app.get("/admission/stats")
+def admission_stats():
+    """Live concurrency, queue depth per priority class, wait times and request coalescing."""
+
+    return {
+        "priorities": list(PRIORITY_CLASSES),
+        **_admission.stats(),
+        "coalescing": _single_flight.stats(),
+    }
+
+
+@app.get("/metrics", response_class=Response)
+def metrics():
+    """Stage latencies, generation speed, queues and upstream errors in Prometheus text format."""
+
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process answers, whatever the state of its dependencies."""
+
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: status and initialisation time of the provider, memory and connections.
+
+    Answers 503 until the provider is ready; the memory may be disabled or
+    failed without making the server unready.
+    """
+
+    snapshot = _readiness.snapshot()
+    return JSONResponse(
+        snapshot,
+        status_code=status.HTTP_200_OK if snapshot["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
+
+@app.get("/provider/usage")
+def provider_usage():
+    """Report token usage, including prompt-cache hits, seen by the provider.
+
+    Behind the router, each backend is reported with its routing statistics.
+    """
+
+    if isinstance(_provider, ProviderRouter):
+        backends = [
+            {**stats, "usage": _usage_report(backend.provider)}
+            for backend, stats in zip(_provider.backends, _provider.stats())
+        ]
+        return {"available": True, "backends": backends}
+    return _usage_report(_provider)
+
+
+def _usage_report(provider: AIProvider | None) -> dict[str, object]:
+    usage = getattr(provider, "usage", None)
+    if usage is None:
+        return {"available": False}
+
+    report: dict[str, object] = {"available": True, **usage.as_dict()}
+    registry = getattr(provider, "attachment_registry", None)
+    if registry is not None:
+        report["attachment_registry"] = registry.stats()
+    return report
+
 
 @app.post("/api/realtime/session", response_class=Response)
 async def create_realtime_session(request: Request, model: str | None = None, voice: str | None = None):
@@ -366,13 +1176,12 @@ async def create_realtime_session(request: Request, model: str | None = None, vo
     }
 
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            upstream_response = await client.post(
-                "https://api.openai.com/v1/realtime",
-                params=upstream_params,
-                content=offer_payload,
-                headers=headers,
-            )
+        upstream_response = await _http_clients.async_client.post(
+            f"{_OPENAI_API_URL}/v1/realtime",
+            params=upstream_params,
+            content=offer_payload,
+            headers=headers,
+        )
     except httpx.RequestError as exc:
         raise HTTPException(
             status.HTTP_502_BAD_GATEWAY,
@@ -394,9 +1203,13 @@ async def create_realtime_session(request: Request, model: str | None = None, vo
     return Response(content=answer_sdp, media_type="application/sdp")
 
 
+def _transcription_available() -> bool:
+    return settings.transcription_backend == "stub" or bool(settings.openai_api_key)
+
+
 @app.post("/transcribe-audio")
 async def transcribe_audio(audio: UploadFile = File(...)):
-    if not settings.openai_api_key:
+    if not _transcription_available():
         raise HTTPException(
             status.HTTP_503_SERVICE_UNAVAILABLE,
             "La transcription vocale nécessite une clé API OpenAI.",
@@ -420,40 +1233,107 @@ async def transcribe_audio(audio: UploadFile = File(...)):
             "Le fichier audio est vide.",
         )
 
-    client = OpenAI(api_key=settings.openai_api_key)
+    try:
+        transcript = await _get_transcriber().transcribe(audio_bytes, original_filename)
+    except TranscriptionError as exc:
+        print("⚠️ Transcription audio échouée:", exc.__cause__ or exc)
+        raise HTTPException(
+            status.HTTP_502_BAD_GATEWAY,
+            "La transcription vocale a échoué.",
+        ) from exc
 
-    last_error: Exception | None = None
-    for model in _TRANSCRIPTION_MODELS:
-        audio_buffer = BytesIO(audio_bytes)
-        audio_buffer.name = original_filename
+    return {"text": transcript}
 
-        try:
-            result = client.audio.transcriptions.create(
-                model=model,
-                file=audio_buffer,
-            )
-        except Exception as exc:  # pragma: no cover - network/API failure
-            last_error = exc
-            continue
-
-        transcript = getattr(result, "text", None)
-        if isinstance(transcript, str):
-            stripped = transcript.strip()
-            if stripped:
-                return {"text": stripped}
-            last_error = RuntimeError("Réponse de transcription vide.")
-            continue
-
-        last_error = RuntimeError("Réponse de transcription invalide.")
-
-    if last_error is not None:  # pragma: no cover - log only
-        print("⚠️ Transcription audio échouée:", last_error)
-
-    raise HTTPException(
-        status.HTTP_502_BAD_GATEWAY,
-        "La transcription vocale a échoué.",
+
+@app.websocket("/ws/transcribe")
+async def transcribe_stream(websocket: WebSocket):
+    """Transcribe a recording while it is being captured.
+
+    The client sends the audio as binary frames and ``{"type": "stop"}`` at the
+    end of each utterance (``{"type": "start", "filename": ...}`` optionally
+    names the container). The server answers with ``partial`` messages as the
+    audio accumulates and one ``final`` message per utterance.
+
+    Each partial re-transcribes the whole recording; with the OpenAI backend
+    their cost is bounded by :class:`TranscriptionStream` and they can be
+    turned off with ``TRANSCRIPTION_REMOTE_PARTIALS=false``.
+    """
+
+    await websocket.accept()
+    if not _transcription_available():
+        await websocket.send_json(
+            {"type": "error", "detail": "La transcription vocale nécessite une clé API OpenAI."}
+        )
+        await websocket.close(code=1011)
+        return
+
+    stream = TranscriptionStream(
+        _get_transcriber(),
+        partial_interval=settings.transcription_partial_interval,
+        max_bytes=settings.transcription_stream_max_bytes,
+        partials=(
+            settings.transcription_backend.lower() == "stub"
+            or settings.transcription_remote_partials
+        ),
+        partial_growth=settings.transcription_partial_growth,
     )
+    partial_task: asyncio.Task | None = None
+
+    async def send_partial() -> None:
+        try:
+            transcript = await stream.partial()
+        except TranscriptionError as exc:
+            print("⚠️ Transcription partielle échouée:", exc.__cause__ or exc)
+            return
+        if transcript is not None:
+            await websocket.send_json({"type": "partial", "text": transcript})
+
+    async def cancel_partial() -> None:
+        if partial_task is not None and not partial_task.done():
+            partial_task.cancel()
+            await asyncio.gather(partial_task, return_exceptions=True)
 
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            chunk = message.get("bytes")
+            if chunk:
+                stream.feed(chunk)
+                # Une seule transcription partielle à la fois, sans bloquer la réception.
+                if (partial_task is None or partial_task.done()) and stream.partial_due():
+                    partial_task = asyncio.create_task(send_partial())
+                continue
+
+            try:
+                control = json.loads(message.get("text") or "{}")
+            except ValueError:
+                control = None
+            if not isinstance(control, dict):
+                await websocket.send_json(
+                    {"type": "error", "detail": "Message de contrôle invalide."}
+                )
+                continue
+            if control.get("type") == "start":
+                stream.filename = control.get("filename") or stream.filename
+            elif control.get("type") == "stop":
+                await cancel_partial()
+                try:
+                    transcript = await stream.finish()
+                except TranscriptionError as exc:
+                    print("⚠️ Transcription audio échouée:", exc.__cause__ or exc)
+                    await websocket.send_json({"type": "error", "detail": str(exc)})
+                else:
+                    await websocket.send_json({"type": "final", "text": transcript})
+    except WebSocketDisconnect:
+        pass
+    except TranscriptionError as exc:
+        await websocket.send_json({"type": "error", "detail": str(exc)})
+        await websocket.close(code=1009)
+    finally:
+        await cancel_partial()
 
 
 @app.get("/")
@@ -0,0 +1,177 @@
+"""Cache d'embeddings à deux niveaux (LRU en mémoire + SQLite sur disque)."""
+
+from __future__ import annotations
+
+from array import array
+from collections import OrderedDict
+import hashlib
+import sqlite3
+import threading
+from typing import Sequence
+
+
+def _normalise(text: str) -> str:
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """Content-hash keyed embedding cache.
+
+    Vectors are looked up in an in-memory LRU first, then in a compact SQLite
+    store (float32 blobs). Entries are keyed by ``sha256(model, text)`` and the
+    on-disk store is purged whenever it was written by a different model.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        path: str | None = None,
+        max_entries: int = 10_000,
+        max_disk_entries: int = 200_000,
+    ) -> None:
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self._lru: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        self._disk_count = 0
+
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used INTEGER NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)"
+            )
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'model'").fetchone()
+            if row is None or row[0] != model_name:
+                # Les vecteurs d'un autre modèle ne sont pas comparables : on repart de zéro.
+                self._db.execute("DELETE FROM embeddings")
+                self._db.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('model', ?)", (model_name,)
+                )
+            self._db.commit()
+            self._disk_count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self._clock = self._db.execute(
+                "SELECT COALESCE(MAX(last_used), 0) FROM embeddings"
+            ).fetchone()[0]
+        else:
+            self._clock = 0
+
+    def key(self, text: str) -> str:
+        """Return the cache key of ``text`` for the current model."""
+        payload = f"{self.model_name}\0{_normalise(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def get_many(self, texts: Sequence[str]) -> list[list[float] | None]:
+        """Return cached vectors for ``texts`` (``None`` for misses)."""
+
+        keys = [self.key(text) for text in texts]
+        results: list[list[float] | None] = []
+        promoted: list[str] = []
+
+        with self._lock:
+            for key in keys:
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                elif self._db is not None:
+                    row = self._db.execute(
+                        "SELECT vector FROM embeddings WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None:
+                        vector = array("f", row[0]).tolist()
+                        self._remember(key, vector)
+                        promoted.append(key)
+
+                if vector is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                results.append(vector)
+
+            if promoted and self._db is not None:
+                self._clock += 1
+                self._db.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(self._clock, key) for key in promoted],
+                )
+                self._db.commit()
+
+        return results
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """Store freshly computed vectors for ``texts``."""
+
+        rows = []
+        with self._lock:
+            self._clock += 1
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                values = [float(value) for value in vector]
+                self._remember(key, values)
+                rows.append((key, array("f", values).tobytes(), self._clock))
+
+            if self._db is not None and rows:
+                cursor = self._db.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                    rows,
+                )
+                self._disk_count += max(cursor.rowcount, 0)
+                if self._disk_count > self.max_disk_entries:
+                    self._evict_disk()
+                self._db.commit()
+
+    def _remember(self, key: str, vector: list[float]) -> None:
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        # Évince par lots (10 %) les entrées les moins récemment utilisées.
+        assert self._db is not None
+        target = int(self.max_disk_entries * 0.9)
+        excess = self._disk_count - target
+        self._db.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self._disk_count = target
+
+    def stats(self) -> dict[str, float | int | str]:
+        """Expose hit/miss counters and current sizes."""
+
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._lru),
+            "disk_entries": self._disk_count,
+        }
+
+    def clear(self) -> None:
+        """Drop every cached vector, in memory and on disk."""
+
+        with self._lock:
+            self._lru.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+                self._disk_count = 0
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
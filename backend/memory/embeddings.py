@@ -0,0 +1,216 @@
+"""Fonctions d'embedding de la mémoire vectorielle : API OpenAI ou modèles locaux sur CPU."""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+from pathlib import Path
+import re
+from typing import Callable, Sequence
+
+import httpx
+import numpy as np
+
+
+EMBEDDING_BACKENDS = ("openai", "onnx", "sentence-transformers", "hashing")
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class OpenAIEmbeddingFunction:
+    """Embed texts with the OpenAI embeddings API, in one request per batch."""
+
+    def __init__(
+        self,
+        api_key: str,
+        model_name: str = "text-embedding-3-small",
+        api_base: str | None = None,
+        http_client: httpx.Client | None = None,
+    ) -> None:
+        from openai import DEFAULT_TIMEOUT, OpenAI
+
+        self.model_name = model_name
+        # Sur le pool de connexions partagé lorsqu'il est fourni, comme le provider, avec
+        # les délais du SDK plutôt que ceux du pool.
+        self.client = OpenAI(
+            api_key=api_key, base_url=api_base, http_client=http_client, timeout=DEFAULT_TIMEOUT
+        )
+
+    def __call__(self, input: Sequence[str]) -> list[list[float]]:
+        texts = list(input)
+        if not texts:
+            return []
+        # L'API refuse les chaînes vides.
+        response = self.client.embeddings.create(
+            model=self.model_name, input=[text or " " for text in texts]
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+class HashingEmbeddingFunction:
+    """Bag-of-words feature hashing: stable, normalised vectors in microseconds.
+
+    Needs neither a model nor a network: similar wordings share words and so
+    directions, which is enough for deduplication and keyword-like recall.
+    """
+
+    def __init__(self, dimensions: int = 384) -> None:
+        self.dimensions = dimensions
+        self.model_name = f"hashing-{dimensions}"
+
+    def __call__(self, input: Sequence[str]) -> list[np.ndarray]:
+        return list(self.embed(list(input)))
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in _WORD_RE.findall(text.lower()):
+                digest = int.from_bytes(
+                    hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little"
+                )
+                matrix[row, digest % self.dimensions] += 1.0 if digest >> 63 else -1.0
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+class OnnxEmbeddingFunction:
+    """Run a sentence-transformer exported to ONNX with ``onnxruntime`` on CPU.
+
+    ``model_dir`` holds ``model.onnx`` (or ``onnx/model.onnx``) and the
+    Hugging Face ``tokenizer.json``. Token embeddings are mean-pooled over the
+    attention mask and L2-normalised, as ``sentence-transformers`` does.
+    """
+
+    def __init__(self, model_dir: str, max_length: int = 256, intra_op_threads: int = 1) -> None:
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        root = Path(model_dir)
+        model_path = next(
+            (path for path in (root / "model.onnx", root / "onnx" / "model.onnx") if path.exists()),
+            None,
+        )
+        if model_path is None:
+            raise FileNotFoundError(f"Aucun model.onnx dans {model_dir}")
+
+        self.model_name = f"onnx:{root.name}"
+        self.tokenizer = Tokenizer.from_file(str(root / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        # Le parallélisme vient des lots répartis entre threads, pas de chaque session.
+        options.intra_op_num_threads = intra_op_threads
+        self.session = onnxruntime.InferenceSession(
+            str(model_path), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def __call__(self, input: Sequence[str]) -> list[np.ndarray]:
+        texts = list(input)
+        if not texts:
+            return []
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+        }
+        output = self.session.run(
+            None, {name: value for name, value in feeds.items() if name in self.input_names}
+        )[0]
+        if output.ndim == 3:
+            weights = mask[:, :, None].astype(np.float32)
+            output = (output * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        norms = np.linalg.norm(output, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return list((output / norms).astype(np.float32))
+
+
+class SentenceTransformerEmbeddingFunction:
+    """Embed texts with a ``sentence-transformers`` model loaded on CPU."""
+
+    def __init__(self, model_name: str) -> None:
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = f"sentence-transformers:{model_name}"
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def __call__(self, input: Sequence[str]) -> list[np.ndarray]:
+        texts = list(input)
+        if not texts:
+            return []
+        return list(
+            self.model.encode(texts, batch_size=len(texts), normalize_embeddings=True)
+        )
+
+
+class BatchedEmbeddingFunction:
+    """Split large inputs into ``batch_size`` chunks embedded by a pool of ``workers`` threads.
+
+    ONNX Runtime and NumPy release the GIL, so batches run in parallel on
+    separate cores; a single small batch is embedded in the calling thread.
+    """
+
+    def __init__(
+        self,
+        function: Callable[[Sequence[str]], Sequence[Sequence[float]]],
+        batch_size: int = 32,
+        workers: int = 2,
+    ) -> None:
+        self.function = function
+        self.model_name: str = getattr(function, "model_name", "local")
+        self.batch_size = max(1, batch_size)
+        self._executor = (
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embedding")
+            if workers > 1
+            else None
+        )
+
+    def __call__(self, input: Sequence[str]) -> list:
+        texts = list(input)
+        batches = [
+            texts[start : start + self.batch_size] for start in range(0, len(texts), self.batch_size)
+        ]
+        if len(batches) <= 1 or self._executor is None:
+            return [vector for batch in batches for vector in self.function(batch)]
+        return [vector for vectors in self._executor.map(self.function, batches) for vector in vectors]
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+def create_embedding_function(
+    backend: str = "openai",
+    model: str = "text-embedding-3-small",
+    api_key: str = "",
+    api_base: str | None = None,
+    batch_size: int = 32,
+    workers: int = 2,
+    dimensions: int = 384,
+    http_client: httpx.Client | None = None,
+) -> Callable[[Sequence[str]], Sequence[Sequence[float]]]:
+    """Build the embedding function named by ``backend``.
+
+    ``model`` is the OpenAI model name, the ONNX model directory or the
+    ``sentence-transformers`` model name; the hashing backend ignores it.
+    Every function exposes ``model_name``, which namespaces the embedding cache.
+    """
+
+    normalized = backend.lower()
+    if normalized == "openai":
+        return OpenAIEmbeddingFunction(
+            api_key=api_key, model_name=model, api_base=api_base, http_client=http_client
+        )
+    if normalized == "onnx":
+        function: Callable = OnnxEmbeddingFunction(model)
+    elif normalized == "sentence-transformers":
+        function = SentenceTransformerEmbeddingFunction(model)
+    elif normalized == "hashing":
+        function = HashingEmbeddingFunction(dimensions)
+    else:
+        raise ValueError(f"Backend d'embeddings inconnu : {backend}")
+    return BatchedEmbeddingFunction(function, batch_size=batch_size, workers=workers)
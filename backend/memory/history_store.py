@@ -0,0 +1,276 @@
+"""Historique récent des échanges, par conversation."""
+
+from __future__ import annotations
+
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+import sqlite3
+import threading
+import time
+from typing import Callable, Protocol, runtime_checkable
+
+
+DEFAULT_CONVERSATION_ID = "default"
+
+
+@runtime_checkable
+class HistoryStore(Protocol):
+    """Common interface of the conversation history backends."""
+
+    def get(self, conversation_id: str) -> list[tuple[str, str]]:
+        """Return the recent ``(question, answer)`` pairs, oldest first."""
+
+    def append(self, conversation_id: str, question: str, answer: str) -> None:
+        """Record a new exchange, dropping the oldest beyond the limit."""
+
+    def clear(self, conversation_id: str) -> None:
+        """Forget a conversation."""
+
+    def get_summary(self, conversation_id: str) -> str:
+        """Return the rolling summary of the conversation's older exchanges."""
+
+    def set_summary(self, conversation_id: str, summary: str) -> None:
+        """Replace the rolling summary of an existing conversation."""
+
+
+def _normalise_ttl(idle_ttl: float | None) -> float | None:
+    """``None`` or a non-positive TTL disables idle expiry."""
+    return idle_ttl if idle_ttl is not None and idle_ttl > 0 else None
+
+
+@dataclass
+class _Session:
+    exchanges: deque[tuple[str, str]]
+    last_seen: float
+    summary: str = ""
+
+
+@dataclass
+class InMemoryHistoryStore:
+    """Process-local store: LRU over conversations with idle-TTL eviction.
+
+    Each conversation keeps at most ``limit`` exchanges in a bounded deque, and
+    at most ``max_conversations`` conversations are retained, each with its
+    rolling summary. An ``idle_ttl`` of ``None`` or ``<= 0`` keeps idle
+    conversations until LRU eviction.
+    """
+
+    limit: int = 5
+    max_conversations: int = 1000
+    idle_ttl: float | None = 3600.0
+    clock: Callable[[], float] = time.monotonic
+    _sessions: OrderedDict[str, _Session] = field(
+        default_factory=OrderedDict, init=False, repr=False
+    )
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.idle_ttl = _normalise_ttl(self.idle_ttl)
+
+    def get(self, conversation_id: str) -> list[tuple[str, str]]:
+        with self._lock:
+            session = self._touch(conversation_id, create=False)
+            return list(session.exchanges) if session is not None else []
+
+    def append(self, conversation_id: str, question: str, answer: str) -> None:
+        with self._lock:
+            session = self._touch(conversation_id, create=True)
+            assert session is not None
+            session.exchanges.append((question, answer))
+
+    def clear(self, conversation_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(conversation_id, None)
+
+    def get_summary(self, conversation_id: str) -> str:
+        with self._lock:
+            session = self._touch(conversation_id, create=False)
+            return session.summary if session is not None else ""
+
+    def set_summary(self, conversation_id: str, summary: str) -> None:
+        with self._lock:
+            session = self._touch(conversation_id, create=False)
+            if session is not None:
+                session.summary = summary
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _touch(self, conversation_id: str, create: bool) -> _Session | None:
+        now = self.clock()
+        self._evict_idle(now)
+
+        session = self._sessions.get(conversation_id)
+        if session is None:
+            if not create:
+                return None
+            session = _Session(deque(maxlen=self.limit), now)
+            self._sessions[conversation_id] = session
+            while len(self._sessions) > self.max_conversations:
+                self._sessions.popitem(last=False)
+
+        session.last_seen = now
+        self._sessions.move_to_end(conversation_id)
+        return session
+
+    def _evict_idle(self, now: float) -> None:
+        if self.idle_ttl is None:
+            return
+        # Les sessions sont triées par dernière activité : on s'arrête à la première récente.
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if now - oldest.last_seen <= self.idle_ttl:
+                break
+            del self._sessions[oldest_id]
+
+
+class SQLiteHistoryStore:
+    """SQLite store in WAL mode, shareable by several worker processes.
+
+    A conversation whose last exchange is older than ``idle_ttl`` seconds is
+    no longer served, is restarted from scratch by its next exchange and is
+    deleted by the next periodic purge, along with its rolling summary.
+    """
+
+    purge_interval = 60.0
+
+    def __init__(
+        self,
+        path: str,
+        limit: int = 5,
+        idle_ttl: float | None = 3600.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = path
+        self.limit = limit
+        self.idle_ttl = _normalise_ttl(idle_ttl)
+        self.clock = clock
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "conversation_id TEXT NOT NULL, "
+            "question TEXT NOT NULL, "
+            "answer TEXT NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS history_conversation ON history(conversation_id, seq)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS history_summary ("
+            "conversation_id TEXT PRIMARY KEY, "
+            "summary TEXT NOT NULL)"
+        )
+        self._db.commit()
+
+    def _expired(self, last_activity: float, now: float) -> bool:
+        return self.idle_ttl is not None and now - last_activity > self.idle_ttl
+
+    def get(self, conversation_id: str) -> list[tuple[str, str]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT question, answer, created_at FROM history WHERE conversation_id = ? "
+                "ORDER BY seq DESC LIMIT ?",
+                (conversation_id, self.limit),
+            ).fetchall()
+        # La ligne la plus récente date la dernière activité de la conversation.
+        if rows and self._expired(rows[0][2], self.clock()):
+            return []
+        return [(question, answer) for question, answer, _ in reversed(rows)]
+
+    def append(self, conversation_id: str, question: str, answer: str) -> None:
+        now = self.clock()
+        with self._lock, self._db:
+            # Une conversation expirée repart de zéro : ses anciens échanges et son
+            # résumé ne doivent pas réapparaître à côté du nouvel échange.
+            last = self._db.execute(
+                "SELECT created_at FROM history WHERE conversation_id = ? "
+                "ORDER BY seq DESC LIMIT 1",
+                (conversation_id,),
+            ).fetchone()
+            if last is not None and self._expired(last[0], now):
+                self._delete(conversation_id)
+            self._db.execute(
+                "INSERT INTO history (conversation_id, question, answer, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (conversation_id, question, answer, now),
+            )
+            # Borne la conversation à ``limit`` lignes en ne parcourant que son index.
+            self._db.execute(
+                "DELETE FROM history WHERE conversation_id = ? AND seq < ("
+                "SELECT MIN(seq) FROM (SELECT seq FROM history WHERE conversation_id = ? "
+                "ORDER BY seq DESC LIMIT ?))",
+                (conversation_id, conversation_id, self.limit),
+            )
+            if self.idle_ttl is not None and now - self._last_purge >= self.purge_interval:
+                self._last_purge = now
+                self._db.execute(
+                    "DELETE FROM history WHERE conversation_id IN ("
+                    "SELECT conversation_id FROM history GROUP BY conversation_id "
+                    "HAVING MAX(created_at) < ?)",
+                    (now - self.idle_ttl,),
+                )
+                self._db.execute(
+                    "DELETE FROM history_summary WHERE NOT EXISTS (SELECT 1 FROM history "
+                    "WHERE history.conversation_id = history_summary.conversation_id)"
+                )
+
+    def clear(self, conversation_id: str) -> None:
+        with self._lock, self._db:
+            self._delete(conversation_id)
+
+    def get_summary(self, conversation_id: str) -> str:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT summary, (SELECT created_at FROM history WHERE conversation_id = ? "
+                "ORDER BY seq DESC LIMIT 1) FROM history_summary WHERE conversation_id = ?",
+                (conversation_id, conversation_id),
+            ).fetchone()
+        # Le résumé suit le sort des échanges : sans historique servi, pas de résumé.
+        if row is None or row[1] is None or self._expired(row[1], self.clock()):
+            return ""
+        return row[0]
+
+    def set_summary(self, conversation_id: str, summary: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO history_summary (conversation_id, summary) VALUES (?, ?) "
+                "ON CONFLICT(conversation_id) DO UPDATE SET summary = excluded.summary",
+                (conversation_id, summary),
+            )
+
+    def _delete(self, conversation_id: str) -> None:
+        self._db.execute("DELETE FROM history WHERE conversation_id = ?", (conversation_id,))
+        self._db.execute(
+            "DELETE FROM history_summary WHERE conversation_id = ?", (conversation_id,)
+        )
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def create_history_store(
+    backend: str,
+    limit: int = 5,
+    path: str | None = None,
+    max_conversations: int = 1000,
+    idle_ttl: float | None = 3600.0,
+) -> HistoryStore:
+    """Factory that instantiates the configured history backend."""
+
+    normalized = backend.lower()
+    if normalized == "memory":
+        return InMemoryHistoryStore(
+            limit=limit, max_conversations=max_conversations, idle_ttl=idle_ttl
+        )
+    if normalized == "sqlite":
+        if not path:
+            raise ValueError("Un chemin de base SQLite est requis pour l'historique.")
+        return SQLiteHistoryStore(path, limit=limit, idle_ttl=idle_ttl)
+
+    raise ValueError(f"Unknown history backend '{backend}'")
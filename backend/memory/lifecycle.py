@@ -0,0 +1,135 @@
+"""Cycle de vie des souvenirs : importance, fusion des quasi-doublons et compaction périodique."""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Protocol
+
+import numpy as np
+
+from backend.services.metrics import STAGE_SECONDS
+
+
+# Champs de métadonnées gérés par la mémoire (les autres viennent de l'appelant).
+LIFECYCLE_FIELDS = ("created_at", "last_accessed", "access_count", "merge_count", "expires_at")
+
+
+def importance(metadata: dict | None, now: float, half_life: float) -> float:
+    """Score of a memory: uses and merges, decayed by the time since it was last useful.
+
+    A memory starts at 1, gains 1 per retrieval and per merged near-duplicate,
+    and halves every ``half_life`` seconds without being retrieved. An optional
+    ``importance`` metadata value multiplies the result.
+    """
+
+    metadata = metadata or {}
+    uses = 1.0 + float(metadata.get("access_count", 0)) + float(metadata.get("merge_count", 0))
+    last_useful = float(metadata.get("last_accessed", metadata.get("created_at", now)))
+    age = max(now - last_useful, 0.0)
+    decay = 0.5 ** (age / half_life) if half_life > 0 else 1.0
+    return float(metadata.get("importance", 1.0)) * uses * decay
+
+
+def is_expired(metadata: dict | None, now: float) -> bool:
+    expires_at = (metadata or {}).get("expires_at")
+    return expires_at is not None and float(expires_at) <= now
+
+
+def merge_metadata(existing: dict | None, incoming: dict) -> dict:
+    """Metadata of a memory absorbing a near-duplicate: counters add up, dates widen."""
+
+    existing = existing or {}
+    merged = {**existing, **incoming}
+    merged["created_at"] = min(
+        float(existing.get("created_at", incoming["created_at"])), float(incoming["created_at"])
+    )
+    merged["last_accessed"] = max(
+        float(existing.get("last_accessed", 0.0)), float(incoming["last_accessed"])
+    )
+    merged["access_count"] = int(existing.get("access_count", 0)) + int(
+        incoming.get("access_count", 0)
+    )
+    merged["merge_count"] = (
+        int(existing.get("merge_count", 0)) + int(incoming.get("merge_count", 0)) + 1
+    )
+    if "expires_at" in existing and "expires_at" in incoming:
+        merged["expires_at"] = max(float(existing["expires_at"]), float(incoming["expires_at"]))
+    else:
+        # Un souvenir sans expiration le reste après fusion.
+        merged.pop("expires_at", None)
+    return merged
+
+
+def cosine_similarities(vector: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """Cosine similarity between ``vector`` and each row of ``matrix``."""
+
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector)
+    norms[norms == 0] = 1.0
+    return (matrix @ vector) / norms
+
+
+class CompactableMemory(Protocol):
+    def compact(self) -> dict[str, int]:
+        """Apply the lifecycle policy once; return what was removed."""
+
+
+class MemoryCompactor:
+    """Run ``memory.compact()`` from a daemon thread every ``interval`` seconds.
+
+    Compaction flushes the buffered access counters, deletes expired memories,
+    evicts (or summarises) the lowest-importance ones above the size limit and
+    reclaims the storage they used, so that neither the index nor the query
+    latency grow without bound.
+    """
+
+    def __init__(self, memory: CompactableMemory, interval: float = 3600.0) -> None:
+        self.memory = memory
+        self.interval = interval
+        self.runs = 0
+        self.failed = 0
+        self.totals: dict[str, int] = {}
+        self.last_duration = 0.0
+        self._stop = threading.Event()
+        self._run_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="memory-compactor", daemon=True)
+
+    def start(self) -> "MemoryCompactor":
+        if self.interval > 0:
+            self._thread.start()
+        return self
+
+    def run_once(self) -> dict[str, int]:
+        """Compact synchronously; return the counters of this run."""
+
+        with self._run_lock:
+            started = time.perf_counter()
+            try:
+                with STAGE_SECONDS.time(stage="memory_compaction"):
+                    result = self.memory.compact()
+            except Exception as exc:  # pragma: no cover - log only
+                self.failed += 1
+                print("⚠️ Impossible de compacter la mémoire vectorielle:", exc)
+                return {}
+            self.last_duration = time.perf_counter() - started
+            self.runs += 1
+            for key, value in result.items():
+                self.totals[key] = self.totals.get(key, 0) + value
+            return result
+
+    def close(self, timeout: float | None = 10.0) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def stats(self) -> dict[str, float | int]:
+        return {
+            "runs": self.runs,
+            "failed": self.failed,
+            "last_duration_ms": round(1000 * self.last_duration, 3),
+            **self.totals,
+        }
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.run_once()
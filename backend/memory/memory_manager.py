@@ -2,40 +2,376 @@
 
 from __future__ import annotations
 
+import json
+from pathlib import Path
+import threading
+import time
+from typing import Callable, Sequence
 from uuid import uuid4
 
-import chromadb
-from chromadb.utils import embedding_functions
+import httpx
+import numpy as np
+
+from backend.memory.embedding_cache import EmbeddingCache
+from backend.memory.embeddings import create_embedding_function
+from backend.memory.lifecycle import (
+    cosine_similarities,
+    importance,
+    is_expired,
+    merge_metadata,
+)
+from backend.memory.vector_backends import VectorBackend, create_vector_backend
+
+
+EmbeddingFunction = Callable[[Sequence[str]], Sequence[Sequence[float]]]
+
+MEMORY_COLLECTION = "jarvis_memory"
+# Modèle des magasins créés avant embedding_model.json (seul backend d'embeddings d'alors).
+LEGACY_EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+def default_persist_dir(vector_backend: str) -> Path:
+    """Dossier par défaut du magasin vectoriel, un par backend."""
+    store_name = "chroma_store" if vector_backend == "chroma" else "matrix_store"
+    return Path(__file__).resolve().parent / store_name
+
+
+class CachedEmbeddingFunction:
+    """Fait passer chaque calcul d'embedding par un :class:`EmbeddingCache`."""
+
+    def __init__(self, embedding_function: EmbeddingFunction, cache: EmbeddingCache) -> None:
+        self.embedding_function = embedding_function
+        self.cache = cache
+
+    def __call__(self, input: Sequence[str]) -> list[list[float]]:
+        texts = list(input)
+        vectors = self.cache.get_many(texts)
+
+        # Un seul appel réseau groupé pour les textes absents du cache (sans doublons).
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            computed = {
+                text: [float(value) for value in vector]
+                for text, vector in zip(missing, self.embedding_function(missing))
+            }
+            self.cache.put_many(missing, [computed[text] for text in missing])
+            vectors = [
+                vector if vector is not None else computed[text]
+                for text, vector in zip(texts, vectors)
+            ]
+
+        return vectors  # type: ignore[return-value]
+
+
+def _check_embedding_model(persist_dir: Path, model_name: str) -> None:
+    """Refuse un magasin rempli par un autre modèle : ses vecteurs ne seraient pas comparables.
+
+    À appeler avant d'ouvrir le backend, qui crée ses fichiers dans ``persist_dir``.
+    """
+    marker = persist_dir / "embedding_model.json"
+    if marker.exists():
+        stored = json.loads(marker.read_text(encoding="utf-8")).get("model")
+    elif persist_dir.is_dir() and any(persist_dir.iterdir()):
+        # Magasin antérieur au marqueur : rempli par le seul modèle disponible à l'époque.
+        stored = LEGACY_EMBEDDING_MODEL
+    else:
+        stored = None
+    if stored and stored != model_name:
+        raise RuntimeError(
+            f"La mémoire de {persist_dir} a été construite avec « {stored} », pas « {model_name} » : "
+            "lancez python -m backend.memory.reembed pour la migrer."
+        )
+    if not marker.exists():
+        persist_dir.mkdir(parents=True, exist_ok=True)
+        marker.write_text(json.dumps({"model": model_name}), encoding="utf-8")
+
 
 class VectorMemory:
-    def __init__(self, api_key: str, persist_dir: str = "./memory/chroma"):
-        self.client = chromadb.PersistentClient(path=persist_dir)
+    """Mémoire à long terme : souvenirs embarqués puis stockés dans un backend vectoriel.
+
+    ``backend`` vaut « chroma » (``chromadb.PersistentClient``) ou « matrix »
+    (matrice NumPy mappée en mémoire, voir :class:`MatrixCollection`), ou est
+    directement une instance de :class:`VectorBackend`. Les embeddings viennent de
+    l'API OpenAI ou d'un modèle local (``embedding_backend`` : « onnx »,
+    « sentence-transformers » ou « hashing », voir :mod:`backend.memory.embeddings`) ;
+    un magasin reste lié au modèle qui l'a rempli (voir :mod:`backend.memory.reembed`).
+
+    Cycle de vie : un souvenir dont la similarité cosinus avec un souvenir
+    existant atteint ``dedup_threshold`` le remplace en cumulant ses compteurs ;
+    ``ttl`` (secondes, 0 = jamais) fixe l'expiration par défaut ; chaque
+    souvenir renvoyé par ``retrieve_relevant`` gagne en importance (voir
+    :func:`importance`) et :meth:`compact` évince les moins importants au-delà
+    de ``max_entries``, en les résumant d'abord si un ``summarizer`` est fourni.
+    """
 
-        # Utilise OpenAI pour générer les embeddings
-        self.embedding_function = embedding_functions.OpenAIEmbeddingFunction(
-            api_key=api_key,
-            model_name="text-embedding-3-small"  # rapide et précis
+    def __init__(
+        self,
+        api_key: str,
+        persist_dir: str = "./memory/chroma",
+        embedding_model: str = "text-embedding-3-small",
+        embedding_cache_size: int = 10_000,
+        embedding_cache_disk_size: int = 200_000,
+        embedding_function: EmbeddingFunction | None = None,
+        api_base: str | None = None,
+        http_client: httpx.Client | None = None,
+        embedding_backend: str = "openai",
+        embedding_batch_size: int = 32,
+        embedding_workers: int = 2,
+        backend: str | VectorBackend = "chroma",
+        index_dtype: str = "float32",
+        hnsw_threshold: int = 50_000,
+        dedup_threshold: float = 0.95,
+        ttl: float = 0.0,
+        max_entries: int = 0,
+        importance_half_life: float = 14 * 24 * 3600,
+        summarizer: Callable[[list[str]], str] | None = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        # OpenAI ou modèle local (voir :func:`create_embedding_function`), derrière un cache LRU + disque
+        if embedding_function is None:
+            embedding_function = create_embedding_function(
+                embedding_backend,
+                embedding_model,  # rapide et précis
+                api_key=api_key,
+                api_base=api_base,
+                http_client=http_client,
+                batch_size=embedding_batch_size,
+                workers=embedding_workers,
+            )
+        self.embedding_model: str = getattr(embedding_function, "model_name", embedding_model)
+        _check_embedding_model(Path(persist_dir), self.embedding_model)
+        if isinstance(backend, str):
+            backend = create_vector_backend(
+                backend, persist_dir, dtype=index_dtype, hnsw_threshold=hnsw_threshold
+            )
+        self.backend = backend
+        self.embedding_cache = EmbeddingCache(
+            model_name=self.embedding_model,
+            path=str(Path(persist_dir) / "embedding_cache.sqlite3"),
+            max_entries=embedding_cache_size,
+            max_disk_entries=embedding_cache_disk_size,
         )
+        self._raw_embedding_function = embedding_function
+        self.embedding_function = CachedEmbeddingFunction(embedding_function, self.embedding_cache)
 
         # Collection principale pour les souvenirs
-        self.collection = self.client.get_or_create_collection(
-            name="jarvis_memory",
-            embedding_function=self.embedding_function
-        )
+        self.collection = self.backend.get_collection(MEMORY_COLLECTION, self.embedding_function)
+
+        self.dedup_threshold = dedup_threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.importance_half_life = importance_half_life
+        self.summarizer = summarizer
+        self.clock = clock
+        self.merged = 0
+        # Accès aux souvenirs accumulés en mémoire, écrits par lots lors de la compaction.
+        self._accesses: dict[str, tuple[int, float]] = {}
+        self._access_lock = threading.Lock()
 
-    def add_memory(self, content: str, metadata: dict | None = None) -> None:
+    def add_memory(self, content: str, metadata: dict | None = None, ttl: float | None = None) -> None:
         """Ajoute une information à la mémoire vectorielle."""
-        self.collection.add(
-            documents=[content],
-            metadatas=[metadata or {}],
-            ids=[f"mem_{uuid4()}"],
+        self.add_memories([content], [metadata or {}], ttl=ttl)
+
+    def add_memories(
+        self, contents: list[str], metadatas: list[dict] | None = None, ttl: float | None = None
+    ) -> None:
+        """Ajoute plusieurs souvenirs avec un seul calcul d'embeddings groupé.
+
+        Les quasi-doublons (entre eux ou avec un souvenir existant) sont fusionnés :
+        le texte le plus récent remplace l'ancien et les compteurs s'additionnent.
+        """
+        if not contents:
+            return
+        now = self.clock()
+        ttl = self.ttl if ttl is None else ttl
+        vectors = np.asarray(self.embedding_function(contents), dtype=np.float32)
+
+        incoming = []
+        for metadata in metadatas or [{}] * len(contents):
+            metadata = {
+                **(metadata or {}),
+                "created_at": now,
+                "last_accessed": now,
+                "access_count": 0,
+                "merge_count": 0,
+            }
+            if ttl > 0:
+                metadata.setdefault("expires_at", now + ttl)
+            incoming.append(metadata)
+
+        # Un seul appel groupé au backend pour trouver le plus proche voisin de chaque souvenir.
+        neighbours: list[tuple[str, np.ndarray, dict | None] | None] = [None] * len(contents)
+        if self.dedup_threshold > 0 and self.collection.count():
+            found = self.collection.query(
+                query_embeddings=vectors.tolist(),
+                n_results=1,
+                include=["embeddings", "metadatas"],
+            )
+            for index, ids in enumerate(found.get("ids") or []):
+                if ids:
+                    neighbours[index] = (
+                        ids[0],
+                        np.asarray(found["embeddings"][index][0], dtype=np.float32),
+                        found["metadatas"][index][0],
+                    )
+
+        pending: dict[str, tuple[str, np.ndarray, dict]] = {}
+        for content, vector, metadata, neighbour in zip(contents, vectors, incoming, neighbours):
+            target, best = None, self.dedup_threshold
+            if self.dedup_threshold > 0 and pending:
+                keys = list(pending)
+                similarities = cosine_similarities(
+                    vector, np.stack([pending[key][1] for key in keys])
+                )
+                if similarities.max() >= best:
+                    target, best = keys[int(similarities.argmax())], float(similarities.max())
+            if neighbour is not None:
+                similarity = float(cosine_similarities(vector, neighbour[1][None, :])[0])
+                if similarity >= best:
+                    target = neighbour[0]
+
+            if target is None:
+                pending[f"mem_{uuid4()}"] = (content, vector, metadata)
+                continue
+            previous = pending[target][2] if target in pending else neighbour[2]  # type: ignore[index]
+            pending[target] = (content, vector, merge_metadata(previous, metadata))
+            self.merged += 1
+
+        ids = list(pending)
+        self.collection.upsert(
+            ids=ids,
+            embeddings=np.stack([pending[id_][1] for id_ in ids]).tolist(),
+            documents=[pending[id_][0] for id_ in ids],
+            metadatas=[pending[id_][2] for id_ in ids],
         )
 
     def retrieve_relevant(self, query: str, n: int = 5) -> list[str]:
         """Recherche les souvenirs les plus pertinents pour une question."""
-        results = self.collection.query(query_texts=[query], n_results=n)
-        return list(results.get("documents", [[]])[0])
+        results = self.collection.query(
+            query_embeddings=self.embedding_function([query]),
+            n_results=n,
+            include=["documents", "metadatas"],
+        )
+        now = self.clock()
+        ids = (results.get("ids") or [[]])[0]
+        documents = (results.get("documents") or [[]])[0]
+        metadatas = (results.get("metadatas") or [[]])[0] or [None] * len(ids)
+
+        relevant = []
+        with self._access_lock:
+            for id_, document, metadata in zip(ids, documents, metadatas):
+                # Expiré mais pas encore évincé par la compaction.
+                if is_expired(metadata, now):
+                    continue
+                count, _ = self._accesses.get(id_, (0, now))
+                self._accesses[id_] = (count + 1, now)
+                relevant.append(document)
+        return relevant
+
+    def flush_accesses(self) -> int:
+        """Écrit les compteurs d'accès accumulés ; renvoie le nombre de souvenirs mis à jour."""
+        with self._access_lock:
+            accesses, self._accesses = self._accesses, {}
+        if not accesses:
+            return 0
+        found = self.collection.get(ids=list(accesses), include=["metadatas"])
+        ids = list(found.get("ids") or [])
+        if not ids:
+            return 0
+        metadatas = []
+        for id_, metadata in zip(ids, found.get("metadatas") or [None] * len(ids)):
+            count, last_accessed = accesses[id_]
+            metadata = dict(metadata or {})
+            metadata["access_count"] = int(metadata.get("access_count", 0)) + count
+            metadata["last_accessed"] = max(float(metadata.get("last_accessed", 0.0)), last_accessed)
+            metadatas.append(metadata)
+        self.collection.update(ids=ids, metadatas=metadatas)
+        return len(ids)
+
+    def compact(self) -> dict[str, int]:
+        """Évince les souvenirs expirés puis les moins importants au-delà de ``max_entries``."""
+        accessed = self.flush_accesses()
+        now = self.clock()
+        found = self.collection.get(include=["metadatas"])
+        ids = list(found.get("ids") or [])
+        metadatas = list(found.get("metadatas") or [None] * len(ids))
+
+        expired = [id_ for id_, metadata in zip(ids, metadatas) if is_expired(metadata, now)]
+        evicted: list[str] = []
+        live = len(ids) - len(expired)
+        if self.max_entries > 0 and live > self.max_entries:
+            # Marge de 10 % : la compaction suivante n'a pas à évincer dès le premier ajout.
+            excess = live - int(self.max_entries * 0.9)
+            expired_ids = set(expired)
+            candidates = [
+                (importance(metadata, now, self.importance_half_life), id_)
+                for id_, metadata in zip(ids, metadatas)
+                if id_ not in expired_ids
+            ]
+            evicted = [id_ for _, id_ in sorted(candidates)[:excess]]
+
+        documents: list[str] = []
+        if evicted and self.summarizer is not None:
+            documents = self.collection.get(ids=evicted, include=["documents"]).get("documents") or []
+
+        removed = expired + evicted
+        batch_size = self.backend.max_batch_size
+        for start in range(0, len(removed), batch_size):
+            self.collection.delete(ids=removed[start : start + batch_size])
+
+        # Le résumé est ajouté après la suppression : il ne peut pas fusionner avec un souvenir évincé.
+        summarized = 0
+        if documents:
+            summary = self.summarizer([document for document in documents if document])  # type: ignore[misc]
+            if summary:
+                self.add_memories([summary], [{"source": "summary", "summarized": len(evicted)}])
+                summarized = len(evicted)
+
+        # Le backend « matrix » ne récupère la place des lignes supprimées ou remplacées
+        # qu'en réécrivant ses fichiers.
+        reclaimed = 0
+        dead_rows = getattr(self.collection, "dead_rows", 0)
+        if dead_rows and dead_rows > 0.25 * self.collection.count():
+            reclaimed = self.collection.compact()
+
+        return {
+            "accessed": accessed,
+            "expired": len(expired),
+            "evicted": len(evicted),
+            "summarized": summarized,
+            "reclaimed": reclaimed,
+        }
+
+    def get_collection(self, name: str):
+        """Collection annexe (espace cosinus) partageant le backend et les embeddings."""
+        return self.backend.get_collection(name, self.embedding_function, space="cosine")
+
+    def embedding_cache_stats(self) -> dict[str, float | int | str]:
+        """Statistiques du cache d'embeddings (hits, misses, tailles)."""
+        return self.embedding_cache.stats()
+
+    def lifecycle_stats(self) -> dict[str, int]:
+        """Taille de la collection, fusions et accès en attente d'écriture."""
+        return {
+            "entries": self.collection.count(),
+            "max_entries": self.max_entries,
+            "merged": self.merged,
+            "pending_accesses": len(self._accesses),
+        }
 
     def clear_memory(self) -> None:
         """Efface toute la mémoire."""
+        with self._access_lock:
+            self._accesses.clear()
         self.collection.delete(where={})
+
+    def close(self) -> None:
+        """Sauvegarde ce qui doit l'être (accès en attente, index HNSW du backend « matrix »)."""
+        try:
+            self.flush_accesses()
+        except Exception as exc:  # pragma: no cover - log only
+            print("⚠️ Impossible d'enregistrer les accès à la mémoire:", exc)
+        close_embeddings = getattr(self._raw_embedding_function, "close", None)
+        if close_embeddings is not None:
+            close_embeddings()
+        self.backend.close()
@@ -0,0 +1,173 @@
+"""Migration d'un magasin vectoriel vers un autre modèle d'embedding.
+
+Les vecteurs de deux modèles ne sont pas comparables (ni même, souvent, de
+même dimension) : changer ``EMBEDDING_BACKEND`` ou ``EMBEDDING_MODEL`` impose
+de recalculer chaque souvenir. L'outil relit les textes et métadonnées du
+magasin actuel, les embarque par lots avec le nouveau modèle et écrit un
+nouveau magasin, éventuellement sur un autre backend vectoriel ::
+
+    EMBEDDING_BACKEND=hashing python -m backend.memory.reembed --replace
+    python -m backend.memory.reembed --source ./old --target ./new \\
+        --embedding-backend onnx --embedding-model ./models/all-MiniLM-L6-v2
+
+Sans ``--replace`` les souvenirs de la source ne sont jamais modifiés ; avec,
+la source est renommée en ``<source>.bak`` une fois la copie terminée.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+import shutil
+import sys
+import time
+from typing import Callable, Sequence
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.memory.memory_manager import MEMORY_COLLECTION, default_persist_dir
+from backend.memory.response_cache import RESPONSE_CACHE_COLLECTION
+from backend.memory.vector_backends import create_vector_backend
+
+
+# Espace de chaque collection, tel que VectorMemory les crée.
+COLLECTION_SPACES = {MEMORY_COLLECTION: "l2", RESPONSE_CACHE_COLLECTION: "cosine"}
+
+
+def reembed(
+    source_dir: str,
+    target_dir: str,
+    embedding_function: Callable[[Sequence[str]], Sequence[Sequence[float]]],
+    source_backend: str = "chroma",
+    target_backend: str | None = None,
+    batch_size: int = 256,
+    progress: Callable[[str, int, int], None] | None = None,
+) -> dict[str, int]:
+    """Copy every collection of ``source_dir`` into ``target_dir`` with new embeddings.
+
+    Ids, documents and metadata are kept as is. Returns the number of entries
+    copied per collection.
+    """
+
+    if Path(target_dir).resolve() == Path(source_dir).resolve():
+        raise ValueError("La cible doit être un autre dossier que la source.")
+    source = create_vector_backend(source_backend, source_dir)
+    target = create_vector_backend(target_backend or source_backend, target_dir)
+    copied: dict[str, int] = {}
+    try:
+        for name, space in COLLECTION_SPACES.items():
+            source_collection = source.get_collection(name, space=space)
+            ids = list(source_collection.get(include=[]).get("ids") or [])
+            copied[name] = 0
+            if not ids:
+                continue
+            target_collection = target.get_collection(name, space=space)
+            size = max(1, min(batch_size, source.max_batch_size, target.max_batch_size))
+            for start in range(0, len(ids), size):
+                found = source_collection.get(
+                    ids=ids[start : start + size], include=["documents", "metadatas"]
+                )
+                documents = [document or "" for document in found.get("documents") or []]
+                target_collection.upsert(
+                    ids=list(found["ids"]),
+                    embeddings=[
+                        [float(value) for value in vector]
+                        for vector in embedding_function(documents)
+                    ],
+                    documents=documents,
+                    metadatas=found.get("metadatas"),
+                )
+                copied[name] += len(documents)
+                if progress is not None:
+                    progress(name, copied[name], len(ids))
+    finally:
+        source.close()
+        target.close()
+
+    model_name = getattr(embedding_function, "model_name", None)
+    if model_name:
+        (Path(target_dir) / "embedding_model.json").write_text(
+            json.dumps({"model": model_name}), encoding="utf-8"
+        )
+    return copied
+
+
+def main(argv: list[str] | None = None) -> int:
+    from backend.config import settings
+    from backend.memory.embeddings import create_embedding_function
+
+    parser = argparse.ArgumentParser(
+        description="Recalcule les embeddings de la mémoire vectorielle avec un autre modèle."
+    )
+    parser.add_argument("--source", help="Magasin à migrer (par défaut celui de la configuration).")
+    parser.add_argument("--target", help="Nouveau magasin (par défaut <source>.<modèle>).")
+    parser.add_argument("--source-backend", default=settings.vector_backend, choices=["chroma", "matrix"])
+    parser.add_argument("--target-backend", choices=["chroma", "matrix"])
+    parser.add_argument("--embedding-backend", default=settings.embedding_backend)
+    parser.add_argument("--embedding-model", default=settings.embedding_model)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument(
+        "--replace", action="store_true", help="Remplace la source (conservée en <source>.bak)."
+    )
+    args = parser.parse_args(argv)
+
+    source = Path(args.source or settings.memory_persist_dir or default_persist_dir(args.source_backend))
+    if not source.exists():
+        parser.error(f"Magasin introuvable : {source}")
+    embedding_function = create_embedding_function(
+        args.embedding_backend,
+        args.embedding_model,
+        api_key=settings.openai_api_key or "",
+        api_base=settings.openai_base_url,
+        batch_size=settings.embedding_batch_size,
+        workers=settings.embedding_workers,
+    )
+    model_name = getattr(embedding_function, "model_name", args.embedding_model)
+    safe_name = "".join(char if char.isalnum() else "-" for char in model_name)
+    target = Path(args.target or f"{source}.{safe_name}")
+    if target.exists() and any(target.iterdir()):
+        parser.error(f"La cible existe déjà et n'est pas vide : {target}")
+
+    started = time.perf_counter()
+
+    def report(name: str, done: int, total: int) -> None:
+        print(f"\r{name} : {done}/{total}", end="", file=sys.stderr, flush=True)
+        if done == total:
+            print(file=sys.stderr)
+
+    copied = reembed(
+        str(source),
+        str(target),
+        embedding_function,
+        source_backend=args.source_backend,
+        target_backend=args.target_backend,
+        batch_size=args.batch_size,
+        progress=report,
+    )
+    close = getattr(embedding_function, "close", None)
+    if close is not None:
+        close()
+
+    if args.replace:
+        backup = source.with_name(source.name + ".bak")
+        if backup.exists():
+            shutil.rmtree(backup)
+        source.rename(backup)
+        target.rename(source)
+        target = source
+    print(
+        json.dumps(
+            {
+                "model": model_name,
+                "target": str(target),
+                "copied": copied,
+                "seconds": round(time.perf_counter() - started, 3),
+            },
+            ensure_ascii=False,
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI
+    raise SystemExit(main())
@@ -0,0 +1,136 @@
+"""Cache sémantique des réponses, adossé à une collection Chroma dédiée."""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+import time
+from typing import Any, Callable, Sequence
+
+
+RESPONSE_CACHE_COLLECTION = "jarvis_response_cache"
+
+# Questions dont la réponse dépend du contexte temporel injecté dans le prompt :
+# elles ne sont jamais servies depuis le cache.
+_TIME_SENSITIVE = re.compile(
+    r"\b(heures?|minutes?|aujourd'hui|demain|hier|maintenant|actuellement|en ce moment"
+    r"|date|jours?|semaine|mois|année|ce soir|ce matin|cet après-midi|week-end|quand"
+    r"|météo|lundi|mardi|mercredi|jeudi|vendredi|samedi|dimanche)\b",
+    re.IGNORECASE,
+)
+
+
+def normalise_request(text: str) -> str:
+    """Lower-case, collapse whitespace and drop trailing punctuation."""
+    return " ".join(text.lower().split()).rstrip(" ?!.…")
+
+
+def is_time_sensitive(text: str) -> bool:
+    return bool(_TIME_SENSITIVE.search(text))
+
+
+class SemanticResponseCache:
+    """Serve previous answers to semantically equivalent requests.
+
+    Requests are embedded once normalised and looked up in ``collection`` (a
+    Chroma collection using the cosine space). A hit requires a similarity of
+    at least ``threshold`` and an entry younger than ``ttl`` seconds; expired
+    entries are deleted on sight. Time-sensitive requests, requests with
+    attachments and turns of a conversation that already has history (whose
+    answer may depend on it: "oui", "continue"…) bypass the cache entirely.
+    """
+
+    def __init__(
+        self,
+        collection: Any,
+        embedding_function: Callable[[Sequence[str]], Sequence[Sequence[float]]],
+        threshold: float = 0.95,
+        ttl: float = 24 * 3600,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.collection = collection
+        self.embedding_function = embedding_function
+        self.threshold = threshold
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._lock = threading.Lock()
+
+    def is_cacheable(
+        self, text: str, has_attachments: bool = False, has_history: bool = False
+    ) -> bool:
+        return (
+            bool(normalise_request(text))
+            and not has_attachments
+            and not has_history
+            and not is_time_sensitive(text)
+        )
+
+    def lookup(
+        self, text: str, has_attachments: bool = False, has_history: bool = False
+    ) -> str | None:
+        """Return a cached answer for ``text`` or ``None``."""
+
+        if not self.is_cacheable(text, has_attachments, has_history):
+            self._count("bypassed")
+            return None
+
+        results = self.collection.query(
+            query_embeddings=self.embedding_function([normalise_request(text)]),
+            n_results=1,
+            include=["documents", "metadatas", "distances"],
+        )
+        ids = (results.get("ids") or [[]])[0]
+        if not ids:
+            self._count("misses")
+            return None
+
+        metadata = (results.get("metadatas") or [[{}]])[0][0] or {}
+        distance = (results.get("distances") or [[1.0]])[0][0]
+        if self.clock() - float(metadata.get("created_at", 0)) > self.ttl:
+            self.collection.delete(ids=[ids[0]])
+            self._count("misses")
+            return None
+        # Espace cosinus : distance = 1 - similarité.
+        if 1.0 - distance < self.threshold:
+            self._count("misses")
+            return None
+
+        self._count("hits")
+        return metadata.get("response")
+
+    def store(
+        self, text: str, response: str, has_attachments: bool = False, has_history: bool = False
+    ) -> None:
+        """Remember ``response`` for ``text`` when the request is cacheable."""
+
+        if not response or not self.is_cacheable(text, has_attachments, has_history):
+            return
+        normalised = normalise_request(text)
+        self.collection.upsert(
+            ids=[f"resp_{hashlib.sha256(normalised.encode('utf-8')).hexdigest()}"],
+            documents=[normalised],
+            embeddings=self.embedding_function([normalised]),
+            metadatas=[{"response": response, "created_at": self.clock()}],
+        )
+
+    def clear(self) -> None:
+        ids = self.collection.get(include=[]).get("ids") or []
+        if ids:
+            self.collection.delete(ids=ids)
+
+    def stats(self) -> dict[str, float | int]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
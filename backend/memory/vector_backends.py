@@ -0,0 +1,852 @@
+"""Backends de stockage vectoriel de la mémoire : Chroma ou matrice NumPy mappée en mémoire."""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+import sqlite3
+import threading
+from typing import Any, Callable, Iterable, Protocol, Sequence
+
+import numpy as np
+
+try:  # pragma: no cover - optional dependency
+    import hnswlib
+except ImportError:  # pragma: no cover - optional dependency
+    hnswlib = None
+
+
+_INCLUDE_DEFAULT = ("documents", "metadatas", "distances")
+_SPACES = ("l2", "cosine", "ip")
+# Compaction : fichiers réécrits sous ``<nom>.compact``, puis substitués une fois le
+# marqueur de validation écrit (reprise à l'ouverture si le processus s'arrête entre-temps).
+_COMPACTED_FILES = ("vectors.bin", "norms.bin", "records.sqlite3", "meta.json")
+_COMPACT_SUFFIX = ".compact"
+_COMPACT_MARKER = "compact.commit"
+# Nombre de paramètres par requête ``IN (...)`` (limite historique de SQLite : 999).
+_SQL_BATCH = 900
+
+
+class VectorCollection(Protocol):
+    """Subset of the Chroma collection API used by the memory and the response cache."""
+
+    def add(
+        self,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Sequence[str] | None = None,
+        metadatas: Sequence[dict] | None = None,
+    ) -> None: ...
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Sequence[str] | None = None,
+        metadatas: Sequence[dict] | None = None,
+    ) -> None: ...
+
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        include: Sequence[str] = _INCLUDE_DEFAULT,
+    ) -> dict[str, Any]: ...
+
+    def get(self, ids: Sequence[str] | None = None, include: Sequence[str] = ...) -> dict[str, Any]: ...
+
+    def update(self, ids: Sequence[str], metadatas: Sequence[dict]) -> None: ...
+
+    def delete(self, ids: Sequence[str] | None = None, where: dict | None = None) -> None: ...
+
+    def count(self) -> int: ...
+
+
+class VectorBackend(Protocol):
+    """Factory of named collections sharing one storage location."""
+
+    max_batch_size: int
+
+    def get_collection(
+        self, name: str, embedding_function: Callable | None = None, space: str = "l2"
+    ) -> VectorCollection: ...
+
+    def close(self) -> None: ...
+
+
+class ChromaBackend:
+    """Collections stored by ``chromadb.PersistentClient`` (imported on first use)."""
+
+    def __init__(self, persist_dir: str) -> None:
+        import chromadb
+
+        self.client = chromadb.PersistentClient(path=persist_dir)
+
+    @property
+    def max_batch_size(self) -> int:
+        return self.client.get_max_batch_size()
+
+    def get_collection(
+        self, name: str, embedding_function: Callable | None = None, space: str = "l2"
+    ) -> VectorCollection:
+        return self.client.get_or_create_collection(
+            name=name,
+            embedding_function=_chroma_embedding_function(embedding_function),
+            metadata={"hnsw:space": space} if space != "l2" else None,
+        )
+
+    def close(self) -> None:
+        pass
+
+
+def _chroma_embedding_function(function: Callable | None):
+    if function is None:
+        return None
+    from chromadb.api.types import EmbeddingFunction
+
+    if isinstance(function, EmbeddingFunction):
+        return function
+
+    class _Adapter(EmbeddingFunction):
+        def __init__(self) -> None:
+            pass
+
+        def __call__(self, input):
+            return function(input)
+
+    return _Adapter()
+
+
+class MatrixBackend:
+    """Collections kept as memory-mapped NumPy matrices under ``root``."""
+
+    max_batch_size = 100_000
+
+    def __init__(
+        self, root: str, dtype: str = "float32", hnsw_threshold: int = 50_000
+    ) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.dtype = dtype
+        self.hnsw_threshold = hnsw_threshold
+        self._collections: dict[str, MatrixCollection] = {}
+        self._lock = threading.Lock()
+
+    def get_collection(
+        self, name: str, embedding_function: Callable | None = None, space: str = "l2"
+    ) -> "MatrixCollection":
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = MatrixCollection(
+                    self.root / name,
+                    space=space,
+                    dtype=self.dtype,
+                    hnsw_threshold=self.hnsw_threshold,
+                )
+                self._collections[name] = collection
+            return collection
+
+    def close(self) -> None:
+        with self._lock:
+            for collection in self._collections.values():
+                collection.close()
+
+
+class MatrixCollection:
+    """Vectors in a memory-mapped matrix, records in a SQLite table.
+
+    Rows are only ever appended: ``vectors.bin`` holds one row per insert and
+    ``records.sqlite3`` the matching id, document and metadata, deleted and
+    replaced rows staying behind as tombstones. Reopening a collection maps
+    the matrix without reading it and only loads the numbers of the live
+    rows; documents and metadata are read when a result needs them. A
+    ``records.jsonl`` log left by the previous format is imported once.
+    Queries scan the live rows with a vectorised dot product and
+    ``argpartition``; once ``hnsw_threshold`` live rows are reached and
+    ``hnswlib`` is installed, an HNSW graph is built in a background thread
+    (queries keep scanning meanwhile), kept up to date incrementally and
+    saved next to the matrix. ``compact`` rewrites the files without the dead
+    rows; the new files are staged and swapped in atomically, so an
+    interrupted compaction leaves either the old or the new store.
+    """
+
+    _CHUNK_ROWS = 65_536
+
+    def __init__(
+        self,
+        path: Path,
+        space: str = "l2",
+        dtype: str = "float32",
+        hnsw_threshold: int = 50_000,
+        hnsw_save_every: int = 10_000,
+    ) -> None:
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.hnsw_threshold = hnsw_threshold
+        self.hnsw_save_every = hnsw_save_every
+        self._lock = threading.RLock()
+        self._generation = 0
+        self._index_builder: threading.Thread | None = None
+        self._closed = False
+        for leftover in self.path.glob("index.hnsw.*.tmp"):
+            leftover.unlink()
+        self._finish_compaction()
+        self._load(space, dtype)
+
+    def _load(self, space: str, dtype: str) -> None:
+        meta_path = self.path / "meta.json"
+        meta = json.loads(meta_path.read_text(encoding="utf-8")) if meta_path.exists() else {}
+        self.space: str = meta.get("space", space)
+        self.dtype = np.dtype(meta.get("dtype", dtype))
+        self.dimensions: int | None = meta.get("dimensions")
+        if self.space not in _SPACES:
+            raise ValueError(f"Espace vectoriel inconnu : {self.space}")
+        self._index_rows = int(meta.get("index_rows", 0))
+
+        self._index: Any = None
+        self._unsaved_index_rows = 0
+        # Une construction d'index lancée avant une compaction est abandonnée.
+        self._generation += 1
+        self._index_builder = None
+
+        # Seuls les numéros des lignes vivantes sont chargés : l'ouverture ne lit ni
+        # les documents ni les métadonnées.
+        self._db = _open_records(self.path)
+        self._total = self._db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM records").fetchone()[0]
+        live = np.fromiter(
+            (row for (row,) in self._db.execute("SELECT row FROM records WHERE alive")),
+            dtype=np.int64,
+        )
+        self._live = len(live)
+        self._alive = np.zeros(self._total, dtype=bool)
+        self._alive[live] = True
+
+        self._capacity = 0
+        self._vectors: np.memmap | None = None
+        self._norms: np.memmap | None = None
+        if self.dimensions is not None:
+            self._map(max(self._total, 1024))
+        self._maybe_build_index()
+
+    # --- Persistance ---
+
+    def _write_meta(self) -> None:
+        meta = {
+            "space": self.space,
+            "dtype": self.dtype.name,
+            "dimensions": self.dimensions,
+            "index_rows": self._index_rows,
+        }
+        temporary = self.path / "meta.json.tmp"
+        temporary.write_text(json.dumps(meta), encoding="utf-8")
+        temporary.replace(self.path / "meta.json")
+
+    def _map(self, capacity: int) -> None:
+        """(Re)map the matrix files so that they hold ``capacity`` rows."""
+
+        assert self.dimensions is not None
+        self._flush_maps()
+        self._vectors = _open_matrix(self.path / "vectors.bin", self.dtype, capacity, self.dimensions)
+        if self.space == "l2":
+            self._norms = _open_matrix(self.path / "norms.bin", np.dtype("float32"), capacity)
+        self._capacity = capacity
+        if len(self._alive) < capacity:
+            alive = np.zeros(capacity, dtype=bool)
+            alive[: len(self._alive)] = self._alive
+            self._alive = alive
+        if self._index is not None:
+            self._index.resize_index(capacity)
+
+    def _flush_maps(self) -> None:
+        for matrix in (self._vectors, self._norms):
+            if matrix is not None:
+                matrix.flush()
+
+    # --- Écriture ---
+
+    def _live_rows(self, ids: Iterable[str]) -> dict[str, int]:
+        """Map the given ids to their live row."""
+
+        unique = list(dict.fromkeys(ids))
+        rows: dict[str, int] = {}
+        for start in range(0, len(unique), _SQL_BATCH):
+            chunk = unique[start : start + _SQL_BATCH]
+            rows.update(
+                self._db.execute(
+                    "SELECT id, row FROM records WHERE alive AND id IN "
+                    f"({', '.join('?' * len(chunk))})",
+                    chunk,
+                )
+            )
+        return rows
+
+    def _drop_rows(self, rows: Sequence[int]) -> None:
+        """Turn live rows into tombstones; call within a transaction."""
+
+        if not rows:
+            return
+        self._db.executemany(
+            "UPDATE records SET alive = 0, document = NULL, metadata = NULL WHERE row = ?",
+            [(row,) for row in rows],
+        )
+        self._alive[list(rows)] = False
+        self._live -= len(rows)
+        if self._index is not None:
+            _mark_deleted(self._index, [row for row in rows if row < self._index_rows])
+
+    def _prepare(self, embeddings: Sequence[Sequence[float]]) -> np.ndarray:
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2:
+            raise ValueError("Les embeddings doivent former une matrice (n, dimensions).")
+        if self.dimensions is None:
+            self.dimensions = int(matrix.shape[1])
+            self._write_meta()
+            self._map(1024)
+        elif matrix.shape[1] != self.dimensions:
+            raise ValueError(
+                f"Dimension {matrix.shape[1]} incompatible avec la collection ({self.dimensions})."
+            )
+        if self.space == "cosine":
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix = matrix / norms
+        return matrix
+
+    def add(
+        self,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Sequence[str] | None = None,
+        metadatas: Sequence[dict] | None = None,
+    ) -> None:
+        if not ids:
+            return
+        if len(embeddings) != len(ids):
+            raise ValueError("Il faut un embedding par identifiant.")
+        documents = list(documents) if documents is not None else [None] * len(ids)
+        metadatas = list(metadatas) if metadatas is not None else [None] * len(ids)
+
+        with self._lock:
+            matrix = self._prepare(embeddings)
+            start = self._total
+            if start + len(ids) > self._capacity:
+                self._map(max(self._capacity * 2, start + len(ids)))
+
+            # Les vecteurs sont écrits avant le journal : une ligne de journal présente
+            # désigne toujours une ligne de la matrice déjà remplie.
+            assert self._vectors is not None
+            self._vectors[start : start + len(ids)] = matrix.astype(self.dtype)
+            if self._norms is not None:
+                self._norms[start : start + len(ids)] = np.einsum("ij,ij->i", matrix, matrix)
+            self._flush_maps()
+
+            # Un identifiant déjà présent (ou répété dans le lot) ne garde que sa dernière ligne.
+            replaced = list(self._live_rows(ids).values())
+            records: list[list[Any]] = []
+            latest: dict[str, int] = {}
+            for offset, (id_, document, metadata) in enumerate(zip(ids, documents, metadatas)):
+                if id_ in latest:
+                    records[latest[id_]][2:] = [None, None, 0]
+                latest[id_] = offset
+                records.append([start + offset, id_, document, _dump(metadata), 1])
+            with self._db:
+                self._drop_rows(replaced)
+                self._db.executemany("INSERT INTO records VALUES (?, ?, ?, ?, ?)", records)
+            self._total = start + len(ids)
+            self._alive[start : self._total] = [bool(record[4]) for record in records]
+            self._live += len(latest)
+
+            if self._index is not None:
+                self._index_add(start, self._total)
+            else:
+                self._maybe_build_index()
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Sequence[str] | None = None,
+        metadatas: Sequence[dict] | None = None,
+    ) -> None:
+        # Chaque insertion d'un identifiant existant remplace l'ancienne ligne.
+        self.add(ids, embeddings, documents, metadatas)
+
+    def update(self, ids: Sequence[str], metadatas: Sequence[dict]) -> None:
+        """Replace the metadata of existing entries (vectors are left untouched)."""
+
+        with self._lock, self._db:
+            self._db.executemany(
+                "UPDATE records SET metadata = ? WHERE alive AND id = ?",
+                [(_dump(metadata), id_) for id_, metadata in zip(ids, metadatas)],
+            )
+
+    def delete(self, ids: Sequence[str] | None = None, where: dict | None = None) -> None:
+        with self._lock:
+            if ids is None:
+                rows = [
+                    row
+                    for row, metadata in self._db.execute(
+                        "SELECT row, metadata FROM records WHERE alive"
+                    ).fetchall()
+                    if not where or _matches(_load(metadata), where)
+                ]
+            else:
+                rows = list(self._live_rows(ids).values())
+            with self._db:
+                self._drop_rows(rows)
+
+    # --- Lecture ---
+
+    def count(self) -> int:
+        return self._live
+
+    @property
+    def dead_rows(self) -> int:
+        """Deleted or replaced rows still occupying the files until :meth:`compact`."""
+        return self._total - self._live
+
+    def get(
+        self,
+        ids: Sequence[str] | None = None,
+        include: Sequence[str] = ("documents", "metadatas"),
+        where: dict | None = None,
+    ) -> dict[str, Any]:
+        with self._lock:
+            rows = None
+            if ids is not None:
+                found = self._live_rows(ids)
+                rows = [found[id_] for id_ in ids if id_ in found]
+            return self._result(rows, include, where)
+
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        include: Sequence[str] = _INCLUDE_DEFAULT,
+    ) -> dict[str, Any]:
+        keys = ("ids", *include)
+        results: dict[str, Any] = {key: [] for key in keys}
+        with self._lock:
+            if self.dimensions is None or not self._live:
+                for key in keys:
+                    results[key] = [[] for _ in query_embeddings]
+                return results
+            queries = self._prepare(query_embeddings)
+            k = min(n_results, self._live)
+            for query in queries:
+                rows, distances = self._search(query, k)
+                found = self._result(rows, include)
+                for key in keys:
+                    if key == "distances":
+                        results[key].append([float(value) for value in distances])
+                    else:
+                        results[key].append(found.get(key, []))
+        return results
+
+    def _select(self, rows: Sequence[int] | None, columns: Sequence[str]) -> list[tuple]:
+        """Read ``columns`` of the given live rows, in order (every live row for ``None``)."""
+
+        fields = ", ".join(("row", *columns))
+        if rows is None:
+            return self._db.execute(
+                f"SELECT {fields} FROM records WHERE alive ORDER BY row"
+            ).fetchall()
+        unique = list(dict.fromkeys(int(row) for row in rows))
+        found: dict[int, tuple] = {}
+        for start in range(0, len(unique), _SQL_BATCH):
+            chunk = unique[start : start + _SQL_BATCH]
+            for record in self._db.execute(
+                f"SELECT {fields} FROM records WHERE alive AND row IN "
+                f"({', '.join('?' * len(chunk))})",
+                chunk,
+            ):
+                found[record[0]] = record
+        return [found[int(row)] for row in rows if int(row) in found]
+
+    def _result(
+        self, rows: Sequence[int] | None, include: Sequence[str], where: dict | None = None
+    ) -> dict[str, Any]:
+        with_documents = "documents" in include
+        with_metadatas = "metadatas" in include or bool(where)
+        columns = ["id"]
+        if with_documents:
+            columns.append("document")
+        if with_metadatas:
+            columns.append("metadata")
+
+        kept: list[int] = []
+        result: dict[str, Any] = {"ids": [], "documents": [], "metadatas": []}
+        for record in self._select(rows, columns):
+            values = dict(zip(columns, record[1:]))
+            metadata = _load(values.get("metadata"))
+            if where and not _matches(metadata, where):
+                continue
+            kept.append(record[0])
+            result["ids"].append(values["id"])
+            result["documents"].append(values.get("document"))
+            result["metadatas"].append(metadata)
+
+        if not with_documents:
+            del result["documents"]
+        if "metadatas" not in include:
+            del result["metadatas"]
+        if "embeddings" in include:
+            assert self._vectors is not None
+            result["embeddings"] = [np.asarray(self._vectors[row], dtype=np.float32) for row in kept]
+        return result
+
+    def _search(self, query: np.ndarray, k: int) -> tuple[list[int], np.ndarray]:
+        if self._index is not None:
+            try:
+                self._index.set_ef(max(64, 2 * k))
+                labels, distances = self._index.knn_query(query, k=k)
+                return [int(label) for label in labels[0]], distances[0]
+            except RuntimeError:  # pragma: no cover - too few reachable elements
+                pass
+        return self._scan(query, k)
+
+    def _scan(self, query: np.ndarray, k: int) -> tuple[list[int], np.ndarray]:
+        """Exact top-k over the live rows, chunk by chunk to bound the float32 copies."""
+
+        assert self._vectors is not None
+        total = self._total
+        distances = np.empty(total, dtype=np.float32)
+        for start in range(0, total, self._CHUNK_ROWS):
+            stop = min(start + self._CHUNK_ROWS, total)
+            scores = np.asarray(self._vectors[start:stop], dtype=np.float32) @ query
+            if self.space == "l2":
+                assert self._norms is not None
+                distances[start:stop] = self._norms[start:stop] - 2 * scores + float(query @ query)
+            else:
+                distances[start:stop] = 1.0 - scores
+        distances[~self._alive[:total]] = np.inf
+
+        if k < total:
+            candidates = np.argpartition(distances, k - 1)[:k]
+        else:
+            candidates = np.arange(total)
+        ordered = candidates[np.argsort(distances[candidates], kind="stable")]
+        return [int(row) for row in ordered], distances[ordered]
+
+    # --- Index HNSW optionnel ---
+
+    def _maybe_build_index(self) -> None:
+        """Load the saved HNSW graph, or start building it once the threshold is reached."""
+
+        if (
+            hnswlib is None
+            or self.hnsw_threshold <= 0
+            or self.dimensions is None
+            or self._index is not None
+            or self._index_builder is not None
+            or self._live < self.hnsw_threshold
+        ):
+            return
+        index_path = self.path / "index.hnsw"
+        if index_path.exists() and self._index_rows:
+            index = hnswlib.Index(space=self.space, dim=self.dimensions)
+            index.load_index(str(index_path), max_elements=self._capacity)
+            # Les suppressions journalisées après la dernière sauvegarde sont rejouées.
+            _mark_deleted(index, np.flatnonzero(~self._alive[: self._index_rows]))
+            self._index = index
+            self._index_add(self._index_rows, self._total)
+            return
+        # La construction du graphe complet prend plusieurs secondes : elle se fait hors du
+        # verrou, les requêtes continuant par balayage exact jusqu'à la substitution.
+        self._index_builder = threading.Thread(
+            target=self._build_index, args=(self._generation,), name="hnsw-build", daemon=True
+        )
+        self._index_builder.start()
+
+    def _build_index(self, generation: int) -> None:
+        """Build the HNSW graph from a snapshot of the rows, then swap it in and catch up."""
+
+        temporary = self.path / f"index.hnsw.{generation}.tmp"
+        try:
+            with self._lock:
+                if generation != self._generation:
+                    return
+                assert self._vectors is not None and self.dimensions is not None
+                # Les lignes déjà écrites ne changent plus (ajout seul) : la projection
+                # courante reste lisible même si la matrice est agrandie entre-temps.
+                vectors, stop, capacity = self._vectors, self._total, self._capacity
+                alive = self._alive[:stop].copy()
+
+            index = hnswlib.Index(space=self.space, dim=self.dimensions)
+            index.init_index(max_elements=capacity, ef_construction=200, M=16)
+            for chunk in range(0, stop, self._CHUNK_ROWS):
+                end = min(chunk + self._CHUNK_ROWS, stop)
+                rows = np.arange(chunk, end)
+                index.add_items(np.asarray(vectors[chunk:end], dtype=np.float32), rows)
+            _mark_deleted(index, np.flatnonzero(~alive))
+            index.save_index(str(temporary))
+
+            with self._lock:
+                if generation != self._generation or self._closed:
+                    return
+                os.replace(temporary, self.path / "index.hnsw")
+                if self._capacity > capacity:
+                    index.resize_index(self._capacity)
+                # Suppressions survenues pendant la construction.
+                _mark_deleted(index, np.flatnonzero(alive & ~self._alive[:stop]))
+                self._index = index
+                self._index_rows = stop
+                self._unsaved_index_rows = 0
+                self._write_meta()
+                self._index_add(stop, self._total)
+        except Exception as exc:  # pragma: no cover - log only
+            print("⚠️ Construction de l'index HNSW impossible :", exc)
+        finally:
+            temporary.unlink(missing_ok=True)
+            with self._lock:
+                if self._index_builder is threading.current_thread():
+                    self._index_builder = None
+
+    def wait_for_index(self, timeout: float | None = None) -> bool:
+        """Wait for a background HNSW build; return whether the index is in use."""
+
+        builder = self._index_builder
+        if builder is not None:
+            builder.join(timeout)
+        return self._index is not None
+
+    def _index_add(self, start: int, stop: int) -> None:
+        assert self._index is not None and self._vectors is not None
+        for chunk in range(start, stop, self._CHUNK_ROWS):
+            end = min(chunk + self._CHUNK_ROWS, stop)
+            rows = np.arange(chunk, end)
+            self._index.add_items(np.asarray(self._vectors[chunk:end], dtype=np.float32), rows)
+            _mark_deleted(self._index, rows[~self._alive[chunk:end]])
+        self._unsaved_index_rows += stop - start
+        self._index_rows = stop
+        # Sauvegarde espacée géométriquement : réécrire tout le graphe à chaque lot coûterait
+        # un temps quadratique, et les lignes non sauvegardées sont rattrapées à l'ouverture.
+        if self._unsaved_index_rows >= max(self.hnsw_save_every, stop // 4):
+            self.save_index()
+
+    def save_index(self) -> None:
+        with self._lock:
+            if self._index is None:
+                return
+            self._index.save_index(str(self.path / "index.hnsw"))
+            self._unsaved_index_rows = 0
+            self._write_meta()
+
+    # --- Maintenance ---
+
+    def compact(self) -> int:
+        """Rewrite the matrix and the log with only the live records; return the rows reclaimed."""
+
+        with self._lock:
+            if not self.dead_rows or self._vectors is None:
+                return 0
+            live = [int(row) for row in np.flatnonzero(self._alive[: self._total])]
+            reclaimed = self._total - len(live)
+            self._flush_maps()
+            try:
+                self._stage_compaction(live)
+            except BaseException:
+                _discard_staged(self.path)
+                raise
+            # Fermer la base vide son journal WAL : il ne doit pas être rejoué sur la base
+            # compactée qui la remplace.
+            self._db.close()
+            # Validation : à partir d'ici, la compaction est menée à terme, même après un arrêt.
+            _write_durably(self.path / _COMPACT_MARKER, b"")
+
+            self._vectors = self._norms = None
+            self._index = None
+            self._finish_compaction()
+            self._load(self.space, self.dtype.name)
+            return reclaimed
+
+    def _stage_compaction(self, live: list[int]) -> None:
+        """Write the compacted store next to the current one, under ``.compact`` names."""
+
+        assert self._vectors is not None
+        with open(self.path / f"vectors.bin{_COMPACT_SUFFIX}", "wb") as handle:
+            for chunk in range(0, len(live), self._CHUNK_ROWS):
+                rows = live[chunk : chunk + self._CHUNK_ROWS]
+                np.asarray(self._vectors[rows], dtype=self.dtype).tofile(handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+        if self._norms is not None:
+            with open(self.path / f"norms.bin{_COMPACT_SUFFIX}", "wb") as handle:
+                np.asarray(self._norms[live], dtype=np.float32).tofile(handle)
+                handle.flush()
+                os.fsync(handle.fileno())
+
+        # Les enregistrements vivants sont renumérotés dans l'ordre des lignes conservées.
+        staged = self.path / f"records.sqlite3{_COMPACT_SUFFIX}"
+        staged.unlink(missing_ok=True)
+        self._db.execute("ATTACH DATABASE ? AS staged", (str(staged),))
+        try:
+            _create_records_table(self._db, "staged")
+            with self._db:
+                self._db.execute(
+                    "INSERT INTO staged.records (row, id, document, metadata, alive) "
+                    "SELECT ROW_NUMBER() OVER (ORDER BY row) - 1, id, document, metadata, 1 "
+                    "FROM records WHERE alive"
+                )
+        finally:
+            self._db.execute("DETACH DATABASE staged")
+        # Le graphe HNSW désigne les anciennes lignes : il est reconstruit à la réouverture.
+        meta = {
+            "space": self.space,
+            "dtype": self.dtype.name,
+            "dimensions": self.dimensions,
+            "index_rows": 0,
+        }
+        _write_durably(self.path / f"meta.json{_COMPACT_SUFFIX}", json.dumps(meta).encode("utf-8"))
+
+    def _finish_compaction(self) -> None:
+        """Swap in a committed compaction, or discard one interrupted before its commit."""
+
+        marker = self.path / _COMPACT_MARKER
+        staged = [
+            (self.path / f"{name}{_COMPACT_SUFFIX}", self.path / name) for name in _COMPACTED_FILES
+        ]
+        if not marker.exists():
+            _discard_staged(self.path)
+            return
+        for stale in ("index.hnsw", "records.sqlite3-wal", "records.sqlite3-shm"):
+            (self.path / stale).unlink(missing_ok=True)
+        for temporary, target in staged:
+            if temporary.exists():
+                os.replace(temporary, target)
+        marker.unlink()
+
+    def close(self) -> None:
+        with self._lock:
+            # Une construction d'index encore en cours est abandonnée (reprise à l'ouverture).
+            self._closed = True
+            self._flush_maps()
+            if self._index is not None and self._unsaved_index_rows:
+                self.save_index()
+            self._db.close()
+
+
+def _open_matrix(path: Path, dtype: np.dtype, rows: int, columns: int | None = None) -> np.memmap:
+    shape = (rows, columns) if columns is not None else (rows,)
+    size = int(np.prod(shape)) * dtype.itemsize
+    with open(path, "ab") as handle:
+        if handle.tell() < size:
+            handle.truncate(size)
+    return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+
+def _create_records_table(db: sqlite3.Connection, schema: str = "main") -> None:
+    db.execute(
+        f"CREATE TABLE IF NOT EXISTS {schema}.records ("
+        "row INTEGER PRIMARY KEY, "
+        "id TEXT NOT NULL, "
+        "document TEXT, "
+        "metadata TEXT, "
+        "alive INTEGER NOT NULL)"
+    )
+    db.execute(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {schema}.records_live_id ON records(id) WHERE alive"
+    )
+    db.commit()
+
+
+def _open_records(path: Path) -> sqlite3.Connection:
+    database = path / "records.sqlite3"
+    legacy = path / "records.jsonl"
+    if legacy.exists():
+        if not database.exists():
+            _import_log(legacy, database)
+        legacy.unlink()
+    # L'accès est sérialisé par le verrou de la collection.
+    db = sqlite3.connect(database, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    _create_records_table(db)
+    return db
+
+
+def _import_log(log_path: Path, database: Path) -> None:
+    """Convert the ``records.jsonl`` log of the previous format, keeping row numbers."""
+
+    records: list[list[Any]] = []
+    rows: dict[str, int] = {}
+    with open(log_path, encoding="utf-8") as log:
+        for line in log:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Dernière ligne tronquée par un arrêt brutal : ignorée.
+                continue
+            op, id_ = entry.get("op"), entry.get("id")
+            if op in ("add", "delete") and id_ in rows:
+                records[rows.pop(id_)][2:] = [None, None, 0]
+            if op == "add":
+                rows[id_] = len(records)
+                records.append([len(records), id_, entry.get("document"), _dump(entry.get("metadata")), 1])
+            elif op == "update" and id_ in rows:
+                records[rows[id_]][3] = _dump(entry.get("metadata"))
+
+    staged = database.with_name(f"{database.name}.import")
+    staged.unlink(missing_ok=True)
+    db = sqlite3.connect(staged)
+    try:
+        _create_records_table(db)
+        with db:
+            db.executemany("INSERT INTO records VALUES (?, ?, ?, ?, ?)", records)
+    finally:
+        db.close()
+    os.replace(staged, database)
+
+
+def _discard_staged(path: Path) -> None:
+    for name in _COMPACTED_FILES:
+        (path / f"{name}{_COMPACT_SUFFIX}").unlink(missing_ok=True)
+    (path / f"records.sqlite3{_COMPACT_SUFFIX}-journal").unlink(missing_ok=True)
+
+
+def _dump(metadata: dict | None) -> str | None:
+    return json.dumps(metadata, ensure_ascii=False) if metadata else None
+
+
+def _load(metadata: str | None) -> dict | None:
+    return json.loads(metadata) if metadata is not None else None
+
+
+def _mark_deleted(index: Any, rows: Iterable[int]) -> None:
+    for row in rows:
+        try:
+            index.mark_deleted(int(row))
+        except RuntimeError:  # pragma: no cover - already deleted
+            pass
+
+
+def _write_durably(path: Path, data: bytes) -> None:
+    with open(path, "wb") as handle:
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def _matches(metadata: dict | None, where: dict) -> bool:
+    metadata = metadata or {}
+    for key, expected in where.items():
+        if isinstance(expected, dict):
+            raise ValueError("Seuls les filtres d'égalité sont pris en charge par ce backend.")
+        if metadata.get(key) != expected:
+            return False
+    return True
+
+
+def create_vector_backend(
+    name: str, persist_dir: str, dtype: str = "float32", hnsw_threshold: int = 50_000
+) -> VectorBackend:
+    normalized = name.lower()
+    if normalized == "chroma":
+        return ChromaBackend(persist_dir)
+    if normalized == "matrix":
+        return MatrixBackend(persist_dir, dtype=dtype, hnsw_threshold=hnsw_threshold)
+    raise ValueError(f"Backend vectoriel inconnu : {name}")
@@ -0,0 +1,125 @@
+"""File d'écriture différée (write-behind) pour la mémoire vectorielle."""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Protocol
+
+from backend.services.metrics import STAGE_SECONDS
+
+
+class BatchMemoryStore(Protocol):
+    def add_memories(self, contents: list[str], metadatas: list[dict] | None = None) -> None:
+        """Persist several memories at once."""
+
+
+class MemoryWriteBehind:
+    """Persist memories from a background thread, in batches.
+
+    ``enqueue`` never blocks on I/O: pending memories are written by a daemon
+    thread as one batched ``add_memories`` call once ``max_batch_size`` items
+    are waiting or ``flush_interval`` seconds have passed, and on ``close``.
+    When ``max_queue_size`` is reached the oldest pending memory is dropped.
+    """
+
+    def __init__(
+        self,
+        store: BatchMemoryStore,
+        max_batch_size: int = 16,
+        flush_interval: float = 2.0,
+        max_queue_size: int = 1000,
+    ) -> None:
+        self.store = store
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._pending: list[tuple[str, dict]] = []
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="memory-write-behind", daemon=True)
+
+    def start(self) -> "MemoryWriteBehind":
+        self._thread.start()
+        return self
+
+    @property
+    def depth(self) -> int:
+        """Number of memories waiting to be persisted."""
+        return len(self._pending)
+
+    def enqueue(self, content: str, metadata: dict | None = None) -> None:
+        """Queue a memory for persistence without waiting for it."""
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("La file d'écriture de la mémoire est fermée.")
+            if len(self._pending) >= self.max_queue_size:
+                self._pending.pop(0)
+                self.dropped += 1
+            self._pending.append((content, metadata or {}))
+            if len(self._pending) >= self.max_batch_size:
+                self._condition.notify()
+
+    def flush(self) -> int:
+        """Synchronously write everything pending; return the number of memories written."""
+
+        total = 0
+        while True:
+            with self._condition:
+                batch = self._pending[: self.max_batch_size]
+                del self._pending[: len(batch)]
+            if not batch:
+                return total
+            self._write(batch)
+            total += len(batch)
+
+    def close(self, timeout: float | None = 10.0) -> None:
+        """Stop the background thread after flushing the remaining memories."""
+
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "queue_depth": self.depth,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    def _write(self, batch: list[tuple[str, dict]]) -> None:
+        contents = [content for content, _ in batch]
+        metadatas = [metadata for _, metadata in batch]
+        with self._write_lock:
+            try:
+                with STAGE_SECONDS.time(stage="memory_write"):
+                    self.store.add_memories(contents, metadatas)
+            except Exception as exc:  # pragma: no cover - log only
+                self.failed += len(batch)
+                print("⚠️ Impossible d'enregistrer la mémoire vectorielle:", exc)
+            else:
+                self.written += len(batch)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self.flush_interval
+                while (
+                    not self._closed
+                    and len(self._pending) < self.max_batch_size
+                    and (remaining := deadline - time.monotonic()) > 0
+                ):
+                    self._condition.wait(remaining)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
@@ -0,0 +1,152 @@
+"""Contrôle d'admission : plafond de concurrence et file d'attente à priorités."""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+import heapq
+import itertools
+import math
+import time
+from typing import Callable
+
+
+# Plus la valeur est basse, plus la requête passe tôt.
+PRIORITY_CLASSES: dict[str, int] = {"voice": 0, "interactive": 1, "batch": 2}
+DEFAULT_PRIORITY = "interactive"
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted (queue full or wait too long)."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """A granted slot; :meth:`release` is idempotent."""
+
+    def __init__(self, controller: "AdmissionController", granted_at: float) -> None:
+        self._controller = controller
+        self._granted_at = granted_at
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(self._granted_at)
+
+
+class AdmissionController:
+    """Admit at most ``max_concurrency`` requests at a time.
+
+    Extra requests wait in a bounded queue ordered by priority class, then by
+    arrival. A full queue is rejected with 429, a wait longer than
+    ``queue_timeout`` with 503; both carry a ``retry_after`` estimated from the
+    recent slot hold times. ``max_concurrency <= 0`` disables the control.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 32,
+        max_queue: int = 100,
+        queue_timeout: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.clock = clock
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._queue: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._sequence = itertools.count()
+        self._waits: deque[float] = deque(maxlen=256)
+        self._hold_time = 1.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrency > 0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, waiter in self._queue if not waiter.done())
+
+    def _retry_after(self) -> int:
+        slots = max(self.max_concurrency, 1)
+        return max(1, math.ceil(self._hold_time * (self.queued + 1) / slots))
+
+    async def acquire(self, priority: str = DEFAULT_PRIORITY) -> AdmissionTicket:
+        rank = PRIORITY_CLASSES.get(priority, PRIORITY_CLASSES[DEFAULT_PRIORITY])
+        arrived = self.clock()
+
+        if not self.enabled or (self.active < self.max_concurrency and not self.queued):
+            return self._grant(arrived)
+
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(429, "Trop de requêtes en attente.", self._retry_after())
+
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (rank, next(self._sequence), waiter))
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # Place attribuée au moment même de l'expiration : on la garde.
+                return self._ticket(arrived)
+            waiter.cancel()
+            self.timed_out += 1
+            raise AdmissionRejected(
+                503, "Le service est saturé, réessayez plus tard.", self._retry_after()
+            ) from None
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release(self.clock())
+            waiter.cancel()
+            raise
+        return self._ticket(arrived)
+
+    def _grant(self, arrived: float) -> AdmissionTicket:
+        self.active += 1
+        return self._ticket(arrived)
+
+    def _ticket(self, arrived: float) -> AdmissionTicket:
+        now = self.clock()
+        self.admitted += 1
+        self._waits.append(now - arrived)
+        return AdmissionTicket(self, now)
+
+    def _release(self, granted_at: float) -> None:
+        if self.enabled:
+            self._hold_time = 0.8 * self._hold_time + 0.2 * (self.clock() - granted_at)
+        # La place libérée passe directement au prochain en file, sans repasser par zéro.
+        while self._queue:
+            _, _, waiter = heapq.heappop(self._queue)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict[str, float | int | dict[str, int]]:
+        waits = sorted(self._waits)
+        by_priority = {name: 0 for name in PRIORITY_CLASSES}
+        ranks = {rank: name for name, rank in PRIORITY_CLASSES.items()}
+        for rank, _, waiter in self._queue:
+            if not waiter.done():
+                by_priority[ranks[rank]] += 1
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "queued": sum(by_priority.values()),
+            "queued_by_priority": by_priority,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+            "wait_p95": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+        }
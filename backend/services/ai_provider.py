@@ -2,11 +2,16 @@
 from __future__ import annotations
 
 import base64
+import hashlib
+import json
+from io import BytesIO
 import mimetypes
-from dataclasses import dataclass
-from typing import Iterable, Protocol, runtime_checkable
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, BinaryIO, Iterable, Iterator, Protocol, runtime_checkable
 import httpx
-from openai import OpenAI  # ✅ Nouveau SDK officiel
+
+from backend.services.attachment_registry import AttachmentRegistry
+from backend.services.metrics import run_in_thread
 
 
 # === Exceptions ===
@@ -22,13 +27,96 @@ class ProviderRequestError(ProviderError):
     """Raised when a provider request fails."""
 
 
+# Multiple de 3 : chaque bloc s'encode en base64 sans remplissage intermédiaire.
+_BASE64_CHUNK_SIZE = 3 * 64 * 1024
+
+
 @dataclass
 class Attachment:
-    """Simple representation of a user supplied file."""
+    """Simple representation of a user supplied file.
+
+    The payload is either held in ``content`` or, for spooled uploads, read
+    from ``file`` chunk by chunk so that large files are never fully loaded.
+    """
 
     filename: str
-    content: bytes
+    content: bytes = b""
     content_type: str | None = None
+    file: BinaryIO | None = field(default=None, repr=False)
+    size: int = -1
+    sha256: str | None = None
+
+    def __post_init__(self) -> None:
+        if self.size < 0:
+            self.size = len(self.content)
+
+    @property
+    def mime_type(self) -> str | None:
+        return self.content_type or mimetypes.guess_type(self.filename)[0]
+
+    def open(self) -> BinaryIO:
+        """Return a binary stream positioned at the start of the payload."""
+        if self.file is None:
+            return BytesIO(self.content)
+        self.file.seek(0)
+        return self.file
+
+    def content_hash(self) -> str:
+        """Return (and memoise) the SHA-256 digest of the payload."""
+        if self.sha256 is None:
+            digest = hashlib.sha256()
+            for chunk in self.iter_chunks():
+                digest.update(chunk)
+            self.sha256 = digest.hexdigest()
+        return self.sha256
+
+    def iter_chunks(self, chunk_size: int = _BASE64_CHUNK_SIZE) -> Iterator[bytes]:
+        stream = self.open()
+        while chunk := stream.read(chunk_size):
+            yield chunk
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+
+
+def encode_base64(attachment: Attachment) -> str:
+    """Base64-encode an attachment block by block, without a full raw copy in memory."""
+
+    encoded = bytearray()
+    for chunk in attachment.iter_chunks(_BASE64_CHUNK_SIZE):
+        encoded += base64.b64encode(chunk)
+    return encoded.decode("ascii")
+
+
+@dataclass
+class ProviderUsage:
+    """Cumulative token usage reported by the upstream API."""
+
+    requests: int = 0
+    input_tokens: int = 0
+    cached_input_tokens: int = 0
+    output_tokens: int = 0
+
+    def record(self, usage: Any) -> None:
+        if usage is None:
+            return
+        details = getattr(usage, "input_tokens_details", None)
+        self.requests += 1
+        self.input_tokens += getattr(usage, "input_tokens", 0) or 0
+        self.cached_input_tokens += getattr(details, "cached_tokens", 0) or 0
+        self.output_tokens += getattr(usage, "output_tokens", 0) or 0
+
+    def as_dict(self) -> dict[str, float | int]:
+        return {
+            "requests": self.requests,
+            "input_tokens": self.input_tokens,
+            "cached_input_tokens": self.cached_input_tokens,
+            "output_tokens": self.output_tokens,
+            "cache_hit_ratio": (
+                self.cached_input_tokens / self.input_tokens if self.input_tokens else 0.0
+            ),
+        }
 
 
 # === Interface commune ===
@@ -44,6 +132,34 @@ class AIProvider(Protocol):
     ) -> Iterable[str]:
         """Yield chunks of a response for the given prompt."""
 
+    async def agenerate_response(
+        self, prompt: str, attachments: list[Attachment] | None = None
+    ) -> str:
+        """Asynchronously generate a textual response for the given prompt."""
+
+    def astream_response(
+        self, prompt: str, attachments: list[Attachment] | None = None
+    ) -> AsyncIterator[str]:
+        """Asynchronously yield chunks of a response for the given prompt."""
+
+
+def _invalid_file_error(exc: BaseException) -> bool:
+    """Whether OpenAI rejected a request because a file it references is gone or unusable."""
+
+    from openai import BadRequestError, NotFoundError
+
+    if isinstance(exc, NotFoundError):
+        return True
+    return isinstance(exc, BadRequestError) and "file" in str(exc).lower()
+
+
+@dataclass
+class _UploadTracker:
+    """Provider files touched while building one request."""
+
+    temporary: list[str] = field(default_factory=list)  # supprimés après la réponse
+    reused: list[str] = field(default_factory=list)  # empreintes servies par le registre
+
 
 # === Implémentation OpenAI (nouveau SDK) ===
 @dataclass
@@ -52,70 +168,261 @@ class OpenAIProvider:
 
     api_key: str
     model: str = "gpt-4o-mini"
+    prompt_cache_key: str | None = None
+    # Au-delà de cette taille, les pièces jointes passent par l'API Files plutôt qu'en base64.
+    inline_attachment_limit: int = 2 * 1024 * 1024
+    # Registre optionnel : un même contenu n'est envoyé qu'une fois puis référencé par son id.
+    attachment_registry: AttachmentRegistry | None = field(default=None, repr=False)
+    dedup_min_size: int = 64 * 1024
+    http_client: httpx.Client | None = field(default=None, repr=False)
+    async_http_client: httpx.AsyncClient | None = field(default=None, repr=False)
+    base_url: str | None = None
 
     def __post_init__(self) -> None:
         if not self.api_key:
             raise ProviderConfigurationError("An OpenAI API key is required")
 
-        # Création du client OpenAI une fois pour toutes
-        self.client = OpenAI(api_key=self.api_key)
+        # SDK importé à la construction : son import coûte plus que celui de FastAPI.
+        from openai import DEFAULT_TIMEOUT, AsyncOpenAI, OpenAI
+
+        # Création des clients OpenAI (synchrone et asynchrone) une fois pour toutes,
+        # sur le pool de connexions partagé lorsqu'il est fourni. Les délais du SDK
+        # (lecture longue pour les réponses et les fichiers) sont repris explicitement :
+        # sinon ceux du pool, bien plus courts (HTTP_TIMEOUT), s'appliqueraient.
+        self.client = OpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            http_client=self.http_client,
+            timeout=DEFAULT_TIMEOUT,
+        )
+        self.async_client = AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            http_client=self.async_http_client,
+            timeout=DEFAULT_TIMEOUT,
+        )
+        self.usage = ProviderUsage()
+
+    def _should_upload(self, attachment: Attachment) -> bool:
+        return attachment.size > self.inline_attachment_limit
+
+    @staticmethod
+    def _upload_arguments(attachment: Attachment) -> dict[str, Any]:
+        mime_type = attachment.mime_type or "application/octet-stream"
+        purpose = "vision" if mime_type.startswith("image/") else "user_data"
+        return {"file": (attachment.filename, attachment.open(), mime_type), "purpose": purpose}
+
+    @staticmethod
+    def _attachment_part(attachment: Attachment, file_id: str | None) -> dict[str, str]:
+        mime_type = attachment.mime_type
+        is_image = bool(mime_type and mime_type.startswith("image/"))
+
+        if file_id is not None:
+            return {"type": "input_image" if is_image else "input_file", "file_id": file_id}
+
+        encoded_data = encode_base64(attachment)
+        if is_image:
+            return {"type": "input_image", "image_url": f"data:{mime_type};base64,{encoded_data}"}
+
+        file_payload: dict[str, str] = {"type": "input_file", "file_data": encoded_data}
+        if attachment.filename:
+            file_payload["filename"] = attachment.filename
+        return file_payload
+
+    def _registry_digest(self, attachment: Attachment) -> str | None:
+        if self.attachment_registry is None or attachment.size < self.dedup_min_size:
+            return None
+        return attachment.content_hash()
+
+    def _resolve_file_id(self, attachment: Attachment, tracker: _UploadTracker) -> str | None:
+        digest = self._registry_digest(attachment)
+        if digest is not None:
+            assert self.attachment_registry is not None
+            file_id = self.attachment_registry.get(digest)
+            if file_id is not None:
+                tracker.reused.append(digest)
+                return file_id
+            # Premier passage de ce contenu : envoyé une seule fois puis référencé par son id.
+            file_id = self.client.files.create(**self._upload_arguments(attachment)).id
+            for stale_id in self.attachment_registry.put(digest, file_id, attachment.size):
+                self._delete_file(stale_id)
+            return file_id
+
+        if self._should_upload(attachment):
+            # Les gros fichiers passent par l'API Files, lue en flux depuis le disque.
+            file_id = self.client.files.create(**self._upload_arguments(attachment)).id
+            tracker.temporary.append(file_id)
+            return file_id
+        return None
+
+    async def _aresolve_file_id(
+        self, attachment: Attachment, tracker: _UploadTracker
+    ) -> str | None:
+        digest = self._registry_digest(attachment)
+        if digest is not None:
+            assert self.attachment_registry is not None
+            # Le registre est une base SQLite : ses accès ne bloquent pas la boucle.
+            file_id = await run_in_thread(self.attachment_registry.get, digest)
+            if file_id is not None:
+                tracker.reused.append(digest)
+                return file_id
+            uploaded_file = await self.async_client.files.create(
+                **self._upload_arguments(attachment)
+            )
+            stale_ids = await run_in_thread(
+                self.attachment_registry.put, digest, uploaded_file.id, attachment.size
+            )
+            for stale_id in stale_ids:
+                await self._adelete_file(stale_id)
+            return uploaded_file.id
+
+        if self._should_upload(attachment):
+            uploaded_file = await self.async_client.files.create(
+                **self._upload_arguments(attachment)
+            )
+            tracker.temporary.append(uploaded_file.id)
+            return uploaded_file.id
+        return None
 
     def _create_input_content(
-        self, prompt: str, attachments: list[Attachment] | None
+        self, prompt: str, attachments: list[Attachment] | None, tracker: _UploadTracker
     ) -> list[dict[str, str]]:
         input_content: list[dict[str, str]] = [{"type": "input_text", "text": prompt}]
 
         for attachment in attachments or []:
-            mime_type = attachment.content_type or mimetypes.guess_type(attachment.filename)[0]
-            encoded_data = base64.b64encode(attachment.content).decode("utf-8")
-
-            if mime_type and mime_type.startswith("image/"):
-                data_uri = f"data:{mime_type};base64,{encoded_data}"
-                input_content.append({"type": "input_image", "image_url": data_uri})
-            else:
-                file_payload: dict[str, str] = {
-                    "type": "input_file",
-                    "file_data": encoded_data,
-                }
-                if attachment.filename:
-                    file_payload["filename"] = attachment.filename
-                input_content.append(file_payload)
+            file_id = self._resolve_file_id(attachment, tracker)
+            input_content.append(self._attachment_part(attachment, file_id))
 
         return input_content
 
+    async def _acreate_input_content(
+        self, prompt: str, attachments: list[Attachment] | None, tracker: _UploadTracker
+    ) -> list[dict[str, str]]:
+        input_content: list[dict[str, str]] = [{"type": "input_text", "text": prompt}]
+
+        for attachment in attachments or []:
+            file_id = await self._aresolve_file_id(attachment, tracker)
+            input_content.append(self._attachment_part(attachment, file_id))
+
+        return input_content
+
+    def _forget_reused(self, tracker: _UploadTracker) -> list[str]:
+        """Drop registry entries used by a request rejected for an invalid file.
+
+        Return the file ids no longer referenced, to be deleted upstream.
+        """
+        if self.attachment_registry is None:
+            return []
+        stale_ids: list[str] = []
+        for digest in tracker.reused:
+            stale_ids.extend(self.attachment_registry.discard(digest))
+        return stale_ids
+
+    def _create_request(
+        self, input_content: list[dict[str, str]], model: str | None = None
+    ) -> dict[str, Any]:
+        # Les instructions statiques restent en tête : elles forment le préfixe stable
+        # que le cache de prompt d'OpenAI peut réutiliser d'une requête à l'autre.
+        request: dict[str, Any] = {
+            "model": model or self.model,
+            "input": [{"role": "user", "content": input_content}],
+            "instructions": "Tu es Jarvis, une IA personnelle utile et amicale.",
+        }
+        if self.prompt_cache_key:
+            request["prompt_cache_key"] = self.prompt_cache_key
+        return request
+
+    def _handle_event(self, event: Any) -> str:
+        if event.type == "response.output_text.delta":
+            return event.delta or ""
+        if event.type == "response.completed":
+            self.usage.record(getattr(event.response, "usage", None))
+        elif event.type == "response.error":
+            raise ProviderRequestError(event.error.message)
+        return ""
+
     def stream_response(
-        self, prompt: str, attachments: list[Attachment] | None = None
+        self, prompt: str, attachments: list[Attachment] | None = None, model: str | None = None
     ) -> Iterable[str]:
+        tracker = _UploadTracker()
         try:
-            input_content = self._create_input_content(prompt, attachments)
-
+            input_content = self._create_input_content(prompt, attachments, tracker)
             with self.client.responses.stream(
-                model=self.model,
-                input=[{"role": "user", "content": input_content}],
-                instructions="Tu es Jarvis, une IA personnelle utile et amicale.",
+                **self._create_request(input_content, model)
             ) as stream:
                 for event in stream:
-                    if event.type == "response.output_text.delta":
-                        delta = event.delta or ""
-                        if delta:
-                            yield delta
-                    elif event.type == "response.error":
-                        raise ProviderRequestError(event.error.message)
+                    delta = self._handle_event(event)
+                    if delta:
+                        yield delta
 
                 stream.until_done()
 
         except ProviderRequestError:
             raise
         except Exception as exc:
+            if _invalid_file_error(exc):
+                tracker.temporary.extend(self._forget_reused(tracker))
             print("❌ Erreur OpenAI:", exc)
             raise ProviderRequestError("Failed to fetch a response from OpenAI") from exc
+        finally:
+            for file_id in tracker.temporary:
+                self._delete_file(file_id)
 
     def generate_response(
-        self, prompt: str, attachments: list[Attachment] | None = None
+        self, prompt: str, attachments: list[Attachment] | None = None, model: str | None = None
     ) -> str:
-        final_text = "".join(self.stream_response(prompt, attachments)).strip()
+        final_text = "".join(self.stream_response(prompt, attachments, model)).strip()
+        return final_text or "(Réponse vide)"
+
+    async def astream_response(
+        self, prompt: str, attachments: list[Attachment] | None = None, model: str | None = None
+    ) -> AsyncIterator[str]:
+        tracker = _UploadTracker()
+        try:
+            input_content = await self._acreate_input_content(prompt, attachments, tracker)
+            async with self.async_client.responses.stream(
+                **self._create_request(input_content, model)
+            ) as stream:
+                async for event in stream:
+                    delta = self._handle_event(event)
+                    if delta:
+                        yield delta
+
+                await stream.until_done()
+
+        except ProviderRequestError:
+            raise
+        except Exception as exc:
+            # Seul un fichier refusé par l'API invalide l'entrée du registre (une panne
+            # réseau ou un quota dépassé ne dit rien du fichier). Oublié, il n'est plus
+            # référencé : supprimé avec les fichiers temporaires, il ne reste pas dans le
+            # quota de l'utilisateur.
+            if _invalid_file_error(exc):
+                tracker.temporary.extend(await run_in_thread(self._forget_reused, tracker))
+            print("❌ Erreur OpenAI:", exc)
+            raise ProviderRequestError("Failed to fetch a response from OpenAI") from exc
+        finally:
+            for file_id in tracker.temporary:
+                await self._adelete_file(file_id)
+
+    def _delete_file(self, file_id: str) -> None:
+        try:
+            self.client.files.delete(file_id)
+        except Exception as exc:  # pragma: no cover - log only
+            print(f"⚠️ Suppression impossible du fichier OpenAI {file_id}:", exc)
+
+    async def _adelete_file(self, file_id: str) -> None:
+        try:
+            await self.async_client.files.delete(file_id)
+        except Exception as exc:  # pragma: no cover - log only
+            print(f"⚠️ Suppression impossible du fichier OpenAI {file_id}:", exc)
+
+    async def agenerate_response(
+        self, prompt: str, attachments: list[Attachment] | None = None, model: str | None = None
+    ) -> str:
+        parts = [delta async for delta in self.astream_response(prompt, attachments, model)]
+        final_text = "".join(parts).strip()
         return final_text or "(Réponse vide)"
-        
 
 
 # === Implémentation HuggingFace ===
@@ -126,24 +433,54 @@ class HuggingFaceProvider:
     model: str
     api_key: str | None = None
     endpoint_template: str = "https://api-inference.huggingface.co/models/{model}"
+    http_client: httpx.Client | None = field(default=None, repr=False)
+    async_http_client: httpx.AsyncClient | None = field(default=None, repr=False)
 
     def __post_init__(self) -> None:
         if not self.model:
             raise ProviderConfigurationError("A Hugging Face model identifier is required")
 
+        if self.http_client is None:
+            self.http_client = httpx.Client(timeout=30.0)
+        if self.async_http_client is None:
+            self.async_http_client = httpx.AsyncClient(timeout=30.0)
+
+    @property
+    def endpoint_url(self) -> str:
+        return self.endpoint_template.format(model=self.model)
+
+    @property
+    def _headers(self) -> dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
     def generate_response(
         self, prompt: str, attachments: list[Attachment] | None = None
     ) -> str:
-        url = self.endpoint_template.format(model=self.model)
-        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        try:
+            response = self.http_client.post(
+                self.endpoint_url, headers=self._headers, json={"inputs": prompt}
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as exc:
+            raise ProviderRequestError("Failed to fetch a response from Hugging Face") from exc
+
+        return self._parse_generated_text(response.json())
 
+    async def agenerate_response(
+        self, prompt: str, attachments: list[Attachment] | None = None
+    ) -> str:
         try:
-            response = httpx.post(url, headers=headers, json={"inputs": prompt})
+            response = await self.async_http_client.post(
+                self.endpoint_url, headers=self._headers, json={"inputs": prompt}
+            )
             response.raise_for_status()
         except httpx.HTTPError as exc:
             raise ProviderRequestError("Failed to fetch a response from Hugging Face") from exc
 
-        data = response.json()
+        return self._parse_generated_text(response.json())
+
+    @staticmethod
+    def _parse_generated_text(data: Any) -> str:
         if isinstance(data, list) and data:
             generated_text = data[0].get("generated_text")
             if isinstance(generated_text, str):
@@ -155,26 +492,128 @@ class HuggingFaceProvider:
 
         raise ProviderRequestError("Unexpected response structure from Hugging Face")
 
+    @property
+    def _stream_headers(self) -> dict[str, str]:
+        return {**self._headers, "Accept": "text/event-stream"}
+
+    @staticmethod
+    def _parse_stream_line(line: str) -> str | None:
+        """Return the token carried by one Text-Generation-Inference SSE line."""
+
+        if not line.startswith("data:"):
+            return None
+        payload = line[len("data:") :].strip()
+        if not payload or payload == "[DONE]":
+            return None
+        try:
+            event = json.loads(payload)
+        except ValueError as exc:
+            raise ProviderRequestError("Malformed streaming event from Hugging Face") from exc
+
+        if event.get("error"):
+            raise ProviderRequestError(f"Hugging Face streaming error: {event['error']}")
+        token = event.get("token") or {}
+        if token.get("special"):
+            return None
+        text = token.get("text")
+        return text if isinstance(text, str) and text else None
+
+    @staticmethod
+    def _is_event_stream(response: httpx.Response) -> bool:
+        return response.headers.get("content-type", "").startswith("text/event-stream")
+
     def stream_response(
         self, prompt: str, attachments: list[Attachment] | None = None
     ) -> Iterable[str]:
-        yield self.generate_response(prompt, attachments)
+        try:
+            with self.http_client.stream(
+                "POST",
+                self.endpoint_url,
+                headers=self._stream_headers,
+                json={"inputs": prompt, "stream": True},
+            ) as response:
+                response.raise_for_status()
+                if not self._is_event_stream(response):
+                    # Endpoint sans streaming : réponse JSON classique, renvoyée d'un bloc.
+                    response.read()
+                    yield self._parse_generated_text(response.json())
+                    return
+                for line in response.iter_lines():
+                    token = self._parse_stream_line(line)
+                    if token:
+                        yield token
+        except httpx.HTTPError as exc:
+            raise ProviderRequestError("Failed to stream a response from Hugging Face") from exc
+
+    async def astream_response(
+        self, prompt: str, attachments: list[Attachment] | None = None
+    ) -> AsyncIterator[str]:
+        try:
+            async with self.async_http_client.stream(
+                "POST",
+                self.endpoint_url,
+                headers=self._stream_headers,
+                json={"inputs": prompt, "stream": True},
+            ) as response:
+                response.raise_for_status()
+                if not self._is_event_stream(response):
+                    await response.aread()
+                    yield self._parse_generated_text(response.json())
+                    return
+                async for line in response.aiter_lines():
+                    token = self._parse_stream_line(line)
+                    if token:
+                        yield token
+        except httpx.HTTPError as exc:
+            raise ProviderRequestError("Failed to stream a response from Hugging Face") from exc
 
 
 # === Factory ===
-def create_provider(provider_name: str, **kwargs: str | None) -> AIProvider:
-    """Factory that instantiates the proper provider."""
+def create_provider(provider_name: str, **kwargs: Any) -> AIProvider:
+    """Factory that instantiates the proper provider.
+
+    ``http_client`` / ``async_http_client`` may be given to share pooled
+    connections between the provider and the rest of the application.
+    """
 
     normalized_name = provider_name.lower()
     if normalized_name == "openai":
         return OpenAIProvider(
             api_key=kwargs.get("openai_api_key") or "",
             model=kwargs.get("openai_model") or "gpt-4o-mini",
+            prompt_cache_key=kwargs.get("openai_prompt_cache_key"),
+            inline_attachment_limit=kwargs.get("openai_inline_attachment_limit") or 2 * 1024 * 1024,
+            attachment_registry=kwargs.get("attachment_registry"),
+            dedup_min_size=kwargs.get("attachment_dedup_min_size") or 64 * 1024,
+            http_client=kwargs.get("http_client"),
+            async_http_client=kwargs.get("async_http_client"),
+            base_url=kwargs.get("openai_base_url"),
         )
     if normalized_name == "huggingface":
         return HuggingFaceProvider(
             model=kwargs.get("huggingface_model") or "",
             api_key=kwargs.get("huggingface_api_key"),
+            http_client=kwargs.get("http_client"),
+            async_http_client=kwargs.get("async_http_client"),
+        )
+    if normalized_name == "router":
+        from backend.services.provider_router import ProviderRouter, parse_backend_specs
+
+        backends: list[tuple[str, AIProvider]] = []
+        for backend_name, model in parse_backend_specs(kwargs.get("router_backends") or ""):
+            if backend_name == "router":
+                raise ProviderConfigurationError("A router cannot contain another router")
+            model = model or kwargs.get(f"{backend_name}_model") or ""
+            backend_kwargs = {**kwargs, f"{backend_name}_model": model}
+            backends.append(
+                (f"{backend_name}:{model}", create_provider(backend_name, **backend_kwargs))
+            )
+        return ProviderRouter(
+            backends,
+            failure_threshold=kwargs.get("router_failure_threshold") or 3,
+            reset_timeout=kwargs.get("router_reset_timeout") or 30.0,
+            max_attempts=kwargs.get("router_max_attempts") or 2,
+            latency_alpha=kwargs.get("router_latency_alpha") or 0.2,
         )
 
     raise ProviderConfigurationError(f"Unknown AI provider '{provider_name}'")
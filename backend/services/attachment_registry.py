@@ -0,0 +1,110 @@
+"""Registre des pièces jointes déjà envoyées au provider, indexé par contenu."""
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from typing import Callable
+
+
+class AttachmentRegistry:
+    """Map ``sha256`` digests to provider file ids, persisted in SQLite.
+
+    Entries expire ``ttl`` seconds after their upload and at most
+    ``max_entries`` are kept (least recently used first out). Methods that drop
+    entries return the provider file ids that should be deleted upstream.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float = 7 * 24 * 3600,
+        max_entries: int = 1000,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS attachments ("
+            "sha256 TEXT PRIMARY KEY, "
+            "file_id TEXT NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, "
+            "last_used REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS attachments_last_used ON attachments(last_used)"
+        )
+        self._db.commit()
+
+    def get(self, sha256: str) -> str | None:
+        """Return the file id registered for ``sha256`` if it is still fresh."""
+
+        now = self.clock()
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT file_id, created_at FROM attachments WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self._db.execute(
+                "UPDATE attachments SET last_used = ? WHERE sha256 = ?", (now, sha256)
+            )
+        self.hits += 1
+        return row[0]
+
+    def put(self, sha256: str, file_id: str, size: int) -> list[str]:
+        """Register an uploaded file; return the file ids evicted as a consequence."""
+
+        now = self.clock()
+        with self._lock, self._db:
+            previous = self._db.execute(
+                "SELECT file_id FROM attachments WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO attachments (sha256, file_id, size, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (sha256, file_id, size, now, now),
+            )
+            evicted = self._evict(now)
+        if previous is not None and previous[0] != file_id:
+            evicted.append(previous[0])
+        return evicted
+
+    def discard(self, sha256: str) -> list[str]:
+        """Forget ``sha256`` (e.g. after the provider rejected its file id)."""
+
+        with self._lock, self._db:
+            rows = self._db.execute(
+                "DELETE FROM attachments WHERE sha256 = ? RETURNING file_id", (sha256,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _evict(self, now: float) -> list[str]:
+        rows = self._db.execute(
+            "DELETE FROM attachments WHERE created_at < ? RETURNING file_id", (now - self.ttl,)
+        ).fetchall()
+        count = self._db.execute("SELECT COUNT(*) FROM attachments").fetchone()[0]
+        if count > self.max_entries:
+            rows += self._db.execute(
+                "DELETE FROM attachments WHERE sha256 IN ("
+                "SELECT sha256 FROM attachments ORDER BY last_used LIMIT ?) RETURNING file_id",
+                (count - self.max_entries,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM attachments").fetchone()[0]
+        return {"entries": count, "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        self._db.close()
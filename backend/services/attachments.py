@@ -0,0 +1,130 @@
+"""Ingestion des pièces jointes : lecture par blocs vers un fichier temporaire."""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import tempfile
+import threading
+from typing import BinaryIO, Protocol
+
+from backend.services.ai_provider import Attachment
+from backend.services.metrics import run_in_thread
+
+
+class AttachmentTooLargeError(ValueError):
+    """Raised when an upload exceeds the per-file or per-request size limit."""
+
+
+class _Upload(Protocol):
+    filename: str | None
+    content_type: str | None
+
+    async def read(self, size: int = -1) -> bytes: ...
+
+    async def close(self) -> None: ...
+
+
+class UploadBudget:
+    """Remaining byte allowance shared by every upload of one request."""
+
+    def __init__(self, max_request_size: int) -> None:
+        self.remaining = max_request_size
+        # Les fichiers d'une requête sont copiés en parallèle, dans des threads.
+        self._lock = threading.Lock()
+
+    def consume(self, size: int) -> None:
+        with self._lock:
+            self.remaining -= size
+            remaining = self.remaining
+        if remaining < 0:
+            raise AttachmentTooLargeError(
+                "Les pièces jointes dépassent la taille totale autorisée par requête."
+            )
+
+
+class _Spool:
+    """Spooled copy of one upload, checked against the size limits as it grows."""
+
+    def __init__(
+        self, filename: str, budget: UploadBudget, max_file_size: int, spool_threshold: int
+    ) -> None:
+        self.filename = filename
+        self.budget = budget
+        self.max_file_size = max_file_size
+        self.file = tempfile.SpooledTemporaryFile(max_size=spool_threshold)
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > self.max_file_size:
+            raise AttachmentTooLargeError(
+                f"Le fichier '{self.filename}' dépasse la taille autorisée."
+            )
+        self.budget.consume(len(chunk))
+        self.digest.update(chunk)
+        self.file.write(chunk)
+
+    def copy(self, source: BinaryIO, chunk_size: int, cancelled: threading.Event) -> None:
+        while not cancelled.is_set() and (chunk := source.read(chunk_size)):
+            self.write(chunk)
+
+
+async def spool_upload(
+    upload: _Upload,
+    budget: UploadBudget,
+    max_file_size: int,
+    spool_threshold: int = 1024 * 1024,
+    chunk_size: int = 256 * 1024,
+) -> Attachment | None:
+    """Copy ``upload`` chunk by chunk into a spooled temporary file.
+
+    Small files stay in memory, larger ones roll over to disk, so the request
+    never holds a whole large upload as one ``bytes`` object. Limits are checked
+    against the declared size first, then while reading. A Starlette upload has
+    already been received into its own spooled file, which is copied in a
+    worker thread rather than chunk by chunk on the event loop.
+    """
+
+    filename = upload.filename or "pièce-jointe"
+    declared_size = getattr(upload, "size", None)
+    if declared_size is not None and declared_size > max_file_size:
+        raise AttachmentTooLargeError(f"Le fichier '{filename}' dépasse la taille autorisée.")
+
+    spool = _Spool(filename, budget, max_file_size, spool_threshold)
+    source: BinaryIO | None = getattr(upload, "file", None)
+    try:
+        if source is not None:
+            cancelled = threading.Event()
+            copy = run_in_thread(spool.copy, source, chunk_size, cancelled)
+            try:
+                await asyncio.shield(copy)
+            except asyncio.CancelledError:
+                # Le thread ne s'interrompt pas : il s'arrête au bloc suivant, et le fichier
+                # n'est fermé qu'une fois la copie terminée.
+                cancelled.set()
+                copy.add_done_callback(lambda _: spool.file.close())
+                raise
+        else:
+            while chunk := await upload.read(chunk_size):
+                spool.write(chunk)
+    except asyncio.CancelledError:
+        if source is None:
+            spool.file.close()
+        raise
+    except BaseException:
+        spool.file.close()
+        raise
+
+    if not spool.size:
+        spool.file.close()
+        return None
+
+    spool.file.seek(0)
+    return Attachment(
+        filename=filename,
+        content_type=upload.content_type,
+        file=spool.file,
+        size=spool.size,
+        sha256=spool.digest.hexdigest(),
+    )
@@ -0,0 +1,86 @@
+"""Shared HTTP connection pools reused by every upstream call."""
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+from dataclasses import dataclass, field
+from typing import Iterable
+from urllib.parse import urlsplit
+
+import httpx
+
+from backend.services.metrics import run_in_thread
+
+
+def _http2_available() -> bool:
+    """HTTP/2 support in httpx relies on the optional ``h2`` package."""
+    return importlib.util.find_spec("h2") is not None
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+@dataclass
+class HTTPClientPool:
+    """Process-wide pooled HTTP clients with keep-alive and optional HTTP/2.
+
+    One synchronous and one asynchronous client are created for the lifetime of
+    the application so that upstream calls reuse open TCP/TLS connections
+    instead of paying a new handshake on every request.
+    """
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    timeout: float = 30.0
+    http2: bool = True
+    async_client: httpx.AsyncClient = field(init=False, repr=False)
+    sync_client: httpx.Client = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        if self.http2 and not _http2_available():
+            # ``h2`` figure dans requirements.txt : son absence mérite d'être signalée.
+            print("⚠️ Paquet h2 absent : connexions en HTTP/1.1 au lieu de HTTP/2.")
+            self.http2 = False
+        self.async_client = httpx.AsyncClient(limits=limits, timeout=self.timeout, http2=self.http2)
+        self.sync_client = httpx.Client(limits=limits, timeout=self.timeout, http2=self.http2)
+
+    async def warm_up(self, urls: Iterable[str], timeout: float = 5.0) -> dict[str, bool]:
+        """Open a pooled connection to each upstream origin ahead of the first request.
+
+        Any HTTP answer (even an error status) means the connection is established
+        and kept alive; network failures are reported but never raised.
+        """
+
+        origins = list(dict.fromkeys(_origin(url) for url in urls if url))
+
+        async def probe(origin: str) -> bool:
+            try:
+                await self.async_client.head(origin, timeout=timeout)
+            except httpx.HTTPError as exc:
+                print(f"⚠️ Préchauffage impossible pour {origin}:", exc)
+                return False
+            return True
+
+        def probe_sync() -> None:
+            for origin in origins:
+                try:
+                    self.sync_client.head(origin, timeout=timeout)
+                except httpx.HTTPError:
+                    continue
+
+        results = await asyncio.gather(*(probe(origin) for origin in origins))
+        await run_in_thread(probe_sync)
+        return dict(zip(origins, results))
+
+    async def aclose(self) -> None:
+        """Close both clients and release their pooled connections."""
+        await self.async_client.aclose()
+        self.sync_client.close()
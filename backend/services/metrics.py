@@ -0,0 +1,258 @@
+"""Métriques internes exposées au format texte de Prometheus (sans dépendance externe)."""
+from __future__ import annotations
+
+import asyncio
+from bisect import bisect_left
+from contextlib import contextmanager
+import contextvars
+import functools
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Iterator, Sequence
+
+
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """Gauge set explicitly (``inc``/``dec``) or read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], float] | None = None,
+    ) -> None:
+        super().__init__(name, documentation)
+        self.callback = callback
+        self._value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def value(self) -> float:
+        if self.callback is not None:
+            try:
+                return float(self.callback())
+            except Exception:  # pragma: no cover - a broken callback must not break /metrics
+                return math.nan
+        return self._value
+
+    def render(self) -> list[str]:
+        return self.header() + [f"{self.name} {_format_value(self.value())}"]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; an observation is one bisect and three additions."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Compteurs par seau (non cumulés), puis somme et nombre d'observations.
+                series = self._series[key] = [0.0] * (len(self.buckets) + 3)
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return int(series[-1]) if series else 0
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = self.header()
+        for key, series in items:
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, math.inf), series):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(series[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def gauge(
+        self, name: str, documentation: str, callback: Callable[[], float] | None = None
+    ) -> Gauge:
+        return self._register(Gauge(name, documentation, callback))  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))  # type: ignore[return-value]
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())  # type: ignore[attr-defined]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# === Métriques de /chat ===
+STAGE_SECONDS = REGISTRY.histogram(
+    "jarvis_chat_stage_seconds",
+    "Durée des étapes de /chat (lecture des pièces jointes, mémoire, historique, prompt...).",
+    labelnames=("stage",),
+)
+TIME_TO_FIRST_TOKEN = REGISTRY.histogram(
+    "jarvis_time_to_first_token_seconds",
+    "Délai entre l'appel au provider et le premier morceau de réponse.",
+    labelnames=("provider",),
+)
+GENERATION_SECONDS = REGISTRY.histogram(
+    "jarvis_generation_seconds",
+    "Durée totale de génération côté provider.",
+    labelnames=("provider",),
+)
+TOKENS_PER_SECOND = REGISTRY.histogram(
+    "jarvis_generation_tokens_per_second",
+    "Débit de génération (tokens de sortie par seconde).",
+    labelnames=("provider",),
+    buckets=(1, 5, 10, 20, 40, 60, 80, 100, 150, 200, 400),
+)
+UPSTREAM_ERRORS = REGISTRY.counter(
+    "jarvis_upstream_errors_total",
+    "Erreurs renvoyées par les providers en amont.",
+    labelnames=("provider",),
+)
+WORKER_THREADS_BUSY = REGISTRY.gauge(
+    "jarvis_worker_threads_busy",
+    "Tâches bloquantes en cours dans le pool de threads par défaut.",
+)
+WORKER_THREADS_MAX = REGISTRY.gauge(
+    "jarvis_worker_threads_max",
+    "Taille du pool de threads par défaut d'asyncio.",
+    callback=lambda: min(32, (os.cpu_count() or 1) + 4),
+)
+
+
+def run_in_thread(func: Callable[..., Any], *args: Any) -> asyncio.Future:
+    """Like :func:`asyncio.to_thread`, counted in ``jarvis_worker_threads_busy``.
+
+    Every blocking call of the server goes through here, so the gauge can be
+    compared with ``jarvis_worker_threads_max`` to spot a saturated pool.
+    """
+
+    def tracked() -> Any:
+        # Compté dans le thread lui-même : un appel annulé avant son départ ne fausse rien.
+        WORKER_THREADS_BUSY.inc()
+        try:
+            return func(*args)
+        finally:
+            WORKER_THREADS_BUSY.dec()
+
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(None, functools.partial(context.run, tracked))
@@ -0,0 +1,192 @@
+"""Choix du modèle par requête : classifieur local de complexité et journal des décisions.
+
+Évaluation hors ligne d'un journal enregistré ::
+
+    python -m backend.services.model_selector backend/memory/model_decisions.jsonl --threshold 1.5
+"""
+from __future__ import annotations
+
+import argparse
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+import json
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterable, Sequence
+
+from backend.services.prompt_assembler import count_tokens
+
+
+_ANALYTICAL = re.compile(
+    r"\b(analyse[rz]?|compare[rz]?|comparaison|explique[rz]?|pourquoi|résume[rz]?|synthèse"
+    r"|rédige[rz]?|démontre[rz]?|calcule[rz]?|stratégie|plan|code|fonction|bug|traduis"
+    r"|détaille[rz]?|argumente[rz]?|avantages|inconvénients)\b",
+    re.IGNORECASE,
+)
+_CODE = re.compile(r"```|\bdef |\bclass |\bimport |[{};]\s*$", re.MULTILINE)
+
+
+@dataclass
+class RequestFeatures:
+    """Cheap features of a ``/chat`` request, computed before calling the model."""
+
+    text_tokens: int = 0
+    attachment_count: int = 0
+    memory_hits: int = 0
+    history_turns: int = 0
+    analytical_terms: int = 0
+    has_code: bool = False
+
+    @classmethod
+    def from_request(
+        cls,
+        text: str,
+        attachment_count: int = 0,
+        memory_hits: int = 0,
+        history_turns: int = 0,
+    ) -> "RequestFeatures":
+        return cls(
+            text_tokens=count_tokens(text),
+            attachment_count=attachment_count,
+            memory_hits=memory_hits,
+            history_turns=history_turns,
+            analytical_terms=len(_ANALYTICAL.findall(text)),
+            has_code=bool(_CODE.search(text)),
+        )
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "RequestFeatures":
+        known = {name: data[name] for name in cls.__dataclass_fields__ if name in data}
+        return cls(**known)
+
+
+@dataclass
+class ModelDecision:
+    model: str
+    tier: str
+    score: float
+    reasons: list[str] = field(default_factory=list)
+
+
+@dataclass
+class ModelSelector:
+    """Score a request and pick ``fast_model`` below ``threshold``, else ``strong_model``.
+
+    Every feature adds to the score with its weight; ``reasons`` lists the
+    contributions so the decision log stays readable.
+    """
+
+    fast_model: str
+    strong_model: str
+    threshold: float = 1.0
+    tokens_per_point: int = 80
+    attachment_weight: float = 2.0
+    memory_weight: float = 0.25
+    analytical_weight: float = 0.75
+    code_weight: float = 1.0
+
+    def score(self, features: RequestFeatures) -> tuple[float, list[str]]:
+        contributions = {
+            "longueur": features.text_tokens / max(self.tokens_per_point, 1),
+            "pièces jointes": features.attachment_count * self.attachment_weight,
+            "souvenirs": features.memory_hits * self.memory_weight,
+            "termes analytiques": features.analytical_terms * self.analytical_weight,
+            "code": self.code_weight if features.has_code else 0.0,
+        }
+        reasons = [f"{name}={value:.2f}" for name, value in contributions.items() if value]
+        return sum(contributions.values()), reasons
+
+    def select(self, features: RequestFeatures) -> ModelDecision:
+        score, reasons = self.score(features)
+        if score >= self.threshold:
+            return ModelDecision(self.strong_model, "strong", score, reasons)
+        return ModelDecision(self.fast_model, "fast", score, reasons)
+
+
+class DecisionLog:
+    """Append routing decisions to a JSONL file, one object per request."""
+
+    def __init__(self, path: str, record_text: bool = True, max_text_chars: int = 500) -> None:
+        self.path = Path(path)
+        self.record_text = record_text
+        self.max_text_chars = max_text_chars
+        self._lock = threading.Lock()
+
+    def record(self, text: str, features: RequestFeatures, decision: ModelDecision) -> None:
+        entry: dict[str, Any] = {
+            "timestamp": time.time(),
+            "features": asdict(features),
+            "decision": asdict(decision),
+        }
+        if self.record_text:
+            entry["text"] = text[: self.max_text_chars]
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as handle:
+                handle.write(line + "\n")
+
+
+def load_decisions(path: str) -> list[dict[str, Any]]:
+    with open(path, encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def evaluate(records: Iterable[dict[str, Any]], selector: ModelSelector) -> dict[str, Any]:
+    """Replay recorded requests through ``selector``.
+
+    Reports the share of requests sent to each tier, the agreement with the
+    decisions originally logged and, for records carrying an ``expected`` tier
+    (added by hand when labelling), the accuracy and the confusion counts.
+    """
+
+    tiers: Counter[str] = Counter()
+    confusion: Counter[str] = Counter()
+    agreed = labelled = correct = total = 0
+
+    for record in records:
+        features = RequestFeatures.from_dict(record.get("features", {}))
+        decision = selector.select(features)
+        total += 1
+        tiers[decision.tier] += 1
+        if record.get("decision", {}).get("tier") == decision.tier:
+            agreed += 1
+        expected = record.get("expected")
+        if expected:
+            labelled += 1
+            correct += int(expected == decision.tier)
+            confusion[f"{expected}->{decision.tier}"] += 1
+
+    report: dict[str, Any] = {
+        "requests": total,
+        "tiers": dict(tiers),
+        "fast_share": tiers["fast"] / total if total else 0.0,
+        "agreement_with_log": agreed / total if total else 0.0,
+    }
+    if labelled:
+        report["labelled"] = labelled
+        report["accuracy"] = correct / labelled
+        report["confusion"] = dict(confusion)
+    return report
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Évalue le choix de modèle sur un journal JSONL.")
+    parser.add_argument("log", help="journal des décisions (JSONL)")
+    parser.add_argument("--threshold", type=float, default=1.0)
+    parser.add_argument("--fast-model", default="fast")
+    parser.add_argument("--strong-model", default="strong")
+    args = parser.parse_args(argv)
+
+    selector = ModelSelector(args.fast_model, args.strong_model, threshold=args.threshold)
+    report = evaluate(load_decisions(args.log), selector)
+    json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry point
+    raise SystemExit(main())
@@ -0,0 +1,209 @@
+"""Assemblage des sections du prompt envoyé au provider."""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+import math
+import re
+from typing import Callable, Sequence
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None  # type: ignore[assignment]
+
+
+PROMPT_LAYOUTS: dict[str, tuple[str, ...]] = {
+    # Ordre historique : le contexte temporel (qui change chaque minute) vient en tête.
+    "legacy": ("temporal", "history", "memories", "attachments", "request"),
+    # Du plus stable au plus volatil, pour que les requêtes successives partagent
+    # le plus long préfixe possible et profitent du cache de prompt du provider.
+    "cache": ("memories", "history", "temporal", "attachments", "request"),
+}
+
+_TRUNCATION_MARK = " […]"
+
+
+@lru_cache(maxsize=1)
+def _get_encoder():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:  # pragma: no cover - encoding files unavailable offline
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with ``tiktoken`` when available, else ~4 characters per token."""
+
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def truncate_to_tokens(
+    text: str,
+    max_tokens: int,
+    counter: Callable[[str], int] = count_tokens,
+    keep_end: bool = False,
+) -> str:
+    """Cut ``text`` so that it fits in ``max_tokens``, preferably on a word boundary.
+
+    The beginning of the text is kept, or its end when ``keep_end`` is true.
+    """
+
+    if max_tokens <= 0:
+        return ""
+    if counter(text) <= max_tokens:
+        return text
+
+    def piece(length: int) -> str:
+        return text[len(text) - length :] if keep_end else text[:length]
+
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if counter(piece(middle) + _TRUNCATION_MARK) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+
+    cut = piece(low)
+    if keep_end:
+        boundary = cut.find(" ")
+        if 0 <= boundary < low // 2:
+            cut = cut[boundary + 1 :]
+        return _TRUNCATION_MARK.strip() + " " + cut.lstrip() if cut else ""
+
+    boundary = cut.rfind(" ")
+    if boundary > low // 2:
+        cut = cut[:boundary]
+    return cut.rstrip() + _TRUNCATION_MARK if cut else ""
+
+
+@dataclass
+class PromptSection:
+    """One block of the prompt.
+
+    ``priority`` decides what survives when the budget is exceeded: sections
+    with the lowest priority are truncated (then dropped) first. Sections with
+    ``required=True`` are never altered; ``keep_end`` truncates from the start,
+    e.g. to keep the most recent exchanges of the history.
+    """
+
+    name: str
+    text: str
+    priority: int = 0
+    required: bool = False
+    keep_end: bool = False
+
+
+@dataclass
+class AssembledPrompt:
+    text: str
+    section_tokens: dict[str, int] = field(default_factory=dict)
+    truncated: list[str] = field(default_factory=list)
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self.section_tokens.values())
+
+
+@dataclass
+class PromptAssembler:
+    """Lay sections out and keep their total size under ``token_budget``.
+
+    A budget of ``0`` disables the size control.
+    """
+
+    token_budget: int = 0
+    layout: str = "legacy"
+    counter: Callable[[str], int] = count_tokens
+
+    def assemble(self, sections: Sequence[PromptSection]) -> AssembledPrompt:
+        try:
+            order = PROMPT_LAYOUTS[self.layout]
+        except KeyError as exc:
+            raise ValueError(f"Unknown prompt layout '{self.layout}'") from exc
+
+        texts = {section.name: section.text for section in sections if section.text}
+        tokens = {name: self.counter(text) for name, text in texts.items()}
+        truncated: list[str] = []
+
+        if self.token_budget > 0:
+            excess = sum(tokens.values()) - self.token_budget
+            for section in sorted(sections, key=lambda item: item.priority):
+                if excess <= 0:
+                    break
+                if section.required or section.name not in texts:
+                    continue
+                allowed = max(tokens[section.name] - excess, 0)
+                shortened = truncate_to_tokens(
+                    texts[section.name], allowed, self.counter, keep_end=section.keep_end
+                )
+                truncated.append(section.name)
+                excess -= tokens[section.name] - self.counter(shortened)
+                if shortened:
+                    texts[section.name] = shortened
+                    tokens[section.name] = self.counter(shortened)
+                else:
+                    del texts[section.name]
+                    del tokens[section.name]
+
+        text = "\n\n".join(texts[name] for name in order if texts.get(name))
+        return AssembledPrompt(
+            text=text,
+            section_tokens={name: tokens[name] for name in order if name in tokens},
+            truncated=truncated,
+        )
+
+
+def _first_sentence(text: str, max_chars: int) -> str:
+    flattened = " ".join(text.split())
+    match = re.match(r"(.+?[.!?])(\s|$)", flattened)
+    sentence = match.group(1) if match else flattened
+    if len(sentence) > max_chars:
+        sentence = sentence[: max_chars - 1].rstrip() + "…"
+    return sentence
+
+
+class RollingHistorySummary:
+    """Condense older exchanges into a rolling summary.
+
+    Each folded exchange becomes one short extractive line: :meth:`update`
+    appends the lines of newly folded exchanges to the previous summary and
+    drops the oldest ones once ``max_tokens`` is reached. The summary therefore
+    keeps covering exchanges that already left the history window; it is kept
+    by the history store, next to the exchanges it summarises.
+    """
+
+    def __init__(
+        self, max_tokens: int = 300, counter: Callable[[str], int] = count_tokens
+    ) -> None:
+        self.max_tokens = max_tokens
+        self.counter = counter
+
+    @staticmethod
+    def _summarise(question: str, answer: str) -> str:
+        return (
+            f"- L'utilisateur a demandé « {_first_sentence(question, 160)} » ; "
+            f"Jarvis a répondu « {_first_sentence(answer, 200)} »"
+        )
+
+    def update(self, summary: str, folded: Sequence[tuple[str, str]]) -> str:
+        """Fold ``folded`` exchanges into ``summary`` and return the new summary."""
+
+        lines = summary.splitlines() if summary else []
+        for question, answer in folded:
+            line = self._summarise(question, answer)
+            if line not in lines:
+                lines.append(line)
+
+        while len(lines) > 1 and self.counter("\n".join(lines)) > self.max_tokens:
+            lines.pop(0)
+
+        return "\n".join(lines)
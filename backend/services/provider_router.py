@@ -0,0 +1,332 @@
+"""Routage entre plusieurs providers : sélection par latence, bascule et disjoncteurs."""
+from __future__ import annotations
+
+from contextlib import aclosing
+from dataclasses import dataclass, field
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, Sequence
+
+from backend.services.ai_provider import (
+    AIProvider,
+    Attachment,
+    ProviderConfigurationError,
+    ProviderRequestError,
+)
+from backend.services.metrics import UPSTREAM_ERRORS, run_in_thread
+
+
+@dataclass
+class CircuitBreaker:
+    """Open after ``failure_threshold`` consecutive failures.
+
+    While open the backend is skipped; after ``reset_timeout`` seconds a single
+    trial request is let through (half-open) and its outcome closes or re-opens
+    the circuit.
+    """
+
+    failure_threshold: int = 3
+    reset_timeout: float = 30.0
+    clock: Callable[[], float] = time.monotonic
+    consecutive_failures: int = 0
+    opened_at: float | None = None
+    _trial_in_flight: bool = field(default=False, repr=False)
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+
+    def abandon(self) -> None:
+        """Release a request that ended without an outcome (e.g. cancelled).
+
+        A half-open trial counts as failed so that the next trial can start
+        after ``reset_timeout``; otherwise the circuit is left untouched.
+        """
+
+        if self._trial_in_flight:
+            self.record_failure()
+
+
+@dataclass
+class RoutedBackend:
+    """One provider of the router with its rolling statistics.
+
+    ``latency`` is an exponentially weighted moving average of the time to the
+    first token (the full duration for non-streamed calls) and ``error_rate``
+    the same average over failures.
+    """
+
+    name: str
+    provider: AIProvider
+    breaker: CircuitBreaker
+    latency: float | None = None
+    error_rate: float = 0.0
+    requests: int = 0
+    failures: int = 0
+
+    def record(self, alpha: float, latency: float | None, failed: bool) -> None:
+        self.requests += 1
+        self.failures += int(failed)
+        self.error_rate = (1 - alpha) * self.error_rate + alpha * float(failed)
+        if latency is not None:
+            self.latency = latency if self.latency is None else (1 - alpha) * self.latency + alpha * latency
+        if failed:
+            UPSTREAM_ERRORS.inc(provider=self.name)
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "state": self.breaker.state,
+            "latency": self.latency,
+            "error_rate": self.error_rate,
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+class ProviderRouter:
+    """Composite provider that sends each request to the fastest healthy backend.
+
+    Backends are ranked by rolling latency (never measured first, so each one
+    gets probed), then by error rate. A failed request is retried on the next
+    candidate, up to ``max_attempts`` backends; streamed requests only fail over
+    while no token has been sent to the caller.
+    """
+
+    def __init__(
+        self,
+        backends: Sequence[tuple[str, AIProvider]],
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        max_attempts: int = 2,
+        latency_alpha: float = 0.2,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if not backends:
+            raise ProviderConfigurationError("The provider router needs at least one backend")
+        self.backends = [
+            RoutedBackend(name, provider, CircuitBreaker(failure_threshold, reset_timeout, clock))
+            for name, provider in backends
+        ]
+        self.max_attempts = max(max_attempts, 1)
+        self.latency_alpha = latency_alpha
+        self.clock = clock
+        self._lock = threading.Lock()
+
+    def _candidates(self) -> Iterator[RoutedBackend]:
+        """Yield the backends to try, best first; breakers are consulted lazily."""
+
+        with self._lock:
+            ordered = sorted(
+                self.backends,
+                key=lambda backend: (
+                    backend.latency if backend.latency is not None else 0.0,
+                    backend.error_rate,
+                ),
+            )
+        attempts = 0
+        for backend in ordered:
+            if attempts >= self.max_attempts:
+                return
+            with self._lock:
+                allowed = backend.breaker.allow()
+            if allowed:
+                attempts += 1
+                yield backend
+
+    def _record(self, backend: RoutedBackend, started: float, failed: bool, timed: bool = True) -> None:
+        latency = self.clock() - started if timed else None
+        with self._lock:
+            backend.record(self.latency_alpha, latency, failed)
+
+    def _abandon(self, backend: RoutedBackend, exc: BaseException) -> None:
+        """Settle an attempt interrupted by anything but a ``ProviderRequestError``."""
+
+        if isinstance(exc, Exception):
+            # Erreur inattendue du backend : un échec comme un autre.
+            self._record(backend, self.clock(), failed=True, timed=False)
+            return
+        # Annulation (client déconnecté, arrêt) : le backend n'y est pour rien,
+        # mais un essai semi-ouvert doit être libéré.
+        with self._lock:
+            backend.breaker.abandon()
+
+    def _record_late_failure(self, backend: RoutedBackend) -> None:
+        # Échec après le premier token : compté comme erreur, sans nouvel échantillon de latence.
+        UPSTREAM_ERRORS.inc(provider=backend.name)
+        with self._lock:
+            backend.failures += 1
+            backend.error_rate = (1 - self.latency_alpha) * backend.error_rate + self.latency_alpha
+            backend.breaker.record_failure()
+
+    def _unavailable(self, last_error: Exception | None) -> ProviderRequestError:
+        if last_error is None:
+            return ProviderRequestError("No healthy AI provider is available")
+        error = ProviderRequestError(f"All AI providers failed: {last_error}")
+        error.__cause__ = last_error
+        return error
+
+    def generate_response(
+        self, prompt: str, attachments: list[Attachment] | None = None
+    ) -> str:
+        last_error: Exception | None = None
+        for backend in self._candidates():
+            started = self.clock()
+            try:
+                response = backend.provider.generate_response(prompt, attachments)
+            except ProviderRequestError as exc:
+                self._record(backend, started, failed=True, timed=False)
+                last_error = exc
+                continue
+            except BaseException as exc:
+                self._abandon(backend, exc)
+                raise
+            self._record(backend, started, failed=False)
+            return response
+        raise self._unavailable(last_error)
+
+    async def agenerate_response(
+        self, prompt: str, attachments: list[Attachment] | None = None
+    ) -> str:
+        last_error: Exception | None = None
+        for backend in self._candidates():
+            started = self.clock()
+            try:
+                response = await self._agenerate_on(backend, prompt, attachments)
+            except ProviderRequestError as exc:
+                self._record(backend, started, failed=True, timed=False)
+                last_error = exc
+                continue
+            except BaseException as exc:
+                self._abandon(backend, exc)
+                raise
+            self._record(backend, started, failed=False)
+            return response
+        raise self._unavailable(last_error)
+
+    def stream_response(
+        self, prompt: str, attachments: list[Attachment] | None = None
+    ) -> Iterable[str]:
+        last_error: Exception | None = None
+        for backend in self._candidates():
+            started = self.clock()
+            try:
+                chunks: Iterator[str] = iter(backend.provider.stream_response(prompt, attachments))
+                first = next(chunks, None)
+            except ProviderRequestError as exc:
+                self._record(backend, started, failed=True, timed=False)
+                last_error = exc
+                continue
+            except BaseException as exc:
+                self._abandon(backend, exc)
+                raise
+            self._record(backend, started, failed=False)
+            if first is not None:
+                yield first
+            # Le premier token est parti : plus de bascule possible.
+            try:
+                yield from chunks
+            except ProviderRequestError:
+                self._record_late_failure(backend)
+                raise
+            return
+        raise self._unavailable(last_error)
+
+    async def astream_response(
+        self, prompt: str, attachments: list[Attachment] | None = None
+    ) -> AsyncIterator[str]:
+        last_error: Exception | None = None
+        for backend in self._candidates():
+            started = self.clock()
+            astream = getattr(backend.provider, "astream_response", None)
+            if astream is None:
+                try:
+                    response = await self._agenerate_on(backend, prompt, attachments)
+                except ProviderRequestError as exc:
+                    self._record(backend, started, failed=True, timed=False)
+                    last_error = exc
+                    continue
+                except BaseException as exc:
+                    self._abandon(backend, exc)
+                    raise
+                self._record(backend, started, failed=False)
+                yield response
+                return
+
+            async with aclosing(astream(prompt, attachments)) as chunks:
+                try:
+                    first = await anext(chunks, None)
+                except ProviderRequestError as exc:
+                    self._record(backend, started, failed=True, timed=False)
+                    last_error = exc
+                    continue
+                except BaseException as exc:
+                    self._abandon(backend, exc)
+                    raise
+                self._record(backend, started, failed=False)
+                if first is not None:
+                    yield first
+                # Le premier token est parti : plus de bascule possible.
+                try:
+                    async for chunk in chunks:
+                        yield chunk
+                except ProviderRequestError:
+                    self._record_late_failure(backend)
+                    raise
+            return
+        raise self._unavailable(last_error)
+
+    @staticmethod
+    async def _agenerate_on(
+        backend: RoutedBackend, prompt: str, attachments: list[Attachment] | None
+    ) -> str:
+        agenerate = getattr(backend.provider, "agenerate_response", None)
+        if agenerate is not None:
+            return await agenerate(prompt, attachments)
+        return await run_in_thread(backend.provider.generate_response, prompt, attachments)
+
+    def stats(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [backend.as_dict() for backend in self.backends]
+
+
+def parse_backend_specs(specs: str) -> list[tuple[str, str]]:
+    """Parse ``"openai:gpt-4o-mini,huggingface:gpt2"`` into ``(provider, model)`` pairs."""
+
+    parsed: list[tuple[str, str]] = []
+    for spec in specs.split(","):
+        spec = spec.strip()
+        if not spec:
+            continue
+        provider_name, _, model = spec.partition(":")
+        parsed.append((provider_name.strip().lower(), model.strip()))
+    if not parsed:
+        raise ProviderConfigurationError("ROUTER_BACKENDS must list at least one backend")
+    return parsed
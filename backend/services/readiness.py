@@ -0,0 +1,92 @@
+"""Suivi de l'initialisation en arrière-plan des composants du serveur (/readyz)."""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+import time
+from typing import Any, Callable, Iterable
+
+from backend.services.metrics import run_in_thread
+
+
+class ComponentDisabled(RuntimeError):
+    """Raised by an initialiser when its component is deliberately turned off."""
+
+
+@dataclass
+class ComponentState:
+    status: str = "pending"
+    started_at: float | None = None
+    duration: float | None = None
+    error: str | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        state: dict[str, Any] = {"status": self.status}
+        if self.duration is not None:
+            state["duration_ms"] = round(1000 * self.duration, 3)
+        if self.error is not None:
+            state["error"] = self.error
+        return state
+
+
+class Readiness:
+    """Run component initialisers off the event loop and record how each one went.
+
+    Each component is ``pending`` until its initialiser returns (``ready``),
+    raises :class:`ComponentDisabled` (``disabled``) or raises anything else
+    (``failed``). The server is ready as soon as the ``required`` components
+    are ready; optional components such as the memory neither hold traffic
+    back while they initialise nor when they fail, since requests degrade
+    without them.
+    """
+
+    def __init__(self, components: Iterable[str], required: Iterable[str] = ()) -> None:
+        self.components = {name: ComponentState() for name in components}
+        self.required = set(required)
+        self.started = time.monotonic()
+        self._settled = {name: asyncio.Event() for name in self.components}
+
+    async def run(self, name: str, initialiser: Callable[[], Any]) -> bool:
+        """Run ``initialiser`` (in a worker thread unless it is a coroutine function).
+
+        Return whether the component is ready.
+        """
+
+        state = self.components[name]
+        state.status, state.error = "pending", None
+        state.started_at = time.monotonic()
+        try:
+            if asyncio.iscoroutinefunction(initialiser):
+                await initialiser()
+            else:
+                await run_in_thread(initialiser)
+        except ComponentDisabled as exc:
+            state.status, state.error = "disabled", str(exc)
+        except Exception as exc:
+            state.status, state.error = "failed", str(exc) or type(exc).__name__
+        else:
+            state.status = "ready"
+        finally:
+            state.duration = time.monotonic() - state.started_at
+            self._settled[name].set()
+        return state.status == "ready"
+
+    async def wait(self, name: str, timeout: float | None = None) -> str:
+        """Wait until ``name`` has settled (or ``timeout`` elapses); return its status."""
+
+        try:
+            await asyncio.wait_for(self._settled[name].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.components[name].status
+
+    @property
+    def ready(self) -> bool:
+        return all(self.components[name].status == "ready" for name in self.required)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "uptime_s": round(time.monotonic() - self.started, 3),
+            "components": {name: state.as_dict() for name, state in self.components.items()},
+        }
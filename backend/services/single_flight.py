@@ -0,0 +1,237 @@
+"""Coalescence des requêtes identiques en cours : une seule génération partagée."""
+from __future__ import annotations
+
+import asyncio
+from contextlib import aclosing
+from dataclasses import dataclass, field
+import hashlib
+import itertools
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, TypeVar
+
+
+T = TypeVar("T")
+
+
+def flight_key(*parts: str | None, attachment_hashes: Iterable[str] = ()) -> str:
+    """Digest identifying a generation: the prompt and options plus attachment contents."""
+
+    digest = hashlib.sha256()
+    for part in (*parts, *attachment_hashes):
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+@dataclass
+class _Flight:
+    factory: Callable[[], AsyncIterator[str]]
+    chunks: list[str] = field(default_factory=list)
+    done: bool = False
+    error: BaseException | None = None
+    # Abonnés obtenus via ``stream`` mais pas encore itérés.
+    pending: int = 0
+    # Position de chaque abonné en cours de lecture (index du prochain morceau).
+    cursors: dict[int, int] = field(default_factory=dict)
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+    consumed: asyncio.Event = field(default_factory=asyncio.Event)
+    task: asyncio.Task | None = None
+    # Libère ce que tient ``factory`` si la génération n'est jamais lancée.
+    on_discard: Callable[[], None] | None = None
+
+    def notify(self) -> None:
+        # Un nouvel évènement par étape : chaque abonné attend le suivant sans en manquer.
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    def lead(self) -> int:
+        """How many chunks the generation is ahead of its slowest reader."""
+        return len(self.chunks) - min(self.cursors.values()) if self.cursors else 0
+
+
+class _Subscription:
+    """One subscriber's iterator over a shared stream.
+
+    Reading starts the subscription; :meth:`release` (also called by
+    :meth:`aclose` and on garbage collection) gives up one that was never
+    read, so an unsent response does not keep its flight registered.
+    """
+
+    def __init__(self, owner: SingleFlight, key: str, flight: _Flight) -> None:
+        self._owner = owner
+        self._key = key
+        self._flight = flight
+        self._chunks: AsyncIterator[str] | None = None
+        self._released = False
+
+    def __aiter__(self) -> _Subscription:
+        return self
+
+    async def __anext__(self) -> str:
+        if self._chunks is None:
+            if self._released:
+                raise StopAsyncIteration
+            self._chunks = self._owner._follow(self._key, self._flight)
+        return await self._chunks.__anext__()
+
+    async def aclose(self) -> None:
+        if self._chunks is not None:
+            await self._chunks.aclose()
+        self.release()
+
+    def release(self) -> None:
+        if self._chunks is None and not self._released:
+            self._released = True
+            self._owner._release(self._key, self._flight)
+
+    def __del__(self) -> None:
+        self.release()
+
+
+@dataclass
+class _Call:
+    future: asyncio.Future[Any]
+    waiters: int = 0
+
+
+class SingleFlight:
+    """Share one upstream call between concurrent identical requests.
+
+    :meth:`stream` fans the chunks of a single generation out to every
+    subscriber, replaying those emitted before a late subscriber joined;
+    :meth:`run` shares the result of a coroutine. Both return whether the
+    caller leads the flight (its factory is the one being executed). A flight
+    is forgotten as soon as it completes, so later requests start afresh.
+
+    A shared stream starts when its first subscriber starts reading and never
+    runs more than ``max_lead`` chunks ahead of its slowest reader, so slow
+    clients still throttle the upstream stream. Both kinds of flight are
+    cancelled once every caller has gone; a stream released by all its
+    subscribers before it started is forgotten and its ``on_discard``
+    callback called instead.
+    """
+
+    def __init__(self, max_lead: int = 32) -> None:
+        self.max_lead = max(max_lead, 1)
+        self._streams: dict[str, _Flight] = {}
+        self._calls: dict[str, _Call] = {}
+        self._cursor_ids = itertools.count()
+        self.leaders = 0
+        self.followers = 0
+
+    def stream(
+        self,
+        key: str,
+        factory: Callable[[], AsyncIterator[str]],
+        on_discard: Callable[[], None] | None = None,
+    ) -> tuple[_Subscription, bool]:
+        flight = self._streams.get(key)
+        leader = flight is None
+        if flight is None:
+            flight = _Flight(factory, on_discard=on_discard)
+            self._streams[key] = flight
+            self.leaders += 1
+        else:
+            self.followers += 1
+        flight.pending += 1
+        return _Subscription(self, key, flight), leader
+
+    def _release(self, key: str, flight: _Flight) -> None:
+        flight.pending -= 1
+        if flight.pending or flight.cursors or flight.done:
+            return
+        if flight.task is not None:
+            flight.task.cancel()
+            return
+        # Jamais lancée et plus personne pour la lire : la génération est oubliée.
+        flight.done = True
+        if self._streams.get(key) is flight:
+            del self._streams[key]
+        if flight.on_discard is not None:
+            flight.on_discard()
+
+    async def _pump(self, key: str, flight: _Flight) -> None:
+        try:
+            async with aclosing(flight.factory()) as chunks:
+                async for chunk in chunks:
+                    flight.chunks.append(chunk)
+                    flight.notify()
+                    # Contre-pression : la génération attend le lecteur le plus lent.
+                    while flight.lead() >= self.max_lead:
+                        flight.consumed.clear()
+                        await flight.consumed.wait()
+        except asyncio.CancelledError:
+            flight.error = RuntimeError("La génération partagée a été interrompue.")
+            raise
+        except Exception as exc:
+            flight.error = exc
+        finally:
+            flight.done = True
+            if self._streams.get(key) is flight:
+                del self._streams[key]
+            flight.notify()
+
+    async def _follow(self, key: str, flight: _Flight) -> AsyncIterator[str]:
+        flight.pending -= 1
+        cursor = next(self._cursor_ids)
+        flight.cursors[cursor] = 0
+        if flight.task is None and not flight.done:
+            flight.task = asyncio.ensure_future(self._pump(key, flight))
+        index = 0
+        try:
+            while True:
+                while index < len(flight.chunks):
+                    yield flight.chunks[index]
+                    index += 1
+                    flight.cursors[cursor] = index
+                    flight.consumed.set()
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await flight.changed.wait()
+        finally:
+            del flight.cursors[cursor]
+            flight.consumed.set()
+            # Plus personne n'écoute : inutile de poursuivre la génération.
+            if (
+                not flight.cursors
+                and not flight.pending
+                and not flight.done
+                and flight.task is not None
+            ):
+                flight.task.cancel()
+
+    def run(self, key: str, factory: Callable[[], Awaitable[T]]) -> tuple[Awaitable[T], bool]:
+        call = self._calls.get(key)
+        leader = call is None
+        if call is None:
+            call = _Call(asyncio.ensure_future(factory()))
+            self._calls[key] = call
+            call.future.add_done_callback(lambda _: self._forget_call(key, call))
+            self.leaders += 1
+        else:
+            self.followers += 1
+        call.waiters += 1
+        return self._wait(call), leader
+
+    @staticmethod
+    async def _wait(call: _Call) -> Any:
+        try:
+            # Un appelant annulé ne doit pas interrompre le résultat attendu par les autres.
+            return await asyncio.shield(call.future)
+        finally:
+            call.waiters -= 1
+            # Le dernier appelant parti, la génération n'a plus de destinataire.
+            if call.waiters == 0 and not call.future.done():
+                call.future.cancel()
+
+    def _forget_call(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "in_flight": len(self._streams) + len(self._calls),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
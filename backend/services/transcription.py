@@ -0,0 +1,237 @@
+"""Transcription audio asynchrone : repli entre modèles, requêtes couvertes et cache."""
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+import hashlib
+from io import BytesIO
+import threading
+import time
+from typing import Any, Callable, Sequence
+
+
+class TranscriptionError(RuntimeError):
+    """Raised when no transcription model returned a usable transcript."""
+
+
+class TranscriptionCache:
+    """LRU of transcripts keyed by the SHA-256 of the audio clip."""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl: float = 3600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(audio: bytes) -> str:
+        return hashlib.sha256(audio).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self.clock() - entry[1] > self.ttl:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, transcript: str) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (transcript, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class Transcriber:
+    """Transcribe clips with an ``AsyncOpenAI`` client, trying ``models`` in order.
+
+    A model that fails (or returns an empty transcript) hands over to the next
+    one. With ``hedge_delay`` set, the next model is also started when the
+    current attempt has not answered after that many seconds; the first usable
+    transcript wins and the other attempts are cancelled.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        models: Sequence[str],
+        hedge_delay: float | None = None,
+        cache: TranscriptionCache | None = None,
+    ) -> None:
+        if not models:
+            raise ValueError("Au moins un modèle de transcription est requis.")
+        self.client = client
+        self.models = tuple(models)
+        self.hedge_delay = hedge_delay if hedge_delay and hedge_delay > 0 else None
+        self.cache = cache
+
+    async def transcribe(
+        self, audio: bytes, filename: str = "enregistrement.webm", use_cache: bool = True
+    ) -> str:
+        cache = self.cache if use_cache else None
+        key = TranscriptionCache.key(audio) if cache is not None else ""
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+        transcript = await self._race(audio, filename)
+        if cache is not None:
+            cache.put(key, transcript)
+        return transcript
+
+    async def _attempt(self, model: str, audio: bytes, filename: str) -> str:
+        buffer = BytesIO(audio)
+        buffer.name = filename
+        result = await self.client.audio.transcriptions.create(model=model, file=buffer)
+
+        transcript = getattr(result, "text", None)
+        if not isinstance(transcript, str):
+            raise TranscriptionError("Réponse de transcription invalide.")
+        transcript = transcript.strip()
+        if not transcript:
+            raise TranscriptionError("Réponse de transcription vide.")
+        return transcript
+
+    async def _race(self, audio: bytes, filename: str) -> str:
+        remaining = list(self.models)
+        pending: set[asyncio.Task[str]] = set()
+        last_error: Exception | None = None
+
+        def launch_next() -> None:
+            if remaining:
+                model = remaining.pop(0)
+                pending.add(asyncio.ensure_future(self._attempt(model, audio, filename)))
+
+        launch_next()
+        try:
+            while pending:
+                timeout = self.hedge_delay if remaining else None
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Requête couverte : le modèle courant tarde, on lance le suivant en parallèle.
+                    launch_next()
+                    continue
+
+                for task in done:
+                    pending.discard(task)
+                    try:
+                        return task.result()
+                    except Exception as exc:
+                        last_error = exc
+                        launch_next()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise TranscriptionError("La transcription vocale a échoué.") from last_error
+
+
+class StubTranscriber:
+    """Offline transcriber: the "audio" is decoded as UTF-8 text.
+
+    Used for local development and tests of the streaming endpoint.
+    """
+
+    async def transcribe(
+        self, audio: bytes, filename: str = "enregistrement.webm", use_cache: bool = True
+    ) -> str:
+        transcript = audio.decode("utf-8", errors="ignore").strip()
+        if not transcript:
+            raise TranscriptionError("Réponse de transcription vide.")
+        return transcript
+
+
+class TranscriptionStream:
+    """Accumulate the chunks of a recording and transcribe it incrementally.
+
+    Partial transcripts re-transcribe everything received so far (container
+    formats such as WebM are only decodable from the first chunk), at most
+    once every ``partial_interval`` seconds. Each one must also cover at least
+    ``partial_growth`` times the audio of the previous one: re-sending the
+    whole buffer at a fixed pace would make the audio uploaded (and billed
+    by a remote API) grow quadratically with the utterance, whereas
+    geometric growth keeps it below ``growth / (growth - 1)`` times the
+    final clip (twice with the default). ``partials=False`` disables them.
+    They bypass the transcript cache; :meth:`finish` does not.
+    """
+
+    def __init__(
+        self,
+        transcriber: Any,
+        filename: str = "enregistrement.webm",
+        partial_interval: float = 1.0,
+        max_bytes: int = 25 * 1024 * 1024,
+        clock: Callable[[], float] = time.monotonic,
+        partials: bool = True,
+        partial_growth: float = 2.0,
+    ) -> None:
+        self.transcriber = transcriber
+        self.filename = filename
+        self.partial_interval = partial_interval
+        self.partials = partials
+        self.partial_growth = max(partial_growth, 1.0)
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.last_partial = ""
+        self._buffer = bytearray()
+        self._partial_size = 0
+        self._partial_at: float | None = None
+
+    @property
+    def size(self) -> int:
+        return len(self._buffer)
+
+    def feed(self, chunk: bytes) -> None:
+        if len(self._buffer) + len(chunk) > self.max_bytes:
+            raise TranscriptionError("Le flux audio dépasse la taille autorisée.")
+        self._buffer.extend(chunk)
+
+    def partial_due(self) -> bool:
+        if not self.partials or len(self._buffer) <= self._partial_size * self.partial_growth:
+            return False
+        return self._partial_at is None or self.clock() - self._partial_at >= self.partial_interval
+
+    async def partial(self) -> str | None:
+        """Transcribe the audio received so far; ``None`` when the text did not change."""
+
+        snapshot = bytes(self._buffer)
+        self._partial_size = len(snapshot)
+        self._partial_at = self.clock()
+        transcript = await self.transcriber.transcribe(snapshot, self.filename, use_cache=False)
+        if transcript == self.last_partial:
+            return None
+        self.last_partial = transcript
+        return transcript
+
+    async def finish(self) -> str:
+        """Transcribe the whole utterance and reset the stream for the next one."""
+
+        snapshot = bytes(self._buffer)
+        self._buffer.clear()
+        self._partial_size = 0
+        self._partial_at = None
+        self.last_partial = ""
+        if not snapshot:
+            raise TranscriptionError("Le flux audio est vide.")
+        return await self.transcriber.transcribe(snapshot, self.filename)
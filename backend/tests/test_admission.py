@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+import sys
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import backend.main as main
+from backend.memory.history_store import InMemoryHistoryStore
+from backend.services.admission import AdmissionController, AdmissionRejected
+
+
+pytestmark = pytest.mark.anyio("asyncio")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+async def test_waiting_requests_are_admitted_by_priority():
+    controller = AdmissionController(max_concurrency=1, max_queue=10, queue_timeout=1)
+    holder = await controller.acquire("interactive")
+    order: list[str] = []
+
+    async def request(priority: str) -> None:
+        ticket = await controller.acquire(priority)
+        order.append(priority)
+        ticket.release()
+
+    tasks = [asyncio.create_task(request(name)) for name in ("batch", "interactive", "voice")]
+    await asyncio.sleep(0)
+    assert controller.stats()["queued_by_priority"] == {"voice": 1, "interactive": 1, "batch": 1}
+
+    holder.release()
+    await asyncio.gather(*tasks)
+
+    assert order == ["voice", "interactive", "batch"]
+    assert controller.stats()["active"] == 0
+    assert controller.stats()["admitted"] == 4
+
+
+async def test_full_queue_is_rejected_and_slow_waits_time_out():
+    controller = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=0.05)
+    holder = await controller.acquire()
+    waiting = asyncio.create_task(controller.acquire())
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejected) as full:
+        await controller.acquire()
+    assert full.value.status_code == 429
+    assert full.value.retry_after >= 1
+
+    with pytest.raises(AdmissionRejected) as timed_out:
+        await waiting
+    assert timed_out.value.status_code == 503
+
+    holder.release()
+    stats = controller.stats()
+    assert (stats["active"], stats["queued"], stats["rejected"], stats["timed_out"]) == (0, 0, 1, 1)
+
+
+async def test_cancelled_waiters_do_not_leak_slots():
+    controller = AdmissionController(max_concurrency=1, max_queue=5, queue_timeout=1)
+    holder = await controller.acquire()
+    waiting = asyncio.create_task(controller.acquire())
+    await asyncio.sleep(0)
+    waiting.cancel()
+    await asyncio.gather(waiting, return_exceptions=True)
+
+    holder.release()
+    holder.release()
+
+    assert controller.stats()["active"] == 0
+    ticket = await asyncio.wait_for(controller.acquire(), 0.5)
+    ticket.release()
+
+
+async def test_chat_returns_retry_after_when_saturated(monkeypatch):
+    class RecordingProvider:
+        def generate_response(self, prompt: str, attachments=None) -> str:  # type: ignore[override]
+            return "réponse"
+
+    controller = AdmissionController(max_concurrency=1, max_queue=0, queue_timeout=1)
+    monkeypatch.setattr(main, "_admission", controller)
+    monkeypatch.setattr(main, "_provider", RecordingProvider())
+    monkeypatch.setattr(main, "_provider_error", None)
+    monkeypatch.setattr(main, "_memory", None)
+    monkeypatch.setattr(main, "_history_store", InMemoryHistoryStore(limit=5))
+
+    assert await main.chat(text="hello", files=None, stream=False) == {"response": "réponse"}
+    assert controller.stats()["active"] == 0
+
+    holder = await controller.acquire()
+    with pytest.raises(HTTPException) as exc_info:
+        await main.chat(text="hello", files=None, stream=False, priority="voice")
+    holder.release()
+
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.headers["Retry-After"] == "1"
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import io
+from pathlib import Path
+from types import SimpleNamespace
+import sys
+import threading
+
+from fastapi import UploadFile
+import httpx
+import openai
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.services.ai_provider import (
+    Attachment,
+    OpenAIProvider,
+    ProviderRequestError,
+    _UploadTracker,
+    encode_base64,
+)
+from backend.services.attachment_registry import AttachmentRegistry
+from backend.services.attachments import AttachmentTooLargeError, UploadBudget, spool_upload
+
+
+pytestmark = pytest.mark.anyio("asyncio")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class ChunkedUpload:
+    def __init__(self, data: bytes, filename: str = "doc.pdf", size: int | None = None) -> None:
+        self._data = data
+        self._offset = 0
+        self.filename = filename
+        self.content_type = "application/pdf"
+        self.size = size
+        self.reads: list[int] = []
+
+    async def read(self, size: int = -1) -> bytes:
+        self.reads.append(size)
+        end = len(self._data) if size < 0 else self._offset + size
+        chunk = self._data[self._offset : end]
+        self._offset += len(chunk)
+        return chunk
+
+    async def close(self) -> None:
+        return None
+
+
+async def test_spool_upload_reads_in_chunks_and_rolls_over_to_disk():
+    data = bytes(range(256)) * 100
+    upload = ChunkedUpload(data)
+
+    attachment = await spool_upload(
+        upload, UploadBudget(10**6), max_file_size=10**6, spool_threshold=1024, chunk_size=4096
+    )
+
+    assert attachment is not None
+    assert attachment.size == len(data)
+    assert attachment.content == b""
+    assert attachment.file._rolled  # type: ignore[union-attr]
+    assert b"".join(attachment.iter_chunks(1000)) == data
+    assert all(size == 4096 for size in upload.reads)
+    attachment.close()
+
+
+async def test_spool_upload_copies_a_received_upload_file_in_a_worker_thread():
+    class RecordingFile(io.BytesIO):
+        threads: set[int] = set()
+
+        def read(self, size: int = -1) -> bytes:
+            self.threads.add(threading.get_ident())
+            return super().read(size)
+
+    data = b"%PDF-1.7 " * 1000
+    upload = UploadFile(RecordingFile(data), filename="doc.pdf", size=len(data))
+    budget = UploadBudget(10**6)
+
+    attachment = await spool_upload(
+        upload, budget, max_file_size=10**6, spool_threshold=1024, chunk_size=4096
+    )
+
+    assert attachment is not None
+    assert b"".join(attachment.iter_chunks(1000)) == data
+    assert attachment.sha256 == hashlib.sha256(data).hexdigest()
+    assert budget.remaining == 10**6 - len(data)
+    assert RecordingFile.threads and threading.get_ident() not in RecordingFile.threads
+    attachment.close()
+
+    with pytest.raises(AttachmentTooLargeError):
+        await spool_upload(UploadFile(io.BytesIO(data), filename="doc.pdf"), budget, max_file_size=100)
+
+
+async def test_spool_upload_rejects_declared_size_before_reading():
+    upload = ChunkedUpload(b"x" * 10, size=10**9)
+
+    with pytest.raises(AttachmentTooLargeError):
+        await spool_upload(upload, UploadBudget(10**12), max_file_size=1000)
+    assert upload.reads == []
+
+
+async def test_spool_upload_enforces_request_budget():
+    budget = UploadBudget(1500)
+    first = await spool_upload(ChunkedUpload(b"a" * 1000), budget, max_file_size=10**6)
+
+    with pytest.raises(AttachmentTooLargeError):
+        await spool_upload(ChunkedUpload(b"b" * 1000), budget, max_file_size=10**6)
+    assert first is not None
+    first.close()
+
+
+def test_encode_base64_matches_one_shot_encoding():
+    data = bytes(range(256)) * 3000
+    attachment = Attachment(filename="image.png", content=data, content_type="image/png")
+
+    assert encode_base64(attachment) == base64.b64encode(data).decode("ascii")
+
+
+async def test_openai_provider_uploads_large_attachments_through_files_api(monkeypatch):
+    created: list[dict] = []
+    deleted: list[str] = []
+
+    class DummyFiles:
+        async def create(self, **kwargs):
+            created.append(kwargs)
+            return SimpleNamespace(id=f"file-{len(created)}")
+
+        async def delete(self, file_id):
+            deleted.append(file_id)
+
+    provider = OpenAIProvider(api_key="test-key", inline_attachment_limit=10)
+    monkeypatch.setattr(provider, "async_client", SimpleNamespace(files=DummyFiles()))
+
+    tracker = _UploadTracker()
+    content = await provider._acreate_input_content(
+        "prompt",
+        [
+            Attachment(filename="gros.pdf", content=b"x" * 100, content_type="application/pdf"),
+            Attachment(filename="petit.png", content=b"png", content_type="image/png"),
+        ],
+        tracker,
+    )
+
+    assert content[1] == {"type": "input_file", "file_id": "file-1"}
+    assert content[2]["image_url"] == "data:image/png;base64," + base64.b64encode(b"png").decode()
+    assert created[0]["purpose"] == "user_data"
+    assert tracker.temporary == ["file-1"]
+
+    await provider._adelete_file("file-1")
+    assert deleted == ["file-1"]
+
+
+async def test_registry_uploads_identical_content_once(monkeypatch, tmp_path):
+    created: list[dict] = []
+    deleted: list[str] = []
+
+    class DummyFiles:
+        async def create(self, **kwargs):
+            created.append(kwargs)
+            return SimpleNamespace(id=f"file-{len(created)}")
+
+        async def delete(self, file_id):
+            deleted.append(file_id)
+
+    registry = AttachmentRegistry(str(tmp_path / "attachments.sqlite3"))
+    provider = OpenAIProvider(api_key="test-key", attachment_registry=registry, dedup_min_size=1)
+    monkeypatch.setattr(provider, "async_client", SimpleNamespace(files=DummyFiles()))
+
+    payload = b"%PDF-1.7 " * 50
+    for _ in range(3):
+        tracker = _UploadTracker()
+        content = await provider._acreate_input_content(
+            "prompt", [Attachment(filename="doc.pdf", content=payload)], tracker
+        )
+        assert content[1] == {"type": "input_file", "file_id": "file-1"}
+        assert tracker.temporary == []
+
+    assert len(created) == 1
+    assert registry.stats() == {"entries": 1, "hits": 2, "misses": 1}
+
+    reopened = AttachmentRegistry(str(tmp_path / "attachments.sqlite3"))
+    assert reopened.get(Attachment(filename="x", content=payload).content_hash()) == "file-1"
+
+
+def _openai_error(error: type, status_code: int, message: str) -> Exception:
+    request = httpx.Request("POST", "https://api.openai.com/v1/responses")
+    return error(message, response=httpx.Response(status_code, request=request), body=None)
+
+
+@pytest.mark.parametrize(
+    ("failure", "forgotten"),
+    [
+        (lambda: _openai_error(openai.NotFoundError, 404, "No such File object: file-1"), True),
+        (lambda: _openai_error(openai.BadRequestError, 400, "Invalid file 'file-1'"), True),
+        (lambda: _openai_error(openai.BadRequestError, 400, "Invalid 'model'"), False),
+        (lambda: httpx.ConnectError("connexion refusée"), False),
+    ],
+)
+async def test_only_invalid_file_errors_forget_and_delete_reused_files(
+    monkeypatch, tmp_path, failure, forgotten
+):
+    deleted: list[str] = []
+
+    class DummyFiles:
+        async def delete(self, file_id):
+            deleted.append(file_id)
+
+    class FailingResponses:
+        def stream(self, **kwargs):
+            raise failure()
+
+    payload = b"%PDF-1.7 " * 50
+    registry = AttachmentRegistry(str(tmp_path / "attachments.sqlite3"))
+    registry.put(Attachment(filename="doc.pdf", content=payload).content_hash(), "file-1", 450)
+    provider = OpenAIProvider(api_key="test-key", attachment_registry=registry, dedup_min_size=1)
+    monkeypatch.setattr(
+        provider,
+        "async_client",
+        SimpleNamespace(files=DummyFiles(), responses=FailingResponses()),
+    )
+
+    with pytest.raises(ProviderRequestError):
+        await provider.agenerate_response(
+            "prompt", [Attachment(filename="doc.pdf", content=payload)]
+        )
+
+    assert deleted == (["file-1"] if forgotten else [])
+    assert registry.stats()["entries"] == (0 if forgotten else 1)
+
+
+def test_registry_expires_and_evicts_least_recently_used(tmp_path):
+    now = [1000.0]
+    registry = AttachmentRegistry(
+        str(tmp_path / "r.sqlite3"), ttl=100, max_entries=2, clock=lambda: now[0]
+    )
+
+    assert registry.put("a", "file-a", 10) == []
+    now[0] += 1
+    assert registry.put("b", "file-b", 10) == []
+    now[0] += 1
+    assert registry.get("a") == "file-a"
+    assert registry.put("c", "file-c", 10) == ["file-b"]
+
+    now[0] += 200
+    assert registry.get("a") is None
+    assert sorted(registry.put("d", "file-d", 10)) == ["file-a", "file-c"]
+    assert registry.discard("d") == ["file-d"]
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.benchmarks import run as bench
+from backend.benchmarks.fakes import FakeProvider, HashingEmbeddingFunction
+
+
+pytestmark = pytest.mark.anyio("asyncio")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def test_hashing_embeddings_are_deterministic_and_normalised():
+    embed = HashingEmbeddingFunction(dimensions=64)
+
+    first, second, other = embed.embed(["Rappel réunion demain", "rappel  réunion demain", "météo"])
+
+    assert np.allclose(first, second)
+    assert np.isclose(np.linalg.norm(first), 1.0)
+    assert float(first @ other) < 0.99
+
+
+async def test_fake_provider_streams_at_the_configured_rate():
+    provider = FakeProvider(latency=0.0, tokens_per_second=1000, response_tokens=3)
+
+    chunks = [chunk async for chunk in provider.astream_response("question")]
+
+    assert chunks == ["mot0 ", "mot1 ", "mot2 "]
+    assert await provider.agenerate_response("question") == "mot0 mot1 mot2"
+    assert provider.generation_time == pytest.approx(0.002)
+
+
+async def test_chat_benchmark_runs_offline():
+    provider = FakeProvider(latency=0.0, tokens_per_second=0, response_tokens=4)
+
+    result = await bench.bench_chat(provider, memory=None, requests=6, concurrency=3)
+    streaming = await bench.bench_streaming(provider, memory=None, requests=2)
+
+    assert result["requests"] == 6 and result["requests_per_second"] > 0
+    assert streaming["time_to_first_token"]["p50_ms"] >= 0
+
+
+def test_compare_flags_slower_timings_and_lower_throughput():
+    baseline = {"results": {"chat": {"requests_per_second": 100.0, "latency": {"p95_ms": 10.0}}}}
+    current = {"results": {"chat": {"requests_per_second": 70.0, "latency": {"p95_ms": 10.5}}}}
+
+    regressions = bench.compare(current, baseline, tolerance=0.2)
+
+    assert [item["metric"] for item in regressions] == ["chat.requests_per_second"]
+
+
+def test_startup_benchmark_keeps_heavy_imports_off_the_import_path():
+    result = bench.bench_startup(runs=1)
+
+    assert result["import"]["p50_ms"] >= 0
+    assert result["heavy_modules_loaded"] == []
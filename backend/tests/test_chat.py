@@ -1,12 +1,15 @@
 from __future__ import annotations
 
-from collections import deque
+import asyncio
+import json
 from datetime import datetime as real_datetime, timezone as real_timezone
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from types import SimpleNamespace
 from pathlib import Path
 import sys
+import threading
 
+import httpx
 import pytest
 from fastapi import HTTPException
 import fastapi.dependencies.utils as fastapi_utils
@@ -16,6 +19,7 @@ fastapi_utils.ensure_multipart_is_installed = lambda: None
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
 import backend.main as main
+from backend.memory.history_store import InMemoryHistoryStore
 from backend.config import Settings
 from backend.services.ai_provider import (
     HuggingFaceProvider,
@@ -24,6 +28,7 @@ from backend.services.ai_provider import (
     ProviderRequestError,
     create_provider,
 )
+from backend.services.transcription import TranscriptionCache
 
 
 pytestmark = pytest.mark.anyio("asyncio")
@@ -32,11 +37,15 @@ pytestmark = pytest.mark.anyio("asyncio")
 class DummyUpload:
     def __init__(self, data: bytes, filename: str = "sample.webm") -> None:
         self._data = data
+        self._offset = 0
         self.filename = filename
         self.content_type = "audio/webm"
 
-    async def read(self) -> bytes:
-        return self._data
+    async def read(self, size: int = -1) -> bytes:
+        end = len(self._data) if size < 0 else self._offset + size
+        chunk = self._data[self._offset : end]
+        self._offset += len(chunk)
+        return chunk
 
     async def close(self) -> None:
         return None
@@ -131,7 +140,7 @@ async def test_chat_endpoint_success(monkeypatch):
     monkeypatch.setattr(main, "datetime", FixedDatetime)
     monkeypatch.setattr(main, "_provider", RecordingProvider())
     monkeypatch.setattr(main, "_provider_error", None)
-    monkeypatch.setattr(main, "_recent_history", deque(maxlen=5))
+    monkeypatch.setattr(main, "_history_store", InMemoryHistoryStore(limit=5))
 
     response = await main.chat(text="hello", files=None, stream=False)
 
@@ -185,7 +194,7 @@ async def test_chat_endpoint_timezone_fallback(monkeypatch):
     monkeypatch.setattr(main, "ZoneInfo", raising_zoneinfo)
     monkeypatch.setattr(main, "_provider", RecordingProvider())
     monkeypatch.setattr(main, "_provider_error", None)
-    monkeypatch.setattr(main, "_recent_history", deque(maxlen=5))
+    monkeypatch.setattr(main, "_history_store", InMemoryHistoryStore(limit=5))
 
     response = await main.chat(text="hello", files=None, stream=False)
 
@@ -216,7 +225,7 @@ async def test_chat_endpoint_provider_error(monkeypatch):
 
     monkeypatch.setattr(main, "_provider", FailingProvider())
     monkeypatch.setattr(main, "_provider_error", None)
-    monkeypatch.setattr(main, "_recent_history", deque(maxlen=5))
+    monkeypatch.setattr(main, "_history_store", InMemoryHistoryStore(limit=5))
 
     with pytest.raises(HTTPException) as exc_info:
         await main.chat(text="hello", files=None, stream=False)
@@ -228,7 +237,7 @@ async def test_chat_endpoint_provider_error(monkeypatch):
 async def test_chat_endpoint_configuration_error(monkeypatch):
     monkeypatch.setattr(main, "_provider", None)
     monkeypatch.setattr(main, "_provider_error", ProviderConfigurationError("config broken"))
-    monkeypatch.setattr(main, "_recent_history", deque(maxlen=5))
+    monkeypatch.setattr(main, "_history_store", InMemoryHistoryStore(limit=5))
 
     with pytest.raises(HTTPException) as exc_info:
         await main.chat(text="ignored", files=None, stream=False)
@@ -245,14 +254,14 @@ async def test_chat_includes_recent_history(monkeypatch):
             prompts.append(prompt)
             return "réponse"
 
-    history = deque(maxlen=5)
+    history = InMemoryHistoryStore(limit=5)
     for idx in range(1, 6):
-        history.append((f"question {idx}", f"réponse {idx}"))
+        history.append("default", f"question {idx}", f"réponse {idx}")
 
     monkeypatch.setattr(main, "_provider", RecordingProvider())
     monkeypatch.setattr(main, "_provider_error", None)
     monkeypatch.setattr(main, "_memory", None)
-    monkeypatch.setattr(main, "_recent_history", history)
+    monkeypatch.setattr(main, "_history_store", history)
 
     response = await main.chat(text="quelle est la météo ?", files=None, stream=False)
 
@@ -266,32 +275,472 @@ async def test_chat_includes_recent_history(monkeypatch):
         assert f"réponse {idx}" in prompt
     assert "Nouvelle demande :\nquelle est la météo ?" in prompt
 
-    assert len(history) == 5
-    assert history[-1] == ("quelle est la météo ?", "réponse")
+    recorded = history.get("default")
+    assert len(recorded) == 5
+    assert recorded[-1] == ("quelle est la météo ?", "réponse")
 
 
-async def test_transcribe_audio_success(monkeypatch):
-    monkeypatch.setattr(main.settings, "openai_api_key", "fake-key", raising=False)
+async def test_chat_streaming_uses_async_provider(monkeypatch):
+    class AsyncStreamingProvider:
+        def __init__(self) -> None:
+            self.prompts: list[str] = []
 
-    captured_calls: list[tuple[str, bytes]] = []
+        def stream_response(self, prompt: str, attachments=None):  # type: ignore[override]
+            raise AssertionError("Le flux synchrone ne doit plus être utilisé")
 
-    class DummyTranscriptions:
+        async def astream_response(self, prompt: str, attachments=None):  # type: ignore[override]
+            self.prompts.append(prompt)
+            for chunk in ("Bon", "jour", ""):
+                yield chunk
+
+    provider = AsyncStreamingProvider()
+    history = InMemoryHistoryStore(limit=5)
+    monkeypatch.setattr(main, "_provider", provider)
+    monkeypatch.setattr(main, "_provider_error", None)
+    monkeypatch.setattr(main, "_memory", None)
+    monkeypatch.setattr(main, "_history_store", history)
+
+    response = await main.chat(text="salut", files=None, stream=True)
+    chunks = [chunk async for chunk in response.body_iterator]
+
+    assert chunks == ["Bon", "jour"]
+    assert provider.prompts and provider.prompts[0].endswith("Nouvelle demande :\nsalut")
+    assert history.get("default")[-1] == ("salut", "Bonjour")
+
+
+async def test_chat_streaming_provider_error(monkeypatch):
+    class FailingStreamingProvider:
+        async def astream_response(self, prompt: str, attachments=None):  # type: ignore[override]
+            yield "début"
+            raise ProviderRequestError("coupure")
+
+    history = InMemoryHistoryStore(limit=5)
+    monkeypatch.setattr(main, "_provider", FailingStreamingProvider())
+    monkeypatch.setattr(main, "_provider_error", None)
+    monkeypatch.setattr(main, "_memory", None)
+    monkeypatch.setattr(main, "_history_store", history)
+
+    response = await main.chat(text="salut", files=None, stream=True)
+    iterator = response.body_iterator
+
+    assert await iterator.__anext__() == "début"
+    with pytest.raises(HTTPException) as exc_info:
+        await iterator.__anext__()
+
+    assert exc_info.value.status_code == 502
+    assert history.get("default") == []
+
+
+async def test_openai_provider_async_stream(monkeypatch):
+    events = [
+        SimpleNamespace(type="response.created"),
+        SimpleNamespace(type="response.output_text.delta", delta="Bon"),
+        SimpleNamespace(type="response.output_text.delta", delta="jour "),
+        SimpleNamespace(
+            type="response.completed",
+            response=SimpleNamespace(
+                usage=SimpleNamespace(
+                    input_tokens=1200,
+                    output_tokens=2,
+                    input_tokens_details=SimpleNamespace(cached_tokens=1024),
+                )
+            ),
+        ),
+    ]
+    requests: list[dict] = []
+
+    class DummyAsyncStream:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            return None
+
+        def __aiter__(self):
+            async def iterate():
+                for event in events:
+                    yield event
+
+            return iterate()
+
+        async def until_done(self):
+            return None
+
+    class DummyResponses:
+        def stream(self, **kwargs):
+            requests.append(kwargs)
+            return DummyAsyncStream()
+
+    provider = OpenAIProvider(api_key="test-key", model="gpt-test", prompt_cache_key="jarvis")
+    monkeypatch.setattr(provider, "async_client", SimpleNamespace(responses=DummyResponses()))
+
+    assert await provider.agenerate_response("hello") == "Bonjour"
+    assert requests[0]["model"] == "gpt-test"
+    assert requests[0]["prompt_cache_key"] == "jarvis"
+    assert provider.usage.as_dict()["cached_input_tokens"] == 1024
+    assert requests[0]["input"][0]["content"][0] == {"type": "input_text", "text": "hello"}
+
+
+async def test_chat_routes_simple_turns_to_the_fast_model(monkeypatch):
+    from backend.services.model_selector import ModelSelector
+
+    requested_models: list[str] = []
+
+    async def fake_agenerate(prompt, attachments=None, model=None):
+        requested_models.append(model)
+        return "ok"
+
+    provider = OpenAIProvider(api_key="test-key", model="gpt-default")
+    monkeypatch.setattr(provider, "agenerate_response", fake_agenerate)
+    monkeypatch.setattr(main, "_provider", provider)
+    monkeypatch.setattr(main, "_provider_error", None)
+    monkeypatch.setattr(main, "_memory", None)
+    monkeypatch.setattr(main, "_memory_writer", None)
+    monkeypatch.setattr(main, "_response_cache", None)
+    monkeypatch.setattr(main, "_history_store", InMemoryHistoryStore(limit=5))
+    monkeypatch.setattr(main, "_model_selector", ModelSelector("gpt-fast", "gpt-strong"))
+    monkeypatch.setattr(main, "_decision_log", None)
+
+    await main.chat(text="merci", files=None, stream=False)
+    await main.chat(
+        text="Analyse ce contrat, compare-le au précédent et explique les risques",
+        files=None,
+        stream=False,
+    )
+
+    assert requested_models == ["gpt-fast", "gpt-strong"]
+
+
+def _tgi_transport(events: list[dict], requests: list[dict]) -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        body = "".join(f"data:{json.dumps(event)}\n\n" for event in events)
+        return httpx.Response(
+            200, headers={"content-type": "text/event-stream"}, content=body.encode()
+        )
+
+    return httpx.MockTransport(handler)
+
+
+TGI_EVENTS = [
+    {"token": {"id": 1, "text": "Bon", "special": False}},
+    {"token": {"id": 2, "text": "jour", "special": False}},
+    {"token": {"id": 0, "text": "</s>", "special": True}, "generated_text": "Bonjour"},
+]
+
+
+async def test_huggingface_provider_streams_tokens_incrementally():
+    requests: list[dict] = []
+    transport = _tgi_transport(TGI_EVENTS, requests)
+    provider = HuggingFaceProvider(
+        model="tgi",
+        http_client=httpx.Client(transport=transport),
+        async_http_client=httpx.AsyncClient(transport=transport),
+    )
+
+    chunks = [chunk async for chunk in provider.astream_response("Salut")]
+
+    assert chunks == ["Bon", "jour"]
+    assert list(provider.stream_response("Salut")) == ["Bon", "jour"]
+    assert requests[0] == {"inputs": "Salut", "stream": True}
+
+
+async def test_huggingface_provider_stream_falls_back_to_json_and_reports_errors():
+    def json_handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=[{"generated_text": "Bonjour"}])
+
+    provider = HuggingFaceProvider(
+        model="api",
+        async_http_client=httpx.AsyncClient(transport=httpx.MockTransport(json_handler)),
+    )
+    assert [chunk async for chunk in provider.astream_response("Salut")] == ["Bonjour"]
+
+    failing = HuggingFaceProvider(
+        model="tgi",
+        async_http_client=httpx.AsyncClient(
+            transport=_tgi_transport([{"error": "overloaded"}], [])
+        ),
+    )
+    with pytest.raises(ProviderRequestError):
+        [chunk async for chunk in failing.astream_response("Salut")]
+
+
+async def test_chat_cache_layout_orders_sections_by_stability(monkeypatch):
+    prompts: list[str] = []
+
+    class RecordingProvider:
+        def generate_response(self, prompt: str, attachments=None) -> str:  # type: ignore[override]
+            prompts.append(prompt)
+            return "réponse"
+
+    class StaticMemory:
+        def retrieve_relevant(self, text: str) -> list[str]:
+            return ["souvenir"]
+
+    history = InMemoryHistoryStore(limit=5)
+    history.append("default", "question 1", "réponse 1")
+    monkeypatch.setattr(main, "_provider", RecordingProvider())
+    monkeypatch.setattr(main, "_provider_error", None)
+    monkeypatch.setattr(main, "_memory", StaticMemory())
+    monkeypatch.setattr(main, "_memory_writer", None)
+    monkeypatch.setattr(main, "_history_store", history)
+    monkeypatch.setattr(main.settings, "prompt_layout", "cache", raising=False)
+
+    await main.chat(text="hello", files=None, stream=False)
+
+    prompt = prompts[0]
+    positions = [
+        prompt.index("Voici des souvenirs"),
+        prompt.index("Voici les derniers échanges"),
+        prompt.index("Informations temporelles actuelles"),
+        prompt.index("Nouvelle demande :\nhello"),
+    ]
+    assert positions == sorted(positions)
+
+
+async def test_chat_prompt_size_stays_flat_as_conversation_grows(monkeypatch):
+    prompts: list[str] = []
+
+    class VerboseProvider:
+        def generate_response(self, prompt: str, attachments=None) -> str:  # type: ignore[override]
+            prompts.append(prompt)
+            return "Réponse détaillée. " + "blabla " * 400
+
+    monkeypatch.setattr(main, "_provider", VerboseProvider())
+    monkeypatch.setattr(main, "_provider_error", None)
+    monkeypatch.setattr(main, "_memory", None)
+    monkeypatch.setattr(main, "_history_store", InMemoryHistoryStore(limit=5))
+    monkeypatch.setattr(main, "_history_summaries", main.RollingHistorySummary(max_tokens=200))
+    monkeypatch.setattr(main.settings, "prompt_token_budget", 1500, raising=False)
+
+    for turn in range(20):
+        await main.chat(text=f"question {turn}", files=None, stream=False)
+
+    # Une fois le résumé glissant plafonné, la taille du prompt ne croît plus.
+    sizes = [len(prompt) for prompt in prompts]
+    assert max(sizes[-5:]) - min(sizes[-5:]) < 100
+    assert all(len(prompt) / 4 <= 1500 + 10 for prompt in prompts)
+    assert "Résumé des échanges précédents" in prompts[-1]
+    assert prompts[-1].endswith("Nouvelle demande :\nquestion 19")
+
+    # Le résumé disparaît avec la conversation : il ne fuit pas dans la suivante.
+    main._history_store.clear(main.DEFAULT_CONVERSATION_ID)
+    await main.chat(text="nouvelle conversation", files=None, stream=False)
+    assert "Résumé des échanges précédents" not in prompts[-1]
+    assert "question 0" not in prompts[-1]
+
+
+async def test_chat_history_is_scoped_per_conversation(monkeypatch):
+    prompts: list[str] = []
+
+    class RecordingProvider:
+        def generate_response(self, prompt: str, attachments=None) -> str:  # type: ignore[override]
+            prompts.append(prompt)
+            return f"réponse {len(prompts)}"
+
+    history = InMemoryHistoryStore(limit=5)
+    monkeypatch.setattr(main, "_provider", RecordingProvider())
+    monkeypatch.setattr(main, "_provider_error", None)
+    monkeypatch.setattr(main, "_memory", None)
+    monkeypatch.setattr(main, "_history_store", history)
+
+    await main.chat(text="secret A", files=None, stream=False, conversation_id="a")
+    await main.chat(text="question B", files=None, stream=False, conversation_id="b")
+    await main.chat(text="suite A", files=None, stream=False, conversation_id="a")
+
+    assert "secret A" not in prompts[1]
+    assert "Utilisateur : secret A" in prompts[2]
+    assert history.get("a") == [("secret A", "réponse 1"), ("suite A", "réponse 3")]
+    assert history.get("b") == [("question B", "réponse 2")]
+
+
+async def test_chat_defers_memory_persistence(monkeypatch):
+    class RecordingProvider:
+        def generate_response(self, prompt: str, attachments=None) -> str:  # type: ignore[override]
+            return "réponse"
+
+    class RecordingWriter:
         def __init__(self) -> None:
-            self.calls: list[str] = []
+            self.entries: list[tuple[str, dict]] = []
 
-        def create(self, *, model, file):
-            self.calls.append(model)
-            captured_calls.append((model, file.read()))
-            return SimpleNamespace(text=" Bonjour ")
+        def enqueue(self, content: str, metadata=None) -> None:
+            self.entries.append((content, metadata))
 
-    transcriptions = DummyTranscriptions()
+    writer = RecordingWriter()
+    monkeypatch.setattr(main, "_provider", RecordingProvider())
+    monkeypatch.setattr(main, "_provider_error", None)
+    monkeypatch.setattr(main, "_memory", None)
+    monkeypatch.setattr(main, "_memory_writer", writer)
+    monkeypatch.setattr(main, "_history_store", InMemoryHistoryStore(limit=5))
 
+    response = await main.chat(text="hello", files=None, stream=False)
+
+    assert response == {"response": "réponse"}
+    assert writer.entries == [
+        ("Utilisateur : hello\nJarvis : réponse", {"source": "conversation"})
+    ]
+
+
+async def test_chat_serves_semantic_cache_hits_without_provider(monkeypatch):
+    calls: list[str] = []
+
+    class RecordingProvider:
+        def generate_response(self, prompt: str, attachments=None) -> str:  # type: ignore[override]
+            calls.append(prompt)
+            return "réponse fraîche"
+
+    class DictCache:
+        def __init__(self) -> None:
+            self.entries: dict[str, str] = {}
+            self.stored = threading.Event()
+
+        def lookup(
+            self, text: str, has_attachments: bool = False, has_history: bool = False
+        ) -> str | None:
+            return None if has_history else self.entries.get(text)
+
+        def store(self, text: str, response: str) -> None:
+            self.entries[text] = response
+            self.stored.set()
+
+    cache = DictCache()
+    history = InMemoryHistoryStore(limit=5)
+    monkeypatch.setattr(main, "_provider", RecordingProvider())
+    monkeypatch.setattr(main, "_provider_error", None)
+    monkeypatch.setattr(main, "_memory", None)
+    monkeypatch.setattr(main, "_memory_writer", None)
+    monkeypatch.setattr(main, "_response_cache", cache)
+    monkeypatch.setattr(main, "_history_store", history)
+
+    first = await main.chat(text="hello", files=None, stream=False, conversation_id="a")
+    assert first == {"response": "réponse fraîche"}
+    assert await asyncio.to_thread(cache.stored.wait, 2)
+
+    second = await main.chat(text="hello", files=None, stream=False, conversation_id="b")
+    assert second == {"response": "réponse fraîche", "cached": True}
+    assert len(calls) == 1
+
+    streamed = await main.chat(text="hello", files=None, stream=True, conversation_id="c")
+    chunks = [chunk async for chunk in streamed.body_iterator]
+    assert "".join(chunks) == "réponse fraîche"
+    assert len(calls) == 1
+    assert len(history.get("c")) == 1
+
+    # Une suite de conversation peut dépendre des échanges précédents : jamais servie du cache.
+    follow_up = await main.chat(text="hello", files=None, stream=False, conversation_id="a")
+    assert follow_up == {"response": "réponse fraîche"}
+    assert len(calls) == 2
+
+
+async def test_chat_skips_slow_memory_retrieval(monkeypatch):
+    prompts: list[str] = []
+    release = threading.Event()
+
+    class RecordingProvider:
+        def generate_response(self, prompt: str, attachments=None) -> str:  # type: ignore[override]
+            prompts.append(prompt)
+            return "réponse"
+
+    class SlowMemory:
+        def retrieve_relevant(self, text: str) -> list[str]:
+            release.wait(5)
+            return ["souvenir tardif"]
+
+    monkeypatch.setattr(main, "_provider", RecordingProvider())
+    monkeypatch.setattr(main, "_provider_error", None)
+    monkeypatch.setattr(main, "_memory", SlowMemory())
+    monkeypatch.setattr(main, "_memory_writer", None)
+    monkeypatch.setattr(main, "_history_store", InMemoryHistoryStore(limit=5))
+    monkeypatch.setattr(main.settings, "memory_retrieval_timeout", 0.05, raising=False)
+
+    try:
+        response = await main.chat(text="hello", files=None, stream=False)
+    finally:
+        release.set()
+
+    assert response == {"response": "réponse"}
+    assert "souvenir tardif" not in prompts[0]
+
+
+async def test_chat_reads_uploads_concurrently(monkeypatch):
+    captured: list[list] = []
+    started = 0
+    both_started = asyncio.Event()
+
+    class ConcurrentUpload(DummyUpload):
+        async def read(self, size: int = -1) -> bytes:
+            nonlocal started
+            if self._offset == 0:
+                started += 1
+                if started == 2:
+                    both_started.set()
+                await asyncio.wait_for(both_started.wait(), timeout=1)
+            return await super().read(size)
+
+    class RecordingProvider:
+        def generate_response(self, prompt: str, attachments=None) -> str:  # type: ignore[override]
+            captured.append(attachments)
+            return "réponse"
+
+    monkeypatch.setattr(main, "_provider", RecordingProvider())
+    monkeypatch.setattr(main, "_provider_error", None)
+    monkeypatch.setattr(main, "_memory", None)
+    monkeypatch.setattr(main, "_history_store", InMemoryHistoryStore(limit=5))
+
+    uploads = [
+        ConcurrentUpload(b"un", "a.txt"),
+        ConcurrentUpload(b"", "vide.txt"),
+        ConcurrentUpload(b"deux", "b.txt"),
+    ]
+    response = await main.chat(text="hello", files=uploads, stream=False)
+
+    assert response == {"response": "réponse"}
+    assert [attachment.filename for attachment in captured[0]] == ["a.txt", "b.txt"]
+
+
+async def test_chat_rejects_oversized_attachments(monkeypatch):
+    class UnusedProvider:
+        def generate_response(self, prompt: str, attachments=None) -> str:  # type: ignore[override]
+            raise AssertionError("Le provider ne doit pas être appelé")
+
+    monkeypatch.setattr(main, "_provider", UnusedProvider())
+    monkeypatch.setattr(main, "_provider_error", None)
+    monkeypatch.setattr(main, "_memory", None)
+    monkeypatch.setattr(main, "_history_store", InMemoryHistoryStore(limit=5))
+    monkeypatch.setattr(main.settings, "attachment_max_file_size", 100, raising=False)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await main.chat(
+            text="hello", files=[DummyUpload(b"x" * 500, "gros.pdf")], stream=False
+        )
+
+    assert exc_info.value.status_code == 413
+
+
+def _install_transcription_client(monkeypatch, transcriptions, hedge_delay: float = 0) -> None:
     class DummyClient:
-        def __init__(self, api_key: str) -> None:
+        def __init__(self, api_key: str, **kwargs) -> None:
             assert api_key == "fake-key"
+            assert kwargs["http_client"] is main._http_clients.async_client
             self.audio = SimpleNamespace(transcriptions=transcriptions)
 
-    monkeypatch.setattr(main, "OpenAI", DummyClient)
+    monkeypatch.setattr(main.settings, "openai_api_key", "fake-key", raising=False)
+    monkeypatch.setattr(main.settings, "transcription_hedge_delay", hedge_delay, raising=False)
+    monkeypatch.setattr("openai.AsyncOpenAI", DummyClient)
+    monkeypatch.setattr(main, "_openai_client", None)
+    monkeypatch.setattr(main, "_transcriber", None)
+    monkeypatch.setattr(main, "_transcription_cache", TranscriptionCache())
+
+
+async def test_transcribe_audio_success(monkeypatch):
+    captured_calls: list[tuple[str, bytes]] = []
+
+    class DummyTranscriptions:
+        async def create(self, *, model, file):
+            captured_calls.append((model, file.read()))
+            return SimpleNamespace(text=" Bonjour ")
+
+    _install_transcription_client(monkeypatch, DummyTranscriptions())
 
     upload = DummyUpload(b"audio-bytes", filename="sample.webm")
     response = await main.transcribe_audio(audio=upload)
@@ -300,6 +749,48 @@ async def test_transcribe_audio_success(monkeypatch):
     assert captured_calls == [(main._TRANSCRIPTION_MODELS[0], b"audio-bytes")]
 
 
+async def test_transcribe_audio_caches_identical_clips(monkeypatch):
+    calls: list[str] = []
+
+    class DummyTranscriptions:
+        async def create(self, *, model, file):
+            calls.append(model)
+            return SimpleNamespace(text="Bonjour")
+
+    _install_transcription_client(monkeypatch, DummyTranscriptions())
+
+    first = await main.transcribe_audio(audio=DummyUpload(b"audio-bytes"))
+    second = await main.transcribe_audio(audio=DummyUpload(b"audio-bytes"))
+    third = await main.transcribe_audio(audio=DummyUpload(b"autre-clip"))
+
+    assert first == second == third == {"text": "Bonjour"}
+    assert len(calls) == 2
+    assert main._transcription_cache.stats()["hits"] == 1
+
+
+async def test_transcribe_audio_hedges_slow_primary_model(monkeypatch):
+    primary, fallback = main._TRANSCRIPTION_MODELS[:2]
+    cancelled = asyncio.Event()
+
+    class DummyTranscriptions:
+        async def create(self, *, model, file):
+            if model == primary:
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.set()
+                    raise
+                return SimpleNamespace(text="trop tard")
+            return SimpleNamespace(text="Salut")
+
+    _install_transcription_client(monkeypatch, DummyTranscriptions(), hedge_delay=0.01)
+
+    response = await asyncio.wait_for(main.transcribe_audio(audio=DummyUpload(b"voice")), 1)
+
+    assert response == {"text": "Salut"}
+    await asyncio.wait_for(cancelled.wait(), 1)
+
+
 async def test_transcribe_audio_empty_file(monkeypatch):
     monkeypatch.setattr(main.settings, "openai_api_key", "fake-key", raising=False)
 
@@ -320,24 +811,16 @@ async def test_transcribe_audio_requires_key(monkeypatch):
 
 
 async def test_transcribe_audio_fallback_to_second_model(monkeypatch):
-    monkeypatch.setattr(main.settings, "openai_api_key", "fake-key", raising=False)
-
     call_order: list[str] = []
 
     class DummyTranscriptions:
-        def create(self, *, model, file):
+        async def create(self, *, model, file):
             call_order.append(model)
             if len(call_order) == 1:
                 return SimpleNamespace(text="   ")
             return SimpleNamespace(text="Salut")
 
-    transcriptions = DummyTranscriptions()
-
-    class DummyClient:
-        def __init__(self, api_key: str) -> None:
-            self.audio = SimpleNamespace(transcriptions=transcriptions)
-
-    monkeypatch.setattr(main, "OpenAI", DummyClient)
+    _install_transcription_client(monkeypatch, DummyTranscriptions())
 
     response = await main.transcribe_audio(audio=DummyUpload(b"voice"))
 
@@ -346,23 +829,16 @@ async def test_transcribe_audio_fallback_to_second_model(monkeypatch):
 
 
 async def test_transcribe_audio_failure(monkeypatch):
-    monkeypatch.setattr(main.settings, "openai_api_key", "fake-key", raising=False)
-
     class DummyTranscriptions:
         def __init__(self) -> None:
             self.calls: list[str] = []
 
-        def create(self, *, model, file):
+        async def create(self, *, model, file):
             self.calls.append(model)
             raise RuntimeError("kaput")
 
     transcriptions = DummyTranscriptions()
-
-    class DummyClient:
-        def __init__(self, api_key: str) -> None:
-            self.audio = SimpleNamespace(transcriptions=transcriptions)
-
-    monkeypatch.setattr(main, "OpenAI", DummyClient)
+    _install_transcription_client(monkeypatch, transcriptions)
 
     with pytest.raises(HTTPException) as exc_info:
         await main.transcribe_audio(audio=DummyUpload(b"voice"))
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.memory.embedding_cache import EmbeddingCache
+
+
+def test_cache_counts_hits_and_misses_and_evicts_lru():
+    cache = EmbeddingCache(model_name="model-a", max_entries=2)
+
+    assert cache.get_many(["ok"]) == [None]
+    cache.put_many(["ok", "merci", "salut"], [[1.0], [2.0], [3.0]])
+
+    assert cache.get_many(["  merci ", "ok"]) == [[2.0], None]
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["memory_entries"] == 2
+
+
+def test_cache_persists_and_invalidates_on_model_change(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache(model_name="model-a", path=path)
+    cache.put_many(["bonjour"], [[0.5, 0.25]])
+    cache.close()
+
+    reopened = EmbeddingCache(model_name="model-a", path=path)
+    assert reopened.get_many(["bonjour"]) == [[0.5, 0.25]]
+    reopened.close()
+
+    switched = EmbeddingCache(model_name="model-b", path=path)
+    assert switched.get_many(["bonjour"]) == [None]
+    assert switched.stats()["disk_entries"] == 0
+    switched.close()
+
+
+def test_disk_store_is_bounded(tmp_path):
+    cache = EmbeddingCache(model_name="m", path=str(tmp_path / "c.sqlite3"), max_disk_entries=10)
+    for index in range(25):
+        cache.put_many([f"texte {index}"], [[float(index)]])
+
+    assert cache.stats()["disk_entries"] <= 10
+    cache.close()
+
+
+def test_cached_embedding_function_batches_misses(tmp_path):
+    pytest.importorskip("chromadb")
+    from chromadb.api.types import EmbeddingFunction
+
+    from backend.memory.memory_manager import CachedEmbeddingFunction
+
+    calls: list[list[str]] = []
+
+    class CountingEmbedding(EmbeddingFunction):
+        def __init__(self) -> None:
+            pass
+
+        def __call__(self, input):
+            calls.append(list(input))
+            return [[float(len(text)), 1.0] for text in input]
+
+    function = CachedEmbeddingFunction(CountingEmbedding(), EmbeddingCache(model_name="m"))
+
+    first = function(["ok", "merci", "ok"])
+    second = function(["merci", "ok"])
+
+    assert calls == [["ok", "merci"]]
+    assert [list(vector) for vector in first] == [[2.0, 1.0], [5.0, 1.0], [2.0, 1.0]]
+    assert [list(vector) for vector in second] == [[5.0, 1.0], [2.0, 1.0]]
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import httpx
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.memory.embeddings import (
+    BatchedEmbeddingFunction,
+    HashingEmbeddingFunction,
+    OnnxEmbeddingFunction,
+    create_embedding_function,
+)
+from backend.memory.memory_manager import VectorMemory
+from backend.memory.reembed import reembed
+from backend.memory.response_cache import SemanticResponseCache
+
+
+def test_batched_function_keeps_order_across_worker_threads():
+    calls = []
+    hashing = HashingEmbeddingFunction(dimensions=32)
+
+    def embed(texts):
+        calls.append(len(texts))
+        return hashing(texts)
+
+    batched = BatchedEmbeddingFunction(embed, batch_size=4, workers=3)
+    texts = [f"souvenir numéro {index}" for index in range(10)]
+
+    vectors = batched(texts)
+    batched.close()
+
+    assert sorted(calls) == [2, 4, 4]
+    np.testing.assert_allclose(np.stack(vectors), hashing.embed(texts))
+
+
+def test_local_backends_are_selected_by_name():
+    hashing = create_embedding_function("hashing", dimensions=64)
+
+    assert hashing.model_name == "hashing-64"
+    assert len(hashing(["bonjour Jarvis"])[0]) == 64
+    with pytest.raises(ValueError):
+        create_embedding_function("word2vec")
+
+
+def test_openai_function_uses_the_shared_http_client():
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(
+            200,
+            json={
+                "object": "list",
+                "model": "text-embedding-3-small",
+                "data": [
+                    {"object": "embedding", "index": 1, "embedding": [0.0, 1.0]},
+                    {"object": "embedding", "index": 0, "embedding": [1.0, 0.0]},
+                ],
+                "usage": {"prompt_tokens": 2, "total_tokens": 2},
+            },
+        )
+
+    pooled = httpx.Client(transport=httpx.MockTransport(handler), timeout=30.0)
+    embed = create_embedding_function(
+        "openai", api_key="test-key", api_base="https://api.example/v1", http_client=pooled
+    )
+
+    assert embed(["a", ""]) == [[1.0, 0.0], [0.0, 1.0]]
+    assert [request.url.path for request in requests] == ["/v1/embeddings"]
+    # Les délais du SDK, et non le délai court du pool, s'appliquent aux appels.
+    timeout = requests[0].extensions["timeout"]
+    assert (timeout["connect"], timeout["read"]) == (5.0, 600.0)
+    pooled.close()
+
+
+def test_onnx_function_mean_pools_token_embeddings(tmp_path):
+    onnx = pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    from onnx import TensorProto, helper
+    from tokenizers import Tokenizer, models, pre_tokenizers
+
+    vocab = {"[PAD]": 0, "[UNK]": 1, "chat": 2, "noir": 3, "pizza": 4}
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.save(str(tmp_path / "tokenizer.json"))
+
+    table = np.zeros((5, 3), dtype=np.float32)
+    table[2], table[3], table[4] = [1, 0, 0], [0, 1, 0], [0, 0, 1]
+    graph = helper.make_graph(
+        [helper.make_node("Gather", ["table", "input_ids"], ["token_embeddings"])],
+        "embed",
+        [
+            helper.make_tensor_value_info("input_ids", TensorProto.INT64, [None, None]),
+            helper.make_tensor_value_info("attention_mask", TensorProto.INT64, [None, None]),
+        ],
+        [helper.make_tensor_value_info("token_embeddings", TensorProto.FLOAT, [None, None, 3])],
+        [helper.make_tensor("table", TensorProto.FLOAT, table.shape, table.flatten())],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(tmp_path / "model.onnx"))
+
+    function = OnnxEmbeddingFunction(str(tmp_path))
+    chat_noir, pizza = function(["chat noir", "pizza"])
+
+    # « pizza » est complété par un jeton de remplissage, exclu de la moyenne.
+    np.testing.assert_allclose(chat_noir, [2**-0.5, 2**-0.5, 0], atol=1e-6)
+    np.testing.assert_allclose(pizza, [0, 0, 1], atol=1e-6)
+    assert function.model_name == f"onnx:{tmp_path.name}"
+
+
+def test_store_is_bound_to_its_model_until_it_is_reembedded(tmp_path):
+    source, target = tmp_path / "source", tmp_path / "target"
+    old = HashingEmbeddingFunction(dimensions=16)
+    memory = VectorMemory(
+        api_key="", persist_dir=str(source), embedding_function=old, backend="matrix"
+    )
+    memory.add_memories(["mon chat s'appelle Pixel", "je préfère la pizza"])
+    SemanticResponseCache(memory.get_collection("jarvis_response_cache"), old).store(
+        "Comment s'appelle mon chat ?", "Pixel."
+    )
+    memory.close()
+
+    new = HashingEmbeddingFunction(dimensions=48)
+    with pytest.raises(RuntimeError, match="reembed"):
+        VectorMemory(api_key="", persist_dir=str(source), embedding_function=new, backend="matrix")
+
+    copied = reembed(str(source), str(target), new, source_backend="matrix")
+    migrated = VectorMemory(
+        api_key="", persist_dir=str(target), embedding_function=new, backend="matrix"
+    )
+    cache = SemanticResponseCache(migrated.get_collection("jarvis_response_cache"), new)
+
+    assert copied == {"jarvis_memory": 2, "jarvis_response_cache": 1}
+    assert migrated.retrieve_relevant("pizza", n=1) == ["je préfère la pizza"]
+    assert cache.lookup("comment s'appelle mon chat") == "Pixel."
+    migrated.close()
+
+
+def test_unmarked_legacy_store_is_assumed_to_hold_openai_embeddings(tmp_path):
+    legacy = tmp_path / "legacy"
+    legacy.mkdir()
+    (legacy / "chroma.sqlite3").write_bytes(b"")  # magasin antérieur au marqueur
+
+    with pytest.raises(RuntimeError, match="text-embedding-3-small"):
+        VectorMemory(
+            api_key="",
+            persist_dir=str(legacy),
+            embedding_function=HashingEmbeddingFunction(dimensions=16),
+            backend="matrix",
+        )
+    assert not (legacy / "embedding_model.json").exists()
+
+    fresh = VectorMemory(
+        api_key="",
+        persist_dir=str(tmp_path / "fresh"),
+        embedding_function=HashingEmbeddingFunction(dimensions=16),
+        backend="matrix",
+    )
+    fresh.close()
+    assert (tmp_path / "fresh" / "embedding_model.json").exists()
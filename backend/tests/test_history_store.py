@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.memory.history_store import (
+    InMemoryHistoryStore,
+    SQLiteHistoryStore,
+    create_history_store,
+)
+
+
+def test_in_memory_store_bounds_sessions_and_evicts_idle():
+    now = [0.0]
+    store = InMemoryHistoryStore(limit=2, max_conversations=2, idle_ttl=10, clock=lambda: now[0])
+
+    for index in range(3):
+        store.append("a", f"q{index}", f"r{index}")
+    store.append("b", "qb", "rb")
+    assert store.get("a") == [("q1", "r1"), ("q2", "r2")]
+
+    store.append("c", "qc", "rc")  # « b » est la conversation la moins récemment utilisée
+    assert store.get("b") == []
+    assert len(store) == 2
+
+    now[0] = 5.0
+    store.get("c")
+    now[0] = 12.0
+    assert store.get("c") == [("qc", "rc")]
+    assert store.get("a") == []
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    writer = SQLiteHistoryStore(path, limit=3)
+    reader = SQLiteHistoryStore(path, limit=3)
+
+    for index in range(5):
+        writer.append("conv", f"q{index}", f"r{index}")
+    writer.append("other", "q", "r")
+
+    assert reader.get("conv") == [("q2", "r2"), ("q3", "r3"), ("q4", "r4")]
+    count = reader._db.execute(
+        "SELECT COUNT(*) FROM history WHERE conversation_id = 'conv'"
+    ).fetchone()[0]
+    assert count == 3
+
+    reader.clear("conv")
+    assert writer.get("conv") == []
+    assert writer.get("other") == [("q", "r")]
+    writer.close()
+    reader.close()
+
+
+def test_sqlite_store_hides_idle_conversations_before_the_purge(tmp_path):
+    now = [1000.0]
+    store = SQLiteHistoryStore(str(tmp_path / "h.sqlite3"), idle_ttl=10, clock=lambda: now[0])
+    store.append("conv", "q", "r")
+
+    now[0] = 1005.0
+    assert store.get("conv") == [("q", "r")]
+    now[0] = 1011.0
+    assert store.get("conv") == []
+    store.close()
+
+
+@pytest.mark.parametrize("idle_ttl", [0, -1, None])
+def test_non_positive_idle_ttl_disables_expiry(tmp_path, idle_ttl):
+    now = [1000.0]
+    clock = lambda: now[0]  # noqa: E731
+    stores = [
+        InMemoryHistoryStore(idle_ttl=idle_ttl, clock=clock),
+        SQLiteHistoryStore(str(tmp_path / "h.sqlite3"), idle_ttl=idle_ttl, clock=clock),
+    ]
+    for store in stores:
+        store.append("conv", "q", "r")
+
+    now[0] += 10 * 86400
+    for store in stores:
+        store.append("other", "q2", "r2")  # déclenche aussi la purge périodique
+        assert store.get("conv") == [("q", "r")]
+    stores[1].close()
+
+
+def test_summaries_expire_and_clear_with_their_conversation(tmp_path):
+    now = [1000.0]
+    clock = lambda: now[0]  # noqa: E731
+    path = str(tmp_path / "h.sqlite3")
+    stores = [
+        InMemoryHistoryStore(idle_ttl=10, clock=clock),
+        SQLiteHistoryStore(path, idle_ttl=10, clock=clock),
+    ]
+    for store in stores:
+        store.set_summary("conv", "ignoré : pas encore d'échange")
+        assert store.get_summary("conv") == ""
+        store.append("conv", "q", "r")
+        store.set_summary("conv", "- résumé")
+        assert store.get_summary("conv") == "- résumé"
+
+    # Un autre worker partageant la base SQLite voit le même résumé.
+    other = SQLiteHistoryStore(path, idle_ttl=10, clock=clock)
+    assert other.get_summary("conv") == "- résumé"
+
+    now[0] = 1011.0
+    for store in stores:
+        assert store.get_summary("conv") == ""
+        store.append("conv", "q2", "r2")  # la conversation expirée repart de zéro
+        assert store.get("conv") == [("q2", "r2")]
+        assert store.get_summary("conv") == ""
+
+        store.set_summary("conv", "- nouveau résumé")
+        store.clear("conv")
+        assert store.get_summary("conv") == ""
+    other.close()
+    stores[1].close()
+
+
+def test_create_history_store_validates_backend(tmp_path):
+    assert isinstance(create_history_store("memory"), InMemoryHistoryStore)
+    assert isinstance(
+        create_history_store("sqlite", path=str(tmp_path / "h.sqlite3")), SQLiteHistoryStore
+    )
+    with pytest.raises(ValueError):
+        create_history_store("redis")
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.services.http_clients import HTTPClientPool
+
+
+pytestmark = pytest.mark.anyio("asyncio")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+async def test_warm_up_probes_each_origin_once():
+    probed: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        probed.append(str(request.url))
+        if request.url.host == "down.example":
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(404)
+
+    pool = HTTPClientPool(http2=False)
+    await pool.async_client.aclose()
+    pool.sync_client.close()
+    pool.async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    pool.sync_client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    results = await pool.warm_up(
+        [
+            "https://api.example/v1/responses",
+            "https://api.example/v1/embeddings",
+            "https://down.example/models/gpt2",
+        ]
+    )
+
+    assert results == {"https://api.example": True, "https://down.example": False}
+    assert probed.count("https://api.example") == 2  # async + sync pools
+    await pool.aclose()
+
+
+def test_pool_falls_back_to_http1_without_h2(monkeypatch, capsys):
+    monkeypatch.setattr("backend.services.http_clients._http2_available", lambda: False)
+
+    pool = HTTPClientPool(max_connections=4, max_keepalive_connections=2, http2=True)
+
+    assert pool.http2 is False
+    assert "HTTP/1.1" in capsys.readouterr().out
+    pool.sync_client.close()
+
+
+def test_pool_negotiates_http2_when_h2_is_installed():
+    pytest.importorskip("h2")
+
+    pool = HTTPClientPool(http2=True)
+
+    assert pool.http2 is True
+    pool.sync_client.close()
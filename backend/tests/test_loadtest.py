@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.loadtest.fake_openai import FakeOpenAIConfig, create_app
+from backend.loadtest.run import LoadReport, Sample, parse_mix
+from backend.services.ai_provider import OpenAIProvider
+
+
+pytestmark = pytest.mark.anyio("asyncio")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def _fake_http_client() -> httpx.AsyncClient:
+    config = FakeOpenAIConfig(
+        latency=0.0, tokens_per_second=0, response_tokens=3, embedding_latency=0.0,
+        embedding_dimensions=8, transcription_latency=0.0,
+    )
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(config)))
+
+
+async def test_openai_provider_streams_from_the_fake_responses_api():
+    async with _fake_http_client() as http_client:
+        provider = OpenAIProvider(
+            api_key="sk-fake", base_url="http://fake/v1", async_http_client=http_client
+        )
+
+        chunks = [chunk async for chunk in provider.astream_response("Bonjour")]
+
+    assert chunks == ["mot0 ", "mot1 ", "mot2 "]
+    assert provider.usage.as_dict()["output_tokens"] == 3
+
+
+async def test_fake_embeddings_and_transcriptions_match_the_sdk_format():
+    async with _fake_http_client() as http_client:
+        client = AsyncOpenAI(api_key="sk-fake", base_url="http://fake/v1", http_client=http_client)
+
+        embeddings = await client.embeddings.create(
+            model="text-embedding-3-small", input=["un", "deux"]
+        )
+        transcript = await client.audio.transcriptions.create(
+            model="whisper-1", file=("clip.webm", b"abcd", "audio/webm")
+        )
+
+    assert [len(item.embedding) for item in embeddings.data] == [8, 8]
+    assert transcript.text == "Transcription factice de 4 octets (whisper-1)."
+
+
+def test_mix_parsing_and_report_percentiles():
+    assert parse_mix("chat=3,stream=1") == {"chat": 0.75, "stream": 0.25}
+    with pytest.raises(ValueError):
+        parse_mix("upload=1")
+
+    samples = [Sample("stream", 200, latency / 100, first_token=0.01) for latency in range(1, 101)]
+    samples.append(Sample("chat", 0, 1.0, error="timeout"))
+    summary = LoadReport(duration=2.0, samples=samples).summary()
+
+    assert summary["achieved_rps"] == pytest.approx(50.5)
+    assert summary["overall"]["errors"] == 1
+    assert summary["stream"]["latency"] == {"p50_ms": 510.0, "p95_ms": 960.0, "p99_ms": 1000.0}
+    assert summary["stream"]["time_to_first_token"]["p99_ms"] == 10.0
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.memory.lifecycle import MemoryCompactor, importance, merge_metadata
+from backend.memory.memory_manager import VectorMemory
+
+
+DAY = 24 * 3600.0
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _embed(texts):
+    # Une direction par sujet : les reformulations d'un même sujet sont quasi identiques.
+    topics = ["chat", "pizza", "python", "paris", "musique"]
+    vectors = []
+    for text in texts:
+        vector = [1.0 if topic in text else 0.0 for topic in topics]
+        vector.append(0.01 * len(text))
+        vectors.append(vector)
+    return vectors
+
+
+def _memory(tmp_path, clock, **kwargs) -> VectorMemory:
+    return VectorMemory(
+        api_key="",
+        persist_dir=str(tmp_path),
+        embedding_model="test",
+        embedding_function=_embed,
+        backend="matrix",
+        clock=clock,
+        **kwargs,
+    )
+
+
+def test_near_duplicates_are_merged_within_a_batch_and_with_stored_memories(tmp_path):
+    clock = FakeClock()
+    memory = _memory(tmp_path, clock)
+    memory.add_memories(["mon chat dort", "j'aime la pizza", "mon chat dort encore"])
+    clock.now += 60
+    memory.add_memory("mon chat dort toujours", {"source": "conversation"})
+
+    stored = memory.collection.get(include=["documents", "metadatas"])
+    by_document = dict(zip(stored["documents"], stored["metadatas"]))
+
+    assert memory.collection.count() == 2
+    assert memory.merged == 2
+    assert set(by_document) == {"mon chat dort toujours", "j'aime la pizza"}
+    merged = by_document["mon chat dort toujours"]
+    assert merged["merge_count"] == 2 and merged["source"] == "conversation"
+    assert merged["created_at"] == 1_000_000.0 and merged["last_accessed"] == clock.now
+    memory.close()
+
+
+def test_retrievals_raise_importance_and_compaction_evicts_the_rest(tmp_path):
+    clock = FakeClock()
+    memory = _memory(tmp_path, clock, max_entries=3, dedup_threshold=0.0)
+    memory.add_memories(["chat", "pizza", "python", "paris", "musique"])
+    clock.now += DAY
+    assert memory.retrieve_relevant("python", n=1) == ["python"]
+    assert memory.retrieve_relevant("paris", n=1) == ["paris"]
+    assert memory.lifecycle_stats()["pending_accesses"] == 2
+
+    result = memory.compact()
+
+    remaining = memory.collection.get(include=["documents", "metadatas"])
+    assert result["accessed"] == 2 and result["evicted"] == 3
+    assert sorted(remaining["documents"]) == ["paris", "python"]
+    assert all(metadata["access_count"] == 1 for metadata in remaining["metadatas"])
+    # Les lignes évincées occupaient plus d'un quart des fichiers : elles sont récupérées.
+    assert result["reclaimed"] == 3 and memory.collection.dead_rows == 0
+    memory.close()
+
+
+def test_expired_memories_are_hidden_then_evicted_and_can_be_summarised(tmp_path):
+    clock = FakeClock()
+    summaries = []
+
+    def summarize(documents):
+        summaries.append(sorted(documents))
+        return "résumé : " + ", ".join(sorted(documents))
+
+    memory = _memory(
+        tmp_path, clock, ttl=DAY, max_entries=2, dedup_threshold=0.0, summarizer=summarize
+    )
+    memory.add_memories(["chat", "pizza"])
+    memory.add_memory("python", ttl=10 * DAY)
+    memory.add_memory("paris", ttl=10 * DAY)
+    clock.now += 2 * DAY
+
+    assert memory.retrieve_relevant("chat", n=1) == []
+    result = memory.compact()
+    assert result["expired"] == 2 and result["evicted"] == 0
+
+    memory.add_memories(["musique"], ttl=10 * DAY)
+    result = memory.compact()
+
+    assert result["evicted"] == 2 and result["summarized"] == 2
+    assert len(summaries) == 1 and memory.collection.count() == 2
+    memory.close()
+
+
+def test_importance_decays_with_idle_time_and_merges_keep_the_widest_dates():
+    now = 100 * DAY
+    fresh = {"created_at": now, "last_accessed": now, "access_count": 0}
+    used = {"created_at": 0.0, "last_accessed": now - 14 * DAY, "access_count": 3}
+
+    assert importance(fresh, now, 14 * DAY) == pytest.approx(1.0)
+    assert importance(used, now, 14 * DAY) == pytest.approx(2.0)
+
+    merged = merge_metadata(
+        {**used, "expires_at": now + DAY},
+        {"created_at": now, "last_accessed": now, "access_count": 0, "expires_at": now + 5 * DAY},
+    )
+    assert merged["created_at"] == 0.0 and merged["expires_at"] == now + 5 * DAY
+    assert merged["access_count"] == 3 and merged["merge_count"] == 1
+    assert "expires_at" not in merge_metadata(used, {**fresh, "expires_at": now})
+
+
+def test_compactor_accumulates_run_counters_and_survives_failures():
+    class Store:
+        calls = 0
+
+        def compact(self):
+            self.calls += 1
+            if self.calls == 2:
+                raise RuntimeError("disque plein")
+            return {"expired": 2, "evicted": 1}
+
+    compactor = MemoryCompactor(Store(), interval=0).start()
+    for _ in range(3):
+        compactor.run_once()
+    compactor.close()
+
+    stats = compactor.stats()
+    assert stats["runs"] == 2 and stats["failed"] == 1
+    assert stats["expired"] == 4 and stats["evicted"] == 2
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import backend.main as main
+from backend.memory.history_store import InMemoryHistoryStore
+from backend.services.ai_provider import ProviderRequestError
+from backend.services.metrics import (
+    GENERATION_SECONDS,
+    STAGE_SECONDS,
+    TIME_TO_FIRST_TOKEN,
+    TOKENS_PER_SECOND,
+    UPSTREAM_ERRORS,
+    WORKER_THREADS_BUSY,
+    MetricsRegistry,
+    run_in_thread,
+)
+from backend.services.readiness import Readiness
+
+
+pytestmark = pytest.mark.anyio("asyncio")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def test_histograms_render_cumulative_buckets_in_prometheus_format():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("demo_seconds", "Demo.", labelnames=("stage",), buckets=(0.1, 1))
+    counter = registry.counter("demo_errors_total", "Errors.", labelnames=("provider",))
+    registry.gauge("demo_depth", "Depth.", lambda: 3)
+
+    histogram.observe(0.05, stage="read")
+    histogram.observe(0.5, stage="read")
+    histogram.observe(5, stage="read")
+    counter.inc(provider='a"b')
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE demo_seconds histogram" in lines
+    assert 'demo_seconds_bucket{stage="read",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{stage="read",le="1"} 2' in lines
+    assert 'demo_seconds_bucket{stage="read",le="+Inf"} 3' in lines
+    assert 'demo_seconds_sum{stage="read"} 5.55' in lines
+    assert 'demo_seconds_count{stage="read"} 3' in lines
+    assert 'demo_errors_total{provider="a\\"b"} 1' in lines
+    assert "demo_depth 3" in lines
+    with pytest.raises(ValueError):
+        registry.counter("demo_errors_total", "Duplicate.")
+
+
+async def test_chat_populates_stage_and_generation_metrics(monkeypatch):
+    class StreamingProvider:
+        def generate_response(self, prompt: str, attachments=None) -> str:  # type: ignore[override]
+            raise AssertionError("streaming expected")
+
+        async def astream_response(self, prompt: str, attachments=None):
+            yield "Bonjour "
+            yield "à toi"
+
+    monkeypatch.setattr(main, "_provider", StreamingProvider())
+    monkeypatch.setattr(main, "_provider_error", None)
+    monkeypatch.setattr(main, "_memory", None)
+    monkeypatch.setattr(main, "_response_cache", None)
+    monkeypatch.setattr(main, "_history_store", InMemoryHistoryStore(limit=5))
+
+    label = "StreamingProvider"
+    before = (
+        STAGE_SECONDS.count(stage="prompt_build"),
+        STAGE_SECONDS.count(stage="history_load"),
+        TIME_TO_FIRST_TOKEN.count(provider=label),
+        GENERATION_SECONDS.count(provider=label),
+        TOKENS_PER_SECOND.count(provider=label),
+    )
+
+    response = await main.chat(text="métriques", files=None, stream=True)
+    body = "".join([chunk async for chunk in response.body_iterator])
+
+    assert body == "Bonjour à toi"
+    assert (
+        STAGE_SECONDS.count(stage="prompt_build"),
+        STAGE_SECONDS.count(stage="history_load"),
+        TIME_TO_FIRST_TOKEN.count(provider=label),
+        GENERATION_SECONDS.count(provider=label),
+        TOKENS_PER_SECOND.count(provider=label),
+    ) == tuple(count + 1 for count in before)
+
+    exported = main.metrics().body.decode()
+    assert 'jarvis_chat_stage_seconds_count{stage="prompt_build"}' in exported
+    assert f'jarvis_time_to_first_token_seconds_count{{provider="{label}"}}' in exported
+    assert "jarvis_admission_active 0" in exported
+    assert "jarvis_worker_threads_busy 0" in exported
+
+
+async def test_upstream_errors_are_counted_per_provider(monkeypatch):
+    class FailingProvider:
+        def generate_response(self, prompt: str, attachments=None) -> str:  # type: ignore[override]
+            raise ProviderRequestError("indisponible")
+
+    monkeypatch.setattr(main, "_provider", FailingProvider())
+    monkeypatch.setattr(main, "_provider_error", None)
+    monkeypatch.setattr(main, "_memory", None)
+    monkeypatch.setattr(main, "_response_cache", None)
+    monkeypatch.setattr(main, "_history_store", InMemoryHistoryStore(limit=5))
+    before = UPSTREAM_ERRORS.value(provider="FailingProvider")
+
+    with pytest.raises(main.HTTPException) as exc_info:
+        await main.chat(text="erreur", files=None, stream=False)
+
+    assert exc_info.value.status_code == 502
+    assert UPSTREAM_ERRORS.value(provider="FailingProvider") == before + 1
+
+
+async def test_blocking_work_outside_main_counts_as_busy_worker_threads():
+    seen: list[float] = []
+
+    def initialiser() -> None:
+        seen.append(WORKER_THREADS_BUSY.value())
+
+    readiness = Readiness(("provider",), required=("provider",))
+    assert await readiness.run("provider", initialiser)
+    assert await run_in_thread(lambda: WORKER_THREADS_BUSY.value()) >= 1
+
+    assert seen and seen[0] >= 1
+    assert WORKER_THREADS_BUSY.value() == 0
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.services.model_selector import (
+    DecisionLog,
+    ModelSelector,
+    RequestFeatures,
+    evaluate,
+    load_decisions,
+    main,
+)
+
+
+SELECTOR = ModelSelector(fast_model="rapide", strong_model="puissant", threshold=1.0)
+
+
+def test_short_turns_go_to_the_fast_model():
+    for text in ("quelle heure est-il ?", "merci", "allume la lumière du salon"):
+        decision = SELECTOR.select(RequestFeatures.from_request(text))
+        assert decision.model == "rapide", text
+
+
+def test_attachments_long_or_analytical_requests_go_to_the_strong_model():
+    with_file = RequestFeatures.from_request("et ça ?", attachment_count=1)
+    analytical = RequestFeatures.from_request(
+        "Compare ces deux offres et explique pourquoi la seconde est plus risquée"
+    )
+    long_text = RequestFeatures.from_request("mot " * 400)
+
+    for features in (with_file, analytical, long_text):
+        decision = SELECTOR.select(features)
+        assert decision.tier == "strong"
+        assert decision.reasons
+
+
+def test_decisions_are_logged_and_replayed_offline(tmp_path, capsys):
+    log_path = tmp_path / "decisions.jsonl"
+    log = DecisionLog(str(log_path))
+    for text in ("merci", "Analyse ce contrat et résume les risques"):
+        features = RequestFeatures.from_request(text)
+        log.record(text, features, SELECTOR.select(features))
+
+    records = load_decisions(str(log_path))
+    assert [record["text"] for record in records] == [
+        "merci",
+        "Analyse ce contrat et résume les risques",
+    ]
+    records[0]["expected"] = "fast"
+    records[1]["expected"] = "strong"
+
+    report = evaluate(records, SELECTOR)
+    assert report["agreement_with_log"] == 1.0
+    assert report["accuracy"] == 1.0
+    assert report["fast_share"] == 0.5
+
+    # Un seuil très élevé envoie tout vers le modèle rapide.
+    assert main([str(log_path), "--threshold", "100"]) == 0
+    cli_report = json.loads(capsys.readouterr().out)
+    assert cli_report["tiers"] == {"fast": 2}
+    assert cli_report["agreement_with_log"] == 0.5
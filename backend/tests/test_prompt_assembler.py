@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.services.prompt_assembler import (
+    PromptAssembler,
+    PromptSection,
+    RollingHistorySummary,
+    truncate_to_tokens,
+)
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def test_budget_truncates_lowest_priority_first_and_keeps_required():
+    assembler = PromptAssembler(token_budget=12, counter=count_words)
+    sections = [
+        PromptSection("request", "Nouvelle demande : bonjour", required=True),
+        PromptSection("temporal", "il est midi", priority=40),
+        PromptSection("memories", " ".join(f"m{index}" for index in range(20)), priority=10),
+        PromptSection("history", "vieux récent", priority=20, keep_end=True),
+    ]
+
+    assembled = assembler.assemble(sections)
+
+    assert assembled.total_tokens <= 12
+    assert assembled.truncated == ["memories"]
+    assert assembled.text.startswith("il est midi\n\nvieux récent\n\nm0 m1")
+    assert assembled.text.endswith("Nouvelle demande : bonjour")
+
+
+def test_keep_end_truncation_preserves_the_most_recent_text():
+    text = "un deux trois quatre cinq six"
+
+    assert truncate_to_tokens(text, 3, count_words, keep_end=True) == "[…] cinq six"
+    assert truncate_to_tokens(text, 3, count_words) == "un deux […]"
+
+
+def test_unknown_layout_is_rejected():
+    with pytest.raises(ValueError):
+        PromptAssembler(layout="random").assemble([])
+
+
+def test_rolling_summary_is_incremental_and_bounded():
+    summary = RollingHistorySummary(max_tokens=40, counter=count_words)
+
+    first = summary.update("", [("Quelle heure est-il ? Merci.", "Il est midi. Autre chose ?")])
+    assert first == "- L'utilisateur a demandé « Quelle heure est-il ? » ; Jarvis a répondu « Il est midi. »"
+
+    exchanges = [(f"question {index}", f"réponse {index}") for index in range(10)]
+    text = first
+    for end in range(1, len(exchanges) + 1):
+        text = summary.update(text, exchanges[max(0, end - 2) : end])
+
+    assert count_words(text) <= 40
+    assert "question 9" in text
+    assert "Quelle heure" not in text
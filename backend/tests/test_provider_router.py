@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.services.ai_provider import (
+    HuggingFaceProvider,
+    OpenAIProvider,
+    ProviderRequestError,
+    create_provider,
+)
+from backend.services.provider_router import ProviderRouter
+
+
+pytestmark = pytest.mark.anyio("asyncio")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeProvider:
+    def __init__(self, clock: Clock, name: str, latency: float = 0.1, failing: bool = False) -> None:
+        self.clock = clock
+        self.name = name
+        self.latency = latency
+        self.failing = failing
+        self.fail_after_first_chunk = False
+        self.unexpected: Exception | None = None
+        self.hang: asyncio.Event | None = None
+        self.calls = 0
+
+    def generate_response(self, prompt, attachments=None):
+        self.calls += 1
+        self.clock.now += self.latency
+        if self.failing:
+            raise ProviderRequestError(f"{self.name} en panne")
+        if self.unexpected is not None:
+            raise self.unexpected
+        return self.name
+
+    async def agenerate_response(self, prompt, attachments=None):
+        return self.generate_response(prompt, attachments)
+
+    async def astream_response(self, prompt, attachments=None):
+        if self.hang is not None:
+            await self.hang.wait()
+        yield self.generate_response(prompt, attachments)
+        if self.fail_after_first_chunk:
+            raise ProviderRequestError(f"{self.name} coupé")
+        yield " !"
+
+
+def make_router(clock: Clock, *providers: FakeProvider, **kwargs) -> ProviderRouter:
+    return ProviderRouter(
+        [(provider.name, provider) for provider in providers], clock=clock, **kwargs
+    )
+
+
+async def test_routes_to_the_fastest_backend_once_both_are_measured():
+    clock = Clock()
+    slow = FakeProvider(clock, "lent", latency=2.0)
+    fast = FakeProvider(clock, "rapide", latency=0.2)
+    router = make_router(clock, slow, fast)
+
+    assert await router.agenerate_response("a") == "lent"
+    assert await router.agenerate_response("b") == "rapide"
+    for _ in range(3):
+        assert await router.agenerate_response("c") == "rapide"
+
+    assert slow.calls == 1
+    assert fast.calls == 4
+
+
+async def test_fails_over_and_opens_the_circuit():
+    clock = Clock()
+    broken = FakeProvider(clock, "cassé", latency=0.0, failing=True)
+    healthy = FakeProvider(clock, "sain", latency=1.0)
+    router = make_router(clock, broken, healthy, failure_threshold=2, reset_timeout=30)
+
+    for _ in range(4):
+        assert router.generate_response("x") == "sain"
+
+    assert broken.calls == 2
+    assert router.stats()[0]["state"] == "open"
+
+    # Après le délai, un seul essai : le backend rétabli reprend sa place.
+    clock.now += 30
+    broken.failing = False
+    assert router.generate_response("x") == "cassé"
+    assert router.stats()[0]["state"] == "closed"
+
+
+async def test_cancelled_half_open_trial_releases_the_circuit():
+    clock = Clock()
+    backend = FakeProvider(clock, "seul", latency=0.0, failing=True)
+    router = make_router(clock, backend, failure_threshold=1, reset_timeout=30)
+    with pytest.raises(ProviderRequestError):
+        await router.agenerate_response("x")
+
+    clock.now += 30
+    backend.failing = False
+    backend.hang = asyncio.Event()
+
+    async def consume() -> list[str]:
+        return [chunk async for chunk in router.astream_response("x")]
+
+    # Le client se déconnecte pendant l'essai semi-ouvert.
+    trial = asyncio.create_task(consume())
+    await asyncio.sleep(0)
+    trial.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await trial
+    assert router.stats()[0]["state"] == "open"
+
+    clock.now += 30
+    backend.hang = None
+    assert await router.agenerate_response("x") == "seul"
+    assert router.stats()[0]["state"] == "closed"
+
+
+async def test_unexpected_error_in_half_open_trial_counts_as_a_failure():
+    clock = Clock()
+    backend = FakeProvider(clock, "seul", latency=0.0, failing=True)
+    router = make_router(clock, backend, failure_threshold=1, reset_timeout=30)
+    with pytest.raises(ProviderRequestError):
+        router.generate_response("x")
+
+    clock.now += 30
+    backend.failing = False
+    backend.unexpected = KeyError("réponse inattendue")
+    with pytest.raises(KeyError):
+        router.generate_response("x")
+    assert router.stats()[0]["state"] == "open"
+    assert router.stats()[0]["failures"] == 2
+
+    clock.now += 30
+    backend.unexpected = None
+    assert router.generate_response("x") == "seul"
+    assert router.stats()[0]["state"] == "closed"
+
+
+async def test_stream_fails_over_only_before_the_first_token():
+    clock = Clock()
+    broken = FakeProvider(clock, "cassé", latency=0.0, failing=True)
+    flaky = FakeProvider(clock, "instable", latency=0.5)
+    router = make_router(clock, broken, flaky)
+
+    assert [chunk async for chunk in router.astream_response("x")] == ["instable", " !"]
+
+    flaky.fail_after_first_chunk = True
+    received: list[str] = []
+    with pytest.raises(ProviderRequestError):
+        async for chunk in router.astream_response("x"):
+            received.append(chunk)
+    assert received == ["instable"]
+
+
+async def test_raises_when_every_backend_fails():
+    clock = Clock()
+    router = make_router(
+        clock, FakeProvider(clock, "a", failing=True), FakeProvider(clock, "b", failing=True)
+    )
+
+    with pytest.raises(ProviderRequestError):
+        await router.agenerate_response("x")
+
+
+def test_create_provider_builds_router_from_specs():
+    router = create_provider(
+        "router",
+        router_backends="openai:gpt-4o-mini, openai:gpt-4o, huggingface:gpt2",
+        openai_api_key="key",
+        router_max_attempts=3,
+    )
+
+    assert isinstance(router, ProviderRouter)
+    assert [backend.name for backend in router.backends] == [
+        "openai:gpt-4o-mini",
+        "openai:gpt-4o",
+        "huggingface:gpt2",
+    ]
+    assert isinstance(router.backends[1].provider, OpenAIProvider)
+    assert router.backends[1].provider.model == "gpt-4o"
+    assert isinstance(router.backends[2].provider, HuggingFaceProvider)
+    assert router.max_attempts == 3
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from pathlib import Path
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import backend.main as main
+from backend.memory.history_store import InMemoryHistoryStore, SQLiteHistoryStore
+from backend.services.http_clients import HTTPClientPool
+from backend.services.readiness import ComponentDisabled, Readiness
+
+
+pytestmark = pytest.mark.anyio("asyncio")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+async def test_readiness_records_status_and_timings():
+    readiness = Readiness(("provider", "memory", "connections"), required=("provider",))
+
+    def disabled() -> None:
+        raise ComponentDisabled("pas de clé")
+
+    async def failing() -> None:
+        raise RuntimeError("injoignable")
+
+    assert not readiness.ready
+    assert await readiness.run("provider", lambda: None)
+    assert not await readiness.run("memory", disabled)
+    assert not await readiness.run("connections", failing)
+
+    snapshot = readiness.snapshot()
+    components = snapshot["components"]
+    assert snapshot["ready"]
+    assert components["provider"]["status"] == "ready"
+    assert components["provider"]["duration_ms"] >= 0
+    assert components["memory"] == {
+        "status": "disabled",
+        "duration_ms": components["memory"]["duration_ms"],
+        "error": "pas de clé",
+    }
+    assert components["connections"]["status"] == "failed"
+
+
+async def test_readiness_requires_required_components_to_succeed():
+    readiness = Readiness(("provider", "memory"), required=("provider",))
+
+    def failing() -> None:
+        raise RuntimeError("clé invalide")
+
+    await readiness.run("memory", lambda: None)
+    await readiness.run("provider", failing)
+
+    assert not readiness.ready
+    assert await readiness.wait("provider") == "failed"
+
+
+async def test_readyz_answers_503_until_the_provider_is_ready(monkeypatch):
+    readiness = Readiness(("provider", "memory"), required=("provider",))
+    monkeypatch.setattr(main, "_readiness", readiness)
+
+    assert main.healthz() == {"status": "ok"}
+    pending = main.readyz()
+    assert pending.status_code == 503
+    assert json.loads(pending.body)["components"]["provider"] == {"status": "pending"}
+
+    # La mémoire, optionnelle, peut encore s'initialiser : elle ne retient pas le trafic.
+    await readiness.run("provider", lambda: None)
+
+    ready = main.readyz()
+    assert ready.status_code == 200
+    assert json.loads(ready.body)["ready"] is True
+    assert json.loads(ready.body)["components"]["memory"] == {"status": "pending"}
+
+
+async def test_lifespan_opens_the_history_store_and_bounds_the_warm_up_on_shutdown(
+    monkeypatch, tmp_path
+):
+    release = threading.Event()
+    monkeypatch.setattr(main.settings, "history_backend", "sqlite")
+    monkeypatch.setattr(main.settings, "history_db_path", str(tmp_path / "history.sqlite3"))
+    monkeypatch.setattr(main.settings, "shutdown_warmup_timeout", 0.05)
+    monkeypatch.setattr(main, "_history_store", InMemoryHistoryStore(limit=5))
+    monkeypatch.setattr(main, "_readiness", main._readiness)
+    monkeypatch.setattr(main, "_http_clients", HTTPClientPool(http2=False))
+    monkeypatch.setattr(main, "_start_provider", lambda: release.wait(5))
+    monkeypatch.setattr(main, "_initialise_memory", lambda: None)
+
+    try:
+        async with main.lifespan(main.app):
+            assert isinstance(main._history_store, SQLiteHistoryStore)
+            assert not main._readiness.ready
+        assert main._readiness.components["provider"].status == "pending"
+    finally:
+        release.set()
+
+
+async def test_chat_waits_for_background_provider_initialisation(monkeypatch):
+    class DummyProvider:
+        def generate_response(self, prompt: str, attachments=None) -> str:
+            return "prêt"
+
+    release = threading.Event()
+
+    def slow_start() -> None:
+        release.wait(5)
+        main._provider = DummyProvider()
+
+    readiness = Readiness(("provider",), required=("provider",))
+    monkeypatch.setattr(main, "_readiness", readiness)
+    monkeypatch.setattr(main, "_provider", None)
+    monkeypatch.setattr(main, "_provider_error", None)
+    monkeypatch.setattr(main, "_memory", None)
+    monkeypatch.setattr(main, "_response_cache", None)
+    monkeypatch.setattr(main, "_model_selector", None)
+    monkeypatch.setattr(main, "_history_store", InMemoryHistoryStore(limit=5))
+
+    warm_up = asyncio.create_task(readiness.run("provider", slow_start))
+    chat = asyncio.create_task(main.chat(text="bonjour", files=None, stream=False))
+    await asyncio.sleep(0.05)
+    assert not chat.done()
+
+    release.set()
+    result = await chat
+
+    assert result["response"] == "prêt"
+    assert await warm_up
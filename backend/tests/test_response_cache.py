@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.memory.response_cache import SemanticResponseCache, is_time_sensitive
+from backend.memory.vector_backends import MatrixBackend
+
+
+def trigram_embeddings(texts):
+    vectors = []
+    for text in texts:
+        vector = [0.0] * 64
+        for index in range(len(text) - 2):
+            vector[hash(text[index : index + 3]) % 64] += 1.0
+        vectors.append(vector)
+    return vectors
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def cache(tmp_path):
+    collection = MatrixBackend(str(tmp_path)).get_collection("cache", space="cosine")
+    return SemanticResponseCache(
+        collection, trigram_embeddings, threshold=0.95, ttl=60, clock=Clock()
+    )
+
+
+def test_returns_answer_for_equivalent_request(cache):
+    cache.store("Quelle est la capitale de l'Italie ?", "Rome.")
+
+    assert cache.lookup("quelle est la  capitale de l'italie") == "Rome."
+    assert cache.lookup("Raconte-moi une blague sur les chats") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "bypassed": 0, "hit_rate": 0.5}
+
+
+def test_expired_entries_are_dropped(cache):
+    cache.store("Quelle est la capitale de l'Italie ?", "Rome.")
+    cache.clock.now += 61
+
+    assert cache.lookup("Quelle est la capitale de l'Italie ?") is None
+    assert cache.collection.count() == 0
+
+
+def test_time_sensitive_follow_up_and_attachment_requests_bypass_the_cache(cache):
+    cache.store("Quelle heure est-il ?", "Il est 10h.")
+    cache.store("Résume ce document", "Résumé.", has_attachments=True)
+    cache.store("Continue", "Suite de l'histoire.", has_history=True)
+
+    assert cache.collection.count() == 0
+    assert cache.lookup("Quelle heure est-il ?") is None
+    assert cache.lookup("Résume ce document", has_attachments=True) is None
+    assert cache.lookup("Continue", has_history=True) is None
+    assert cache.stats()["bypassed"] == 3
+    assert is_time_sensitive("On est quel jour aujourd'hui ?")
+    assert not is_time_sensitive("Quelle est la capitale de l'Italie ?")
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import backend.main as main
+from backend.memory.history_store import InMemoryHistoryStore
+from backend.services.ai_provider import ProviderRequestError
+from backend.services.single_flight import SingleFlight, flight_key
+
+
+pytestmark = pytest.mark.anyio("asyncio")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+async def test_late_subscribers_replay_chunks_already_emitted():
+    flights = SingleFlight()
+    release = asyncio.Event()
+    calls = 0
+
+    async def generate():
+        nonlocal calls
+        calls += 1
+        yield "Bon"
+        await release.wait()
+        yield "jour"
+
+    first, first_leads = flights.stream("clé", generate)
+    first_chunks = [await anext(first)]
+
+    second, second_leads = flights.stream("clé", generate)
+    release.set()
+    first_chunks += [chunk async for chunk in first]
+    second_chunks = [chunk async for chunk in second]
+
+    assert (first_leads, second_leads) == (True, False)
+    assert first_chunks == second_chunks == ["Bon", "jour"]
+    assert calls == 1
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "followers": 1}
+
+
+async def test_errors_reach_every_subscriber_and_flights_are_not_reused():
+    flights = SingleFlight()
+
+    async def failing():
+        raise ProviderRequestError("boom")
+        yield  # pragma: no cover
+
+    streams = [flights.stream("clé", failing)[0] for _ in range(2)]
+    for stream in streams:
+        with pytest.raises(ProviderRequestError):
+            [chunk async for chunk in stream]
+
+    _, leads_again = flights.stream("clé", failing)
+    assert leads_again
+
+
+async def test_shared_stream_is_paced_by_the_slowest_subscriber():
+    flights = SingleFlight(max_lead=4)
+    produced = 0
+    finished = False
+
+    async def generate():
+        nonlocal produced, finished
+        try:
+            for index in range(100):
+                produced += 1
+                yield str(index)
+        finally:
+            finished = True
+
+    fast, _ = flights.stream("clé", generate)
+    slow, _ = flights.stream("clé", generate)
+    fast_chunks = [await anext(fast) for _ in range(2)]
+    slow_chunks = [await anext(slow)]
+    await asyncio.sleep(0.01)
+
+    # Le flux ne devance le lecteur le plus lent que de ``max_lead`` morceaux.
+    assert produced <= 1 + 4 + 1
+    assert fast_chunks == ["0", "1"] and slow_chunks == ["0"]
+
+    # Les deux lecteurs partis, la génération est interrompue.
+    await fast.aclose()
+    await slow.aclose()
+    await asyncio.sleep(0)
+    assert finished and produced < 100
+    assert flights.stats()["in_flight"] == 0
+
+
+async def test_streams_released_unread_are_forgotten():
+    flights = SingleFlight()
+    discarded: list[str] = []
+
+    async def generate():
+        yield "réponse"
+
+    leader, _ = flights.stream("clé", generate, on_discard=lambda: discarded.append("clé"))
+    follower, _ = flights.stream("clé", generate)
+    leader.release()
+
+    # Un abonné reste : la génération est conservée et lancée à sa première lecture.
+    assert flights.stats()["in_flight"] == 1
+    assert [chunk async for chunk in follower] == ["réponse"]
+    assert discarded == []
+
+    unread, _ = flights.stream("autre", generate, on_discard=lambda: discarded.append("autre"))
+    await unread.aclose()
+
+    assert discarded == ["autre"]
+    assert flights.stats()["in_flight"] == 0
+    assert [chunk async for chunk in unread] == []
+
+
+async def test_unsent_streaming_chat_response_releases_its_flight(monkeypatch):
+    class StreamingProvider:
+        async def astream_response(self, prompt, attachments=None):
+            yield "réponse"
+
+    monkeypatch.setattr(main, "_provider", StreamingProvider())
+    monkeypatch.setattr(main, "_provider_error", None)
+    monkeypatch.setattr(main, "_memory", None)
+    monkeypatch.setattr(main, "_response_cache", None)
+    monkeypatch.setattr(main, "_single_flight", SingleFlight())
+    monkeypatch.setattr(main, "_history_store", InMemoryHistoryStore(limit=5))
+
+    response = await main.chat(text="hello", files=None, stream=True)
+    assert main._single_flight.stats()["in_flight"] == 1
+    assert main._admission.active == 1
+
+    # Client parti avant l'envoi du corps : seule la tâche de fond s'exécute.
+    await response.background()
+
+    assert main._single_flight.stats()["in_flight"] == 0
+    assert main._admission.active == 0
+
+
+async def test_run_is_cancelled_once_every_caller_has_gone():
+    flights = SingleFlight()
+    started = asyncio.Event()
+    cancelled = False
+
+    async def compute() -> str:
+        nonlocal cancelled
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        return "résultat"
+
+    callers = [asyncio.ensure_future(flights.run("clé", compute)[0]) for _ in range(2)]
+    await started.wait()
+
+    callers[0].cancel()
+    await asyncio.sleep(0)
+    assert not cancelled
+
+    callers[1].cancel()
+    await asyncio.gather(*callers, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert cancelled
+    assert flights.stats()["in_flight"] == 0
+
+
+async def test_run_shares_one_call_between_concurrent_callers():
+    flights = SingleFlight()
+    calls = 0
+
+    async def compute() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "résultat"
+
+    first, _ = flights.run("clé", compute)
+    second, leads = flights.run("clé", compute)
+
+    assert await asyncio.gather(first, second) == ["résultat", "résultat"]
+    assert not leads
+    assert calls == 1
+    assert flight_key("a", attachment_hashes=["x"]) != flight_key("a", attachment_hashes=["y"])
+
+
+async def test_identical_concurrent_chat_requests_share_one_generation(monkeypatch):
+    calls = 0
+
+    class SlowProvider:
+        async def agenerate_response(self, prompt, attachments=None):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "réponse"
+
+    monkeypatch.setattr(main, "_provider", SlowProvider())
+    monkeypatch.setattr(main, "_provider_error", None)
+    monkeypatch.setattr(main, "_memory", None)
+    monkeypatch.setattr(main, "_response_cache", None)
+    monkeypatch.setattr(main, "_single_flight", SingleFlight())
+    monkeypatch.setattr(main, "_build_temporal_context", lambda: "Informations temporelles")
+    monkeypatch.setattr(main, "_history_store", InMemoryHistoryStore(limit=5))
+
+    responses = await asyncio.gather(
+        *(main.chat(text="hello", files=None, stream=False) for _ in range(3))
+    )
+
+    assert responses == [{"response": "réponse"}] * 3
+    assert calls == 1
+    assert main._single_flight.stats()["followers"] == 2
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import backend.main as main
+from backend.config import Settings
+from backend.services.transcription import StubTranscriber, TranscriptionError, TranscriptionStream
+
+
+pytestmark = pytest.mark.anyio("asyncio")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def test_stream_throttles_partials_and_resets_after_final():
+    clock = Clock()
+    stream = TranscriptionStream(StubTranscriber(), partial_interval=1.0, clock=clock)
+
+    stream.feed(b"Bonjour")
+    assert stream.partial_due()
+    assert await stream.partial() == "Bonjour"
+
+    stream.feed(b" le monde")
+    assert not stream.partial_due()
+    clock.now += 1.0
+    assert stream.partial_due()
+    assert await stream.partial() == "Bonjour le monde"
+
+    assert await stream.finish() == "Bonjour le monde"
+    assert stream.size == 0
+    with pytest.raises(TranscriptionError):
+        await stream.finish()
+
+
+async def test_partials_wait_for_the_audio_to_grow_geometrically():
+    class CountingTranscriber(StubTranscriber):
+        uploaded = 0
+
+        async def transcribe(self, audio, filename="enregistrement.webm", use_cache=True):
+            self.uploaded += len(audio)
+            return await super().transcribe(audio, filename, use_cache)
+
+    transcriber = CountingTranscriber()
+    stream = TranscriptionStream(transcriber, partial_interval=0, partial_growth=2.0)
+    for _ in range(1000):
+        stream.feed(b"a")
+        if stream.partial_due():
+            await stream.partial()
+
+    # 1 + 3 + 7 + … : moins de deux fois l'enregistrement, au lieu de ~500 000 octets.
+    assert transcriber.uploaded < 2 * stream.size
+
+
+def test_partials_can_be_disabled():
+    stream = TranscriptionStream(StubTranscriber(), partial_interval=0, partials=False)
+    stream.feed(b"Bonjour")
+
+    assert not stream.partial_due()
+
+
+def test_stream_rejects_oversized_recordings():
+    stream = TranscriptionStream(StubTranscriber(), max_bytes=4)
+
+    with pytest.raises(TranscriptionError):
+        stream.feed(b"trop long")
+
+
+def test_websocket_emits_partial_then_final_transcripts(monkeypatch):
+    monkeypatch.setattr(main.settings, "transcription_backend", "stub", raising=False)
+    monkeypatch.setattr(main.settings, "transcription_partial_interval", 0, raising=False)
+    monkeypatch.setattr(main, "_transcriber", None)
+
+    with TestClient(main.app).websocket_connect("/ws/transcribe") as websocket:
+        websocket.send_json({"type": "start", "filename": "clip.webm"})
+        websocket.send_bytes(b"Allume")
+        assert websocket.receive_json() == {"type": "partial", "text": "Allume"}
+        websocket.send_bytes(b" la lumi\xc3\xa8re")
+        assert websocket.receive_json() == {"type": "partial", "text": "Allume la lumière"}
+        websocket.send_json({"type": "stop"})
+        assert websocket.receive_json() == {"type": "final", "text": "Allume la lumière"}
+
+        websocket.send_json({"type": "stop"})
+        assert websocket.receive_json()["type"] == "error"
+
+
+def test_websocket_sends_partials_with_the_openai_backend_by_default(monkeypatch):
+    monkeypatch.setattr(main.settings, "transcription_backend", "openai", raising=False)
+    monkeypatch.setattr(main.settings, "openai_api_key", "sk-test", raising=False)
+    monkeypatch.setattr(main.settings, "transcription_partial_interval", 0, raising=False)
+    monkeypatch.setattr(
+        main.settings, "transcription_remote_partials", Settings().transcription_remote_partials
+    )
+    monkeypatch.setattr(main, "_transcriber", StubTranscriber())
+
+    with TestClient(main.app).websocket_connect("/ws/transcribe") as websocket:
+        websocket.send_bytes(b"Bonjour")
+        assert websocket.receive_json() == {"type": "partial", "text": "Bonjour"}
+
+
+def test_websocket_rejects_control_frames_that_are_not_objects(monkeypatch):
+    monkeypatch.setattr(main.settings, "transcription_backend", "stub", raising=False)
+    monkeypatch.setattr(main.settings, "transcription_partial_interval", 0, raising=False)
+    monkeypatch.setattr(main, "_transcriber", None)
+
+    with TestClient(main.app).websocket_connect("/ws/transcribe") as websocket:
+        for frame in ("[]", "1", "pas du json"):
+            websocket.send_text(frame)
+            assert websocket.receive_json() == {
+                "type": "error",
+                "detail": "Message de contrôle invalide.",
+            }
+        websocket.send_bytes(b"Bonjour")
+        assert websocket.receive_json() == {"type": "partial", "text": "Bonjour"}
+        websocket.send_json({"type": "stop"})
+        assert websocket.receive_json() == {"type": "final", "text": "Bonjour"}
+
+
+def test_websocket_requires_a_transcription_backend(monkeypatch):
+    monkeypatch.setattr(main.settings, "transcription_backend", "openai", raising=False)
+    monkeypatch.setattr(main.settings, "openai_api_key", None, raising=False)
+
+    with TestClient(main.app).websocket_connect("/ws/transcribe") as websocket:
+        assert websocket.receive_json()["type"] == "error"
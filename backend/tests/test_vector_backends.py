@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.memory.memory_manager import VectorMemory
+from backend.memory.response_cache import SemanticResponseCache
+from backend.memory.vector_backends import MatrixCollection
+
+
+def _vectors(count: int, dimensions: int = 16, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(count, dimensions)).astype(np.float32)
+
+
+def _exact_top(vectors: np.ndarray, query: np.ndarray, k: int) -> list[str]:
+    distances = ((vectors - query) ** 2).sum(axis=1)
+    return [f"id{row}" for row in np.argsort(distances)[:k]]
+
+
+def test_query_matches_exact_l2_search_and_reports_squared_distances(tmp_path):
+    vectors = _vectors(300)
+    collection = MatrixCollection(tmp_path / "memory")
+    collection.add(
+        [f"id{row}" for row in range(300)],
+        vectors,
+        documents=[f"souvenir {row}" for row in range(300)],
+    )
+
+    result = collection.query([vectors[7]], n_results=5)
+
+    assert result["ids"][0] == _exact_top(vectors, vectors[7], 5)
+    assert result["documents"][0][0] == "souvenir 7"
+    assert result["distances"][0][0] == pytest.approx(0.0, abs=1e-4)
+    assert collection.count() == 300
+
+
+def test_updates_deletes_and_reopening_replay_the_log(tmp_path):
+    vectors = _vectors(50)
+    collection = MatrixCollection(tmp_path / "cache", space="cosine", dtype="float16")
+    collection.add(
+        [f"id{row}" for row in range(50)], vectors, metadatas=[{"n": row} for row in range(50)]
+    )
+    collection.upsert(["id3"], [vectors[10]], documents=["remplacé"], metadatas=[{"n": 99}])
+    collection.delete(ids=["id10"])
+    collection.update(["id4"], [{"n": 44}])
+    collection.delete(where={"n": 5})
+    collection.close()
+
+    reopened = MatrixCollection(tmp_path / "cache")
+    result = reopened.query([vectors[10]], n_results=1)
+
+    assert reopened.space == "cosine" and reopened.dtype == np.float16
+    assert reopened.count() == 48
+    assert result["ids"] == [["id3"]] and result["documents"] == [["remplacé"]]
+    assert result["distances"][0][0] == pytest.approx(0.0, abs=1e-2)
+    assert reopened.get(ids=["id4", "id10", "id5"])["metadatas"] == [{"n": 44}]
+
+    assert reopened.compact() == 3
+    assert reopened.count() == 48
+    assert MatrixCollection(tmp_path / "cache").query([vectors[10]], n_results=1)["ids"] == [["id3"]]
+
+
+def test_metadata_updates_leave_no_dead_rows_to_compact(tmp_path):
+    vectors = _vectors(10)
+    collection = MatrixCollection(tmp_path / "memory")
+    collection.add([f"id{row}" for row in range(10)], vectors)
+    for count in range(5):
+        collection.update(["id1", "id2"], [{"n": count}, {"n": count}])
+
+    assert collection.dead_rows == 0
+    assert collection.compact() == 0
+    collection.close()
+
+    reopened = MatrixCollection(tmp_path / "memory")
+    assert reopened.get(ids=["id1", "id2"])["metadatas"] == [{"n": 4}, {"n": 4}]
+
+
+def test_reopening_loads_live_rows_without_reading_the_records(tmp_path, monkeypatch):
+    vectors = _vectors(30)
+    collection = MatrixCollection(tmp_path / "memory")
+    collection.add(
+        [f"id{row}" for row in range(30)],
+        vectors,
+        documents=[f"souvenir {row}" for row in range(30)],
+        metadatas=[{"n": row} for row in range(30)],
+    )
+    collection.add(["id1", "id1"], vectors[:2], documents=["premier", "second"])
+    collection.delete(ids=["id2"])
+    collection.close()
+
+    import backend.memory.vector_backends as vector_backends
+
+    decoded = []
+    loads = vector_backends.json.loads
+    monkeypatch.setattr(
+        vector_backends.json, "loads", lambda text, **kwargs: decoded.append(text) or loads(text, **kwargs)
+    )
+    reopened = MatrixCollection(tmp_path / "memory")
+
+    assert reopened.count() == 29 and reopened.dead_rows == 3
+    assert decoded == [(tmp_path / "memory" / "meta.json").read_text(encoding="utf-8")]
+    assert reopened.get(ids=["id1", "id2", "id3"])["documents"] == ["second", "souvenir 3"]
+    assert reopened.get(where={"n": 3})["ids"] == ["id3"]
+    assert reopened.query([vectors[1]], n_results=1)["ids"] == [["id1"]]
+
+
+def test_legacy_records_log_is_imported(tmp_path):
+    path = tmp_path / "memory"
+    collection = MatrixCollection(path)
+    collection.add([f"id{row}" for row in range(4)], _vectors(4))
+    collection.close()
+    (path / "records.sqlite3").unlink()
+    entries = [
+        {"op": "add", "id": "id0", "document": "zéro", "metadata": None},
+        {"op": "add", "id": "id1", "document": "un", "metadata": {"n": 1}},
+        {"op": "add", "id": "id2", "document": "deux", "metadata": None},
+        {"op": "add", "id": "id0", "document": "remplacé", "metadata": None},
+        {"op": "update", "id": "id1", "metadata": {"n": 11}},
+        {"op": "delete", "id": "id2"},
+    ]
+    (path / "records.jsonl").write_text(
+        "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries) + '{"op": "ad',
+        encoding="utf-8",
+    )
+
+    imported = MatrixCollection(path)
+
+    assert not (path / "records.jsonl").exists()
+    assert imported.count() == 2 and imported.dead_rows == 2
+    assert imported.get() == {
+        "ids": ["id1", "id0"],
+        "documents": ["un", "remplacé"],
+        "metadatas": [{"n": 11}, None],
+    }
+    assert imported.compact() == 2
+    assert MatrixCollection(path).get(ids=["id0"])["documents"] == ["remplacé"]
+
+
+def test_interrupted_compaction_keeps_the_old_or_the_new_store(tmp_path):
+    vectors = _vectors(20)
+    path = tmp_path / "memory"
+    collection = MatrixCollection(path)
+    collection.add([f"id{row}" for row in range(20)], vectors)
+    collection.delete(ids=[f"id{row}" for row in range(10)])
+    live = [int(row) for row in np.flatnonzero(collection._alive)]
+
+    # Arrêt avant la validation : les fichiers préparés sont abandonnés.
+    collection._stage_compaction(live)
+    reopened = MatrixCollection(path)
+    assert reopened.count() == 10 and reopened.dead_rows == 10
+    assert not list(path.glob("*.compact"))
+
+    # Arrêt après la validation : la substitution est terminée à l'ouverture.
+    reopened._stage_compaction(live)
+    (path / "compact.commit").touch()
+    recovered = MatrixCollection(path)
+    assert recovered.count() == 10 and recovered.dead_rows == 0
+    assert recovered.query([vectors[15]], n_results=1)["ids"] == [["id15"]]
+    assert not (path / "compact.commit").exists()
+
+
+def test_hnsw_index_is_built_past_the_threshold_and_caught_up_on_reopen(tmp_path):
+    pytest.importorskip("hnswlib")
+    vectors = _vectors(600, seed=1)
+    collection = MatrixCollection(tmp_path / "memory", hnsw_threshold=200, hnsw_save_every=10**9)
+    collection.add([f"id{row}" for row in range(400)], vectors[:400])
+    assert collection.wait_for_index(timeout=10)
+    collection.save_index()
+    collection.add([f"id{row}" for row in range(400, 600)], vectors[400:])
+    collection.delete(ids=["id450"])
+
+    reopened = MatrixCollection(tmp_path / "memory", hnsw_threshold=200)
+
+    assert reopened._index is not None
+    assert reopened.query([vectors[500]], n_results=1)["ids"] == [["id500"]]
+    assert "id450" not in reopened.query([vectors[450]], n_results=3)["ids"][0]
+
+
+def test_hnsw_index_is_built_without_blocking_queries_and_writes(tmp_path, monkeypatch):
+    hnswlib = pytest.importorskip("hnswlib")
+    import backend.memory.vector_backends as vector_backends
+
+    started = threading.Event()
+    release = threading.Event()
+    Index = hnswlib.Index
+
+    class SlowIndex:
+        def __init__(self, *args, **kwargs):
+            self._index = Index(*args, **kwargs)
+
+        def add_items(self, *args, **kwargs):
+            started.set()
+            release.wait(10)
+            return self._index.add_items(*args, **kwargs)
+
+        def __getattr__(self, name):
+            return getattr(self._index, name)
+
+    monkeypatch.setattr(vector_backends.hnswlib, "Index", SlowIndex)
+    vectors = _vectors(300, seed=2)
+    collection = MatrixCollection(tmp_path / "memory", hnsw_threshold=200)
+    collection.add([f"id{row}" for row in range(250)], vectors[:250])
+    assert started.wait(5)
+
+    # Pendant la construction, requêtes et écritures passent par le balayage exact.
+    assert collection.query([vectors[3]], n_results=1)["ids"] == [["id3"]]
+    collection.add([f"id{row}" for row in range(250, 300)], vectors[250:])
+    collection.delete(ids=["id5"])
+    assert collection._index is None
+
+    release.set()
+    assert collection.wait_for_index(timeout=10)
+    assert collection.query([vectors[280]], n_results=1)["ids"] == [["id280"]]
+    assert "id5" not in collection.query([vectors[5]], n_results=3)["ids"][0]
+    assert (tmp_path / "memory" / "index.hnsw").exists()
+
+
+def test_vector_memory_runs_on_the_matrix_backend_without_chroma(tmp_path):
+    def embed(texts):
+        return [[float(len(text)), float(text.count("a")), 1.0] for text in texts]
+
+    memory = VectorMemory(
+        api_key="",
+        persist_dir=str(tmp_path),
+        embedding_model="test",
+        embedding_function=embed,
+        backend="matrix",
+        dedup_threshold=0.0,
+    )
+    memory.add_memories(["chat", "banane", "ok"])
+    cache = SemanticResponseCache(memory.get_collection("responses"), embed, threshold=0.99)
+    cache.store("Quelle est la capitale de l'Italie ?", "Rome.")
+
+    assert memory.retrieve_relevant("papa", n=1) == ["chat"]
+    assert cache.lookup("quelle est la capitale de l'italie") == "Rome."
+    memory.clear_memory()
+    assert memory.collection.count() == 0
+    memory.close()
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+import threading
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.memory.write_behind import MemoryWriteBehind
+
+
+class RecordingStore:
+    def __init__(self) -> None:
+        self.batches: list[list[str]] = []
+        self.written = threading.Event()
+
+    def add_memories(self, contents, metadatas=None):
+        self.batches.append(list(contents))
+        self.written.set()
+
+
+def test_flushes_one_batch_when_size_threshold_is_reached():
+    store = RecordingStore()
+    writer = MemoryWriteBehind(store, max_batch_size=3, flush_interval=60).start()
+
+    for index in range(3):
+        writer.enqueue(f"souvenir {index}")
+
+    assert store.written.wait(2)
+    assert store.batches == [["souvenir 0", "souvenir 1", "souvenir 2"]]
+    assert writer.depth == 0
+    writer.close()
+
+
+def test_flushes_on_time_threshold():
+    store = RecordingStore()
+    writer = MemoryWriteBehind(store, max_batch_size=100, flush_interval=0.05).start()
+
+    writer.enqueue("souvenir")
+
+    assert store.written.wait(2)
+    assert store.batches == [["souvenir"]]
+    writer.close()
+
+
+def test_close_flushes_pending_and_bounded_queue_drops_oldest():
+    store = RecordingStore()
+    writer = MemoryWriteBehind(store, max_batch_size=100, flush_interval=60, max_queue_size=2)
+
+    writer.enqueue("a")
+    writer.enqueue("b")
+    writer.enqueue("c")
+    assert writer.depth == 2
+
+    writer.close()
+
+    assert store.batches == [["b", "c"]]
+    assert writer.stats() == {"queue_depth": 0, "written": 2, "dropped": 1, "failed": 0}
@@ -1157,6 +1157,11 @@ function App() {
   const [realtimeVoice, setRealtimeVoice] = useState(REALTIME_VOICES[0].value);
   const [isWakeWordEnabled, setIsWakeWordEnabled] = useState(false);
   const conversationCounterRef = useRef(1);
+  const clientSessionIdRef = useRef(
+    typeof crypto !== "undefined" && crypto.randomUUID
+      ? crypto.randomUUID()
+      : `${Date.now()}-${Math.random().toString(36).slice(2)}`
+  );
   const chatRef = useRef(null);
   const fileInputRef = useRef(null);
   const dragCounter = useRef(0);
@@ -3062,6 +3067,10 @@ function App() {
         formData.append("files", file);
       });
       formData.append("stream", "true");
+      formData.append(
+        "conversation_id",
+        `${clientSessionIdRef.current}:${conversationIdForRequest}`
+      );
 
       const res = await fetch("http://127.0.0.1:8000/chat", {
         method: "POST",